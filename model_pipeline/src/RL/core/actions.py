@@ -0,0 +1,48 @@
+"""
+actions.py — the routing action space: YOLO variant × inference resolution.
+
+Kept free of heavy imports: the training environment, the profile store and
+the serving engine all index actions through action_grid(), so a policy
+trained on one grid decodes to the same (model, imgsz) pairs in serving.
+"""
+from collections import namedtuple
+
+MODEL_KEYS = ["n", "s", "l"]
+TIER_NAMES = {"n": "Nano", "s": "Small", "l": "Large"}
+DEFAULT_IMGSZ = 640
+METRICS = ("conf", "time", "count")
+
+
+class RoutingAction(namedtuple("RoutingAction", ["key", "model", "imgsz"])):
+    """
+    One routing choice: YOLO variant `model` at input size `imgsz`.  `key` is
+    its column prefix in the profile — the bare model key at DEFAULT_IMGSZ
+    (n_conf, …) so single-resolution profiles keep their legacy columns, and
+    model key + size otherwise (n320_conf, …).
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        tier = TIER_NAMES[self.model]
+        return tier if self.imgsz == DEFAULT_IMGSZ else f"{tier}@{self.imgsz}"
+
+
+def action_grid(resolutions=(DEFAULT_IMGSZ,), models=MODEL_KEYS):
+    """
+    The (model, resolution) action space in action-index order: model-major,
+    resolutions ascending, so action 0 is the cheapest (Nano at the smallest
+    size).  The default grid is the legacy three actions Nano / Small / Large.
+    """
+    sizes = sorted({int(r) for r in resolutions})
+    return [RoutingAction(m if r == DEFAULT_IMGSZ else f"{m}{r}", m, r) for m in models for r in sizes]
+
+
+def metric_columns(keys):
+    """Profile metric columns for the given action keys."""
+    return [f"{k}_{m}" for k in keys for m in METRICS]
+
+
+def prev_action_feature(action, n_actions=len(MODEL_KEYS)):
+    """prev_action scaled to [0, 1] for the observation (prev_action / 2 on the legacy grid)."""
+    return action / max(n_actions - 1, 1)
@@ -54,4 +54,24 @@ class NeuralBanditAgent:
         loss.backward()
         self.optimizer.step()
         
+        return loss.item()
+
+    def update_batch(self, states, actions, rewards):
+        """
+        One optimizer step on a mini-batch.
+        states: (B, input_dim), actions: (B,) ints, rewards: (B,) floats
+        """
+        self.model.train()
+        states_t  = torch.as_tensor(states,  dtype=torch.float32, device=self.device)
+        actions_t = torch.as_tensor(actions, dtype=torch.int64,   device=self.device)
+        rewards_t = torch.as_tensor(rewards, dtype=torch.float32, device=self.device)
+
+        predicted_rewards  = self.model(states_t)
+        chosen_reward_pred = predicted_rewards.gather(1, actions_t.unsqueeze(1)).squeeze(1)
+        loss = self.criterion(chosen_reward_pred, rewards_t)
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
         return loss.item()
\ No newline at end of file
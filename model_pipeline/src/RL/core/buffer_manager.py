@@ -1,30 +1,83 @@
 import numpy as np
-from collections import deque
+
+from core.actions import MODEL_KEYS, prev_action_feature
+
+# Window observations keep the 1028-dim layout of single-frame observations:
+#   [mean visual (1024) | mean edge ×10 | prev_action/(n_actions−1), mean conf, count_delta / COUNT_DELTA_SCALE]
+COUNT_DELTA_SCALE = 10.0
+
 
 class WindowBufferManager:
     """
     Collects frame-level features and aggregates them for the RL agent.
     Ensures model switching only happens at window boundaries.
+
+    Frames are kept in preallocated NumPy ring buffers (one (window_size, 1024)
+    visual ring plus scalar rings) with running sums updated as frames arrive,
+    so get_aggregated_state() is O(1) in the window size and allocates nothing.
     """
-    def __init__(self, window_size=10):
+    # Running sums are recomputed from the ring every this many windows to
+    # stop floating-point drift from the add/subtract updates accumulating.
+    RESYNC_WINDOWS = 256
+
+    def __init__(self, window_size=10, visual_dim=1024, n_actions=len(MODEL_KEYS)):
         self.window_size = window_size
-        
-        # Buffers to store data within the current window
-        self.visual_buffer = deque(maxlen=window_size)
-        self.conf_buffer = deque(maxlen=window_size)
-        self.count_buffer = deque(maxlen=window_size)
-        self.edge_buffer = deque(maxlen=window_size)
+        self.n_actions = n_actions
+
+        # Ring buffers holding the last `window_size` frames
+        self.visual_buffer = np.zeros((window_size, visual_dim), dtype=np.float32)
+        self.conf_buffer = np.zeros(window_size, dtype=np.float64)
+        self.count_buffer = np.zeros(window_size, dtype=np.int64)
+        self.edge_buffer = np.zeros(window_size, dtype=np.float64)
+
+        # Running sums over the frames currently in the ring
+        self._visual_sum = np.zeros(visual_dim, dtype=np.float64)
+        self._conf_sum = 0.0
+        self._edge_sum = 0.0
+
+        # Output buffers reused by get_aggregated_state()
+        self._avg_visual = np.zeros(visual_dim, dtype=np.float32)
+        self._metadata = np.zeros(3, dtype=np.float32)
+
+        self._head = 0      # next slot to write
+        self._size = 0      # frames currently buffered (≤ window_size)
         self.frame_counter = 0
 
+    def __len__(self):
+        return self._size
+
     def add_frame_data(self, visual_features, edge_val, confidence=0.0, obj_count=0):
         """
         Pushes new frame data into the temporal buffers.
         """
-        self.edge_buffer.append(edge_val)
-        self.visual_buffer.append(visual_features)
-        self.conf_buffer.append(confidence)
-        self.count_buffer.append(obj_count)
+        i = self._head
+        if self._size == self.window_size:
+            # Slot is occupied: retire the oldest frame from the running sums
+            self._visual_sum -= self.visual_buffer[i]
+            self._conf_sum -= self.conf_buffer[i]
+            self._edge_sum -= self.edge_buffer[i]
+        else:
+            self._size += 1
+
+        self.visual_buffer[i] = visual_features
+        self.conf_buffer[i] = confidence
+        self.count_buffer[i] = obj_count
+        self.edge_buffer[i] = edge_val
+
+        self._visual_sum += self.visual_buffer[i]
+        self._conf_sum += self.conf_buffer[i]
+        self._edge_sum += self.edge_buffer[i]
+
+        self._head = (i + 1) % self.window_size
         self.frame_counter += 1
+        if self.frame_counter % (self.window_size * self.RESYNC_WINDOWS) == 0:
+            self._resync()
+
+    def _resync(self):
+        n = self._size
+        np.sum(self.visual_buffer[:n], axis=0, dtype=np.float64, out=self._visual_sum)
+        self._conf_sum = float(self.conf_buffer[:n].sum())
+        self._edge_sum = float(self.edge_buffer[:n].sum())
 
     def is_window_complete(self):
         """
@@ -35,31 +88,64 @@ class WindowBufferManager:
     def get_aggregated_state(self, prev_model_idx):
         """
         Computes the mean/delta features to pass to the RL Agent.
+
+        The returned avg_visual and metadata are internal buffers that are
+        overwritten by the next call; copy them if they must outlive the
+        current decision.
         """
+        n = self._size
+        if n == 0:
+            raise ValueError("get_aggregated_state() called before any frame was added")
+
         # 1. Mean Visual State (The 'Average' look of the last N frames)
-        avg_visual = np.mean(self.visual_buffer, axis=0)
+        np.multiply(self._visual_sum, 1.0 / n, out=self._avg_visual, casting="same_kind")
+        avg_visual = self._avg_visual
+
+        avg_edge = self._edge_sum / n
 
-        avg_edge = np.mean(self.edge_buffer)
-        
         # 2. Average Confidence of current detections
-        avg_conf = np.mean(self.conf_buffer)
-        
+        avg_conf = self._conf_sum / n
+
         # 3. Object Count Trend (Difference between start and end of window)
-        count_delta = self.count_buffer[-1] - self.count_buffer[0]
-        
+        oldest = self._head if n == self.window_size else 0
+        newest = (self._head - 1) % self.window_size
+        count_delta = self.count_buffer[newest] - self.count_buffer[oldest]
+
         # 4. Construct Metadata Vector
-        metadata = np.array([
-            float(prev_model_idx),
-            float(avg_conf),
-            float(count_delta)
-        ], dtype=np.float32)
-        
+        metadata = self._metadata
+        metadata[0] = prev_model_idx
+        metadata[1] = avg_conf
+        metadata[2] = count_delta
+
         return avg_visual, avg_edge, metadata
 
+    def build_observation(self, prev_action, out=None):
+        """
+        1028-dim window observation shared by WindowedInferenceEnv and the
+        serving engine's window mode, so a policy trained on one runs on the other.
+        """
+        avg_visual, avg_edge, metadata = self.get_aggregated_state(prev_action)
+        obs = out if out is not None else np.empty(1028, dtype=np.float32)
+        obs[:1024] = avg_visual
+        obs[1024]  = avg_edge * 10.0
+        obs[1025]  = prev_action_feature(prev_action, self.n_actions)
+        obs[1026]  = metadata[1]
+        obs[1027]  = metadata[2] / COUNT_DELTA_SCALE
+        return obs
+
+    def clear(self):
+        """Empties the window (e.g. at the start of a new session/episode)."""
+        self._visual_sum[:] = 0.0
+        self._conf_sum = 0.0
+        self._edge_sum = 0.0
+        self._head = 0
+        self._size = 0
+        self.frame_counter = 0
+
     def reset_window(self):
         """
         Clears the counter for a new decision cycle.
         """
-        # We don't clear the deques because we want a sliding 'warm' start 
+        # We don't clear the rings because we want a sliding 'warm' start
         # for the next window's features, but we reset the logic counter.
         pass
@@ -1,11 +1,14 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-import pandas as pd
 import cv2
 import os
 import yaml
+from core.buffer_manager import WindowBufferManager
 from core.features import FeatureExtractor
+from core.actions import DEFAULT_IMGSZ, action_grid, metric_columns, prev_action_feature
+from core.profile_store import read_profile, read_profile_arrays
+from core.scoring import stack_metrics, score_profile
 
 _RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -17,29 +20,45 @@ def _load_params():
     return {}
 
 class AdaptiveInferenceEnv(gym.Env):
-    def __init__(self, csv_path):
+    """
+    One step routes one profiled frame.  The action space is the (model,
+    resolution) grid of core.actions.action_grid over `resolutions`
+    (default: profile.resolutions in params.yaml) — Nano / Small / Large when
+    only the default 640 is profiled.
+    """
+    def __init__(self, profile_path, resolutions=None):
         super(AdaptiveInferenceEnv, self).__init__()
-        self.df = pd.read_csv(csv_path)
+        self.paths = read_profile(profile_path, columns=["path"])["path"]
+        self.n_rows = len(self.paths)
         self.extractor = FeatureExtractor()
-        self.action_space = spaces.Discrete(3)
+        params = _load_params()
+        self.actions   = action_grid(resolutions or params.get("profile", {}).get("resolutions", [DEFAULT_IMGSZ]))
+        self.n_actions = len(self.actions)
+        self.action_space = spaces.Discrete(self.n_actions)
 
         # 1028-dim: 1024 visual + 1 edge density + 3 metadata
         self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(1028,), dtype=np.float32)
 
-        P = _load_params().get("reward", {})
+        P = params.get("reward", {})
         self.w_quality         = P.get("w_quality",         0.84)
         self.w_efficiency      = P.get("w_efficiency",      0.16)
         self.switching_penalty = P.get("switching_penalty", 0.02)
         self.episode_length    = P.get("episode_length",    2048)
 
+        # Rewards for every (row, action) are precomputed once — see core/scoring.py
+        keys = [a.key for a in self.actions]
+        self.confs, lats, self.counts = stack_metrics(read_profile_arrays(profile_path, metric_columns(keys)), keys)
+        self.rewards = score_profile(self.confs, lats, self.counts,
+                                     self.w_quality, self.w_efficiency).rewards
+
         self.current_step = 0
         self.episode_start = 0
         self.prev_action  = 0
         self.prev_conf    = 0.5
 
-    def _get_obs(self):
-        row      = self.df.iloc[self.current_step]
-        img_path = row['path']
+    def _frame_features(self, row):
+        """(visual features (1024,), raw edge density) for one profile row."""
+        img_path = self.paths.iloc[row]
 
         if os.path.exists(img_path):
             frame     = cv2.imread(img_path)
@@ -48,66 +67,106 @@ class AdaptiveInferenceEnv(gym.Env):
         else:
             vis_feats = np.zeros(1024, dtype=np.float32)
             edge_val  = 0.0
+        return vis_feats, edge_val
+
+    def _get_obs(self):
+        vis_feats, edge_val = self._frame_features(self.current_step)
 
         scaled_edge = np.array([edge_val * 10.0], dtype=np.float32)
         metadata    = np.array(
-            [float(self.prev_action / 2.0), float(self.prev_conf), 0.0], dtype=np.float32
+            [float(prev_action_feature(self.prev_action, self.n_actions)), float(self.prev_conf), 0.0],
+            dtype=np.float32
         )
         return np.concatenate([vis_feats, scaled_edge, metadata]).astype(np.float32)
 
     def step(self, action):
-        row    = self.df.iloc[self.current_step]
-        confs  = [row['n_conf'],  row['s_conf'],  row['l_conf']]
-        lats   = [row['n_time'],  row['s_time'],  row['l_time']]
-        counts = [row['n_count'], row['s_count'], row['l_count']]
-
         # ── Reward: ranking-normalised quality + efficiency ───────────────────
         # Step 1 — score each model on quality and efficiency
         #   quality    = confidence × √(object_count + 1)
         #   efficiency = quality / latency  (quality per unit time, rewards Nano on simple scenes)
         # Step 2 — blend: score = 0.84 × quality_norm + 0.16 × efficiency_norm
         #   where both norms are relative to the best model THIS step → range [0, 1]
-        # Step 3 — rank-normalise the blended score across all three models:
+        # Step 3 — rank-normalise the blended score across all actions:
         #   reward = (score[action] - min_score) / (max_score - min_score)
         #   → 1.0 = best possible choice this step, 0.0 = worst
         # This fills the full [0, 1] reward range every step, giving PPO strong
         # advantage signals and preventing value-function collapse to the mean.
-        quality    = [confs[a] * np.sqrt(counts[a] + 1) for a in range(3)]
-        efficiency = [quality[a] / (lats[a] + 1e-8)     for a in range(3)]
-
-        q_max   = max(quality)    + 1e-8
-        eff_max = max(efficiency) + 1e-8
-
-        scores  = [self.w_quality * (quality[a] / q_max)
-                   + self.w_efficiency * (efficiency[a] / eff_max)
-                   for a in range(3)]
-
-        s_min, s_max = min(scores), max(scores)
-        spread = s_max - s_min
-
-        if spread > 0.01:                          # models meaningfully differ
-            reward = (scores[action] - s_min) / spread
-        else:                                      # all models equivalent this step
-            reward = 0.5
+        # The whole profile is scored up front by core.scoring.score_profile.
+        reward = float(self.rewards[self.current_step, action])
 
         tax    = self.switching_penalty if action != self.prev_action else 0.0
         reward -= tax
 
         self.prev_action = action
-        self.prev_conf   = confs[action]
+        self.prev_conf   = float(self.confs[self.current_step, action])
         self.current_step += 1
 
         steps_taken = self.current_step - self.episode_start
-        done = steps_taken >= self.episode_length or self.current_step >= len(self.df) - 1
+        done = steps_taken >= self.episode_length or self.current_step >= self.n_rows - 1
         obs  = self._get_obs() if not done else np.zeros(1028, dtype=np.float32)
         return obs, float(reward), done, False, {}
 
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         # Random start: pick any position that leaves room for a full episode
-        max_start = max(0, len(self.df) - self.episode_length - 1)
+        max_start = max(0, self.n_rows - self.episode_length - 1)
         self.episode_start = int(self.np_random.integers(0, max_start + 1))
         self.current_step  = self.episode_start
         self.prev_action   = 0
         self.prev_conf     = 0.5
         return self._get_obs(), {}
+
+
+class WindowedInferenceEnv(AdaptiveInferenceEnv):
+    """
+    Window-level variant: one step routes `window_size` consecutive frames
+    with the same model, mirroring the engine's window mode.
+
+    The observation is WindowBufferManager.build_observation() over the frames
+    of the window just processed (mean visual state, mean edge density, mean
+    confidence of the chosen model, object-count delta), and the reward is the
+    mean per-frame reward of the chosen model over the window minus the
+    switching penalty.  An episode covers episode_length frames.
+    """
+    def __init__(self, profile_path, window_size=None, resolutions=None):
+        super().__init__(profile_path, resolutions)
+        W = _load_params().get("window", {})
+        self.window_size = window_size or W.get("size", 10)
+        self.buffer      = WindowBufferManager(window_size=self.window_size, n_actions=self.n_actions)
+
+    def _push(self, row, action):
+        vis_feats, edge_val = self._frame_features(row)
+        self.buffer.add_frame_data(vis_feats, edge_val,
+                                   float(self.confs[row, action]), int(self.counts[row, action]))
+
+    def step(self, action):
+        action = int(action)
+        rows   = range(self.current_step, min(self.current_step + self.window_size, self.n_rows))
+        reward = float(self.rewards[rows.start:rows.stop, action].mean())
+        reward -= self.switching_penalty if action != self.prev_action else 0.0
+
+        for row in rows:
+            self._push(row, action)
+        self.prev_action = action
+        self.prev_conf   = float(self.confs[rows.stop - 1, action])
+        self.current_step = rows.stop
+
+        frames_taken = self.current_step - self.episode_start
+        done = (frames_taken >= self.episode_length
+                or self.current_step + self.window_size > self.n_rows)
+        obs  = self.buffer.build_observation(action) if not done else np.zeros(1028, dtype=np.float32)
+        return obs, reward, done, False, {}
+
+    def reset(self, seed=None, options=None):
+        gym.Env.reset(self, seed=seed)
+        max_start = max(0, self.n_rows - self.episode_length - 1)
+        self.episode_start = int(self.np_random.integers(0, max_start + 1))
+        self.prev_action   = 0
+        self.prev_conf     = 0.5
+        # Like a new serving session: the first frame runs on action 0 (Nano at
+        # the smallest profiled size), then the
+        # policy decides from a one-frame window.
+        self.buffer.clear()
+        self._push(self.episode_start, 0)
+        self.current_step = self.episode_start + 1
+        return self.buffer.build_observation(0), {}
@@ -1,6 +1,14 @@
 import cv2
 import numpy as np
 
+# cv2.imread flags that decode straight to grayscale at 1/N scale (libjpeg DCT scaling).
+# reduction=1 decodes in colour instead, see extract_from_file.
+_GRAY_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
 class FeatureExtractor:
     """
     Extracts lightweight features from a frame to act as RL Context.
@@ -15,7 +23,9 @@ class FeatureExtractor:
         """
         # 1. Convert to Grayscale
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
+        return self._visual_from_gray(gray)
+
+    def _visual_from_gray(self, gray):
         # 2. Downsample (32x32 is usually enough to sense 'clutter')
         resized = cv2.resize(gray, self.resize_dim, interpolation=cv2.INTER_AREA)
         
@@ -27,9 +37,32 @@ class FeatureExtractor:
         Calculates Canny edge density as a proxy for scene complexity.
         """
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return np.array([self._edge_density_from_gray(gray)], dtype=np.float32)
+
+    @staticmethod
+    def _edge_density_from_gray(gray):
         edges = cv2.Canny(gray, 100, 200)
-        density = np.sum(edges > 0) / (edges.shape[0] * edges.shape[1])
-        return np.array([density], dtype=np.float32)
+        return np.count_nonzero(edges) / (edges.shape[0] * edges.shape[1])
+
+    def extract_from_file(self, path, reduction=1):
+        """
+        Decodes an image file directly to grayscale and returns
+        (visual_features (1024,), edge_density) — or None if unreadable.
+
+        reduction=1 decodes in colour and converts with cvtColor, exactly as
+        serving does, so the features match the engine's.  reduction > 1
+        uses libjpeg's scaled grayscale decode (1/2, 1/4, 1/8), which is much
+        cheaper but not identical: a grayscale decode differs slightly from
+        cvtColor, and edge density is measured at the reduced resolution.
+        """
+        if reduction == 1:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            gray = None if frame is None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = cv2.imread(path, _GRAY_DECODE_FLAGS[reduction])
+        if gray is None:
+            return None
+        return self._visual_from_gray(gray), float(self._edge_density_from_gray(gray))
 
     def construct_state(self, visual_vec, edge_val, metadata):
         """
@@ -0,0 +1,140 @@
+"""
+gating.py — early-exit confidence gating: run Nano, escalate only when unsure.
+
+Instead of predicting the tier before any detector has run (the PPO policy),
+the gate always runs Nano and decides from its actual output whether to
+re-run the whole frame on Small or Large:
+
+    no detections                          → empty_action
+    conf < large_conf  or density > large_density → Large
+    conf < small_conf                      → Small
+    otherwise                              → keep Nano's result
+
+where conf is Nano's mean box confidence, count its box count and density
+the count per megapixel of the frame — the columns every profile already
+has (n_conf, n_count, width × height), so the same rule runs offline on
+the profile and live in the engine.
+
+fit_gate() learns the thresholds on profile rows by grid search over
+feature quantiles, maximising the blended score of core/scoring.py on the
+gate's outcomes: an escalated frame gets the final model's confidence and
+count but pays Nano's latency plus its own.
+"""
+import itertools
+import json
+import os
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from core.scoring import score_matrix
+
+N_TIERS = 3   # outcomes: 0 = Nano, 1 = Nano → Small, 2 = Nano → Large
+
+
+@dataclass(frozen=True)
+class ConfidenceGate:
+    small_conf: float = 0.5            # escalate to Small below this mean confidence
+    large_conf: float = 0.0            # … straight to Large below this one (≤ small_conf)
+    large_density: float = np.inf      # … or to Large above this many boxes per megapixel
+    empty_action: int = 0              # tier for frames where Nano finds nothing
+
+    def decide(self, conf, count, megapixels):
+        """Vectorised tier (0 / 1 / 2) per frame from Nano's mean conf, box count and frame size."""
+        conf    = np.asarray(conf, dtype=np.float64)
+        count   = np.asarray(count, dtype=np.float64)
+        density = count / np.maximum(np.asarray(megapixels, dtype=np.float64), 1e-6)
+        tier = np.where((conf < self.large_conf) | (density > self.large_density), 2,
+                        np.where(conf < self.small_conf, 1, 0))
+        return np.where(count == 0, self.empty_action, tier).astype(np.int64)
+
+    def decide_one(self, conf, count, frame_shape):
+        """Tier for one served frame; frame_shape is (height, width, …)."""
+        megapixels = frame_shape[0] * frame_shape[1] / 1e6
+        return int(self.decide(conf, count, megapixels))
+
+    def to_dict(self):
+        d = asdict(self)
+        d["large_density"] = None if np.isinf(self.large_density) else float(self.large_density)
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        density = d.get("large_density")
+        return cls(small_conf=float(d["small_conf"]), large_conf=float(d["large_conf"]),
+                   large_density=np.inf if density is None else float(density),
+                   empty_action=int(d.get("empty_action", 0)))
+
+
+def gate_outcomes(conf, lat, count):
+    """
+    (N, 3) conf / latency / count of the gate's three outcomes from (N, 3)
+    per-model profile matrices (Nano, Small, Large): escalations add
+    Nano's latency to the model that produces the final result.
+    """
+    lat = lat.copy()
+    lat[:, 1:] += lat[:, :1]
+    return conf, lat, count
+
+
+def gate_scores(conf, lat, count, w_quality=0.84, w_efficiency=0.16):
+    """Blended score (core/scoring.py) of each gate outcome, (N, 3)."""
+    return score_matrix(*gate_outcomes(conf, lat, count), w_quality, w_efficiency)
+
+
+def _candidates(values, n_quantiles):
+    qs = np.quantile(values, np.linspace(0.0, 1.0, n_quantiles)) if len(values) else np.array([])
+    return np.unique(np.concatenate([[0.0], qs]))
+
+
+def fit_gate(conf, lat, count, megapixels, w_quality=0.84, w_efficiency=0.16,
+             n_quantiles=21, density_quantiles=(0.8, 0.9, 0.95, 0.98, 0.99)):
+    """
+    Thresholds maximising the mean gate-outcome score over the given rows.
+
+    conf, lat, count: (N, 3) profile matrices (Nano, Small, Large);
+    megapixels: (N,) frame sizes.  Returns (ConfidenceGate, mean score).
+    """
+    scores  = gate_scores(conf, lat, count, w_quality, w_efficiency)
+    n_conf  = conf[:, 0]
+    n_count = count[:, 0]
+    empty   = n_count == 0
+    density = n_count / np.maximum(megapixels, 1e-6)
+
+    # Empty frames never reach the confidence rule, so their tier is chosen on its own
+    empty_action = int(scores[empty].mean(axis=0).argmax()) if empty.any() else 0
+
+    busy       = ~empty
+    s_busy     = scores[busy]
+    conf_cands = _candidates(n_conf[busy], n_quantiles)
+    dens_cands = np.unique(np.concatenate(
+        [np.quantile(density[busy], density_quantiles) if busy.any() else [], [np.inf]]))
+
+    rows = np.arange(int(busy.sum()))
+    best, best_score = None, -np.inf
+    for small, large, dens in itertools.product(conf_cands, conf_cands, dens_cands):
+        if large > small:
+            continue
+        gate = ConfidenceGate(small, large, dens, empty_action)
+        tier = gate.decide(n_conf[busy], n_count[busy], megapixels[busy])
+        score = s_busy[rows, tier].sum()
+        if score > best_score:
+            best, best_score = gate, score
+
+    if best is None:
+        best, best_score = ConfidenceGate(empty_action=empty_action), 0.0
+    total = best_score + (scores[empty, empty_action].sum() if empty.any() else 0.0)
+    return best, float(total / max(len(n_conf), 1))
+
+
+def save_gate(gate, path, meta=None):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({**(meta or {}), "gate": gate.to_dict()}, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_gate(path):
+    with open(path) as f:
+        return ConfidenceGate.from_dict(json.load(f)["gate"])
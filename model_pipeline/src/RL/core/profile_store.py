@@ -0,0 +1,124 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from core.actions import MODEL_KEYS, metric_columns
+
+METRIC_COLUMNS = metric_columns(MODEL_KEYS)
+
+# Typed schema: float32 metrics, int16 counts/dims, dictionary-encoded paths
+_COLUMN_TYPES = {"path": pa.dictionary(pa.int32(), pa.string()),
+                 "width": pa.int16(), "height": pa.int16()}
+_METRIC_TYPES = {"conf": pa.float32(), "time": pa.float32(), "count": pa.int16()}
+
+_ROOT_KEY = b"image_root"
+# The stored image root is relative to the RL root, so a profile pulled from the
+# DVC remote resolves against the reader's checkout, not the writer's.
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _column_type(col):
+    """Arrow type of a profile column; metric columns are typed by suffix, for any action key."""
+    if col in _COLUMN_TYPES:
+        return _COLUMN_TYPES[col]
+    return _METRIC_TYPES.get(col.rsplit("_", 1)[-1])
+
+
+def write_profile(df, path, image_root=None):
+    """
+    Writes the profile as an uncompressed Arrow IPC file.
+
+    Uncompressed IPC can be memory-mapped, so every training worker that opens
+    the file shares the same page-cache pages instead of holding its own copy.
+    When image_root is given, paths are stored relative to it, and the root
+    itself is stored relative to the RL root; readers resolve both again.
+    """
+    df = df.copy()
+    if image_root is not None:
+        df["path"] = [os.path.relpath(p, image_root) for p in df["path"]]
+
+    fields, arrays = [], []
+    for col in df.columns:
+        typ = _column_type(col)
+        if col == "path":
+            arr = pa.array(df[col].astype(str), type=pa.string()).dictionary_encode()
+        else:
+            arr = pa.array(df[col].to_numpy(), type=typ)
+        fields.append(pa.field(col, arr.type))
+        arrays.append(arr)
+
+    metadata = ({_ROOT_KEY: os.path.relpath(image_root, _RL_ROOT).encode()}
+                if image_root is not None else None)
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def open_profile(path, columns=None):
+    """
+    Returns the profile as a pyarrow Table restricted to `columns`.
+
+    Arrow files are memory-mapped (zero-copy); legacy CSV profiles are parsed
+    with only the requested columns and cast to the same schema.
+    """
+    if path.endswith(".csv"):
+        df = pd.read_csv(path, usecols=columns)
+        for col in df.columns:
+            typ = _column_type(col)
+            if typ is not None and col != "path":
+                df[col] = df[col].astype(typ.to_pandas_dtype())
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if "path" in table.column_names:
+            idx = table.column_names.index("path")
+            table = table.set_column(idx, "path", table.column("path").dictionary_encode())
+        return table
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
+
+
+def _image_root(table):
+    """The profile's image root in this checkout (older profiles stored it absolute)."""
+    metadata = table.schema.metadata or {}
+    root = metadata.get(_ROOT_KEY)
+    if root is None:
+        return None
+    return os.path.normpath(os.path.join(_RL_ROOT, root.decode()))
+
+
+def read_profile(path, columns=None, image_root=None):
+    """
+    Loads the profile as a DataFrame with absolute image paths (categorical).
+    Relative paths resolve against image_root, by default the root recorded
+    at write time, taken relative to this checkout's RL root.
+    """
+    table = open_profile(path, columns)
+    df    = table.to_pandas()
+    root  = image_root or _image_root(table)
+    if "path" in df.columns and root is not None:
+        df["path"] = df["path"].cat.rename_categories(lambda p: os.path.join(root, p))
+    return df
+
+
+def read_profile_arrays(path, columns):
+    """
+    Returns {column: np.ndarray} for numeric columns.
+
+    Arrays from an Arrow file are read-only views into the memory map, so
+    workers that open the same file share one physical copy.
+    """
+    table = open_profile(path, columns)
+    out = {}
+    for col in columns:
+        chunked = table.column(col)
+        arr = chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+        out[col] = arr.to_numpy(zero_copy_only=False)
+    return out
@@ -0,0 +1,38 @@
+import threading
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    Bounded, thread-safe store of (observation, action, confidence, latency)
+    tuples backed by preallocated NumPy arrays. Once full, the oldest entries
+    are overwritten.
+    """
+    def __init__(self, capacity=10000, obs_dim=1028):
+        self.capacity = capacity
+        self.obs       = np.zeros((capacity, obs_dim), dtype=np.float32)
+        self.actions   = np.zeros(capacity, dtype=np.int64)
+        self.confs     = np.zeros(capacity, dtype=np.float32)
+        self.latencies = np.zeros(capacity, dtype=np.float32)   # seconds
+        self.total_added = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total_added, self.capacity)
+
+    def add(self, obs, action, confidence, latency):
+        with self._lock:
+            i = self.total_added % self.capacity
+            self.obs[i]       = obs
+            self.actions[i]   = action
+            self.confs[i]     = confidence
+            self.latencies[i] = latency
+            self.total_added += 1
+
+    def sample(self, batch_size, rng=None):
+        """Uniform sample (with replacement) returned as copies: obs, actions, confs, latencies."""
+        rng = rng or np.random.default_rng()
+        with self._lock:
+            idx = rng.integers(0, len(self), size=batch_size)
+            return (self.obs[idx], self.actions[idx],
+                    self.confs[idx], self.latencies[idx])
@@ -35,4 +35,19 @@ class RewardCalculator:
 
         total_reward = acc_reward - lat_penalty - switch_penalty
         
-        return total_reward
\ No newline at end of file
+        return total_reward
+
+    def calculate_batch(self, accuracy, latency, did_switch=None):
+        """
+        Vectorised calculate() over arrays of per-sample accuracy / latency (s).
+        did_switch defaults to no switch for every sample.
+        """
+        accuracy = np.asarray(accuracy, dtype=np.float64)
+        latency  = np.asarray(latency,  dtype=np.float64)
+
+        acc_reward = np.where(accuracy >= 0.90, accuracy, accuracy * 0.5)
+        ratio      = latency / self.latency_budget
+        lat_penalty = self.alpha * np.where(latency > self.latency_budget, ratio ** 2, ratio)
+        switch_penalty = 0.0 if did_switch is None else self.beta * np.asarray(did_switch, dtype=np.float64)
+
+        return acc_reward - lat_penalty - switch_penalty
\ No newline at end of file
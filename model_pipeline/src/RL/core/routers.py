@@ -0,0 +1,189 @@
+"""
+routers.py — compact student routers distilled from the BC/PPO policy.
+
+Every router takes the same 1028-dim observation as the PPO policy
+(environment.py → _get_obs) and returns one logit per routing action (Nano,
+Small, Large — or n_actions for a (model, resolution) grid, core/actions.py),
+so a saved router is a drop-in replacement for the PPO .zip in the engine:
+
+    pooled  — 32×32 thumbnail average-pooled to 8×8 (64) + 4 scalars → small MLP
+    pca     — thumbnail projected onto k principal components + 4 scalars → small MLP
+    conv    — depthwise-separable conv over the thumbnail, global pool + 4 scalars → linear
+
+Saved files are plain torch checkpoints: {"kind", "config", "state_dict"}.
+The MLP students also export a pure-NumPy forward pass, which RouterPolicy
+uses for deterministic decisions — a handful of small matmuls instead of a
+torch dispatch per layer.
+"""
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+VIS_DIM   = 1024      # 32×32 thumbnail
+THUMB     = 32
+N_SCALARS = 4         # edge density ×10, prev_action/(n_actions−1), prev_conf, pad
+N_ACTIONS = 3         # legacy grid; saved configs carry n_actions otherwise
+
+
+def _split(obs):
+    return obs[:, :VIS_DIM], obs[:, VIS_DIM:VIS_DIM + N_SCALARS]
+
+
+def _np(t):
+    return t.detach().cpu().numpy().astype(np.float32)
+
+
+class PooledRouter(nn.Module):
+    """4×4 average pooling of the thumbnail (→ 8×8) followed by a one-hidden-layer MLP."""
+
+    def __init__(self, hidden=32, n_actions=N_ACTIONS):
+        super().__init__()
+        self.n_actions = n_actions
+        self.net = nn.Sequential(
+            nn.Linear(64 + N_SCALARS, hidden), nn.ReLU(),
+            nn.Linear(hidden, n_actions),
+        )
+
+    def forward(self, obs):
+        vis, scalars = _split(obs)
+        pooled = F.avg_pool2d(vis.reshape(-1, 1, THUMB, THUMB), 4).flatten(1)
+        return self.net(torch.cat([pooled, scalars], dim=1))
+
+    def numpy_forward(self):
+        """Returns f(obs (B, 1028) ndarray) → logits (B, n_actions) with frozen weights."""
+        w1, b1 = _np(self.net[0].weight), _np(self.net[0].bias)
+        w2, b2 = _np(self.net[2].weight), _np(self.net[2].bias)
+        w_vis, w_sc = w1[:, :64].T.copy(), w1[:, 64:].T.copy()
+
+        def forward(obs):
+            vis    = obs[:, :VIS_DIM].reshape(-1, 8, 4, 8, 4).mean(axis=(2, 4)).reshape(-1, 64)
+            hidden = np.maximum(vis @ w_vis + obs[:, VIS_DIM:VIS_DIM + N_SCALARS] @ w_sc + b1, 0.0)
+            return hidden @ w2.T + b2
+        return forward
+
+
+class PCARouter(nn.Module):
+    """
+    Projects the thumbnail onto `n_components` principal components (fixed
+    buffers, fitted once with fit_pca) followed by a one-hidden-layer MLP.
+    """
+
+    def __init__(self, n_components=32, hidden=32, n_actions=N_ACTIONS):
+        super().__init__()
+        self.n_actions = n_actions
+        self.register_buffer("mean",       torch.zeros(VIS_DIM))
+        self.register_buffer("components", torch.zeros(n_components, VIS_DIM))
+        self.net = nn.Sequential(
+            nn.Linear(n_components + N_SCALARS, hidden), nn.ReLU(),
+            nn.Linear(hidden, n_actions),
+        )
+
+    def fit_pca(self, vis):
+        """vis: (N, 1024) array of thumbnails from the training split."""
+        vis  = np.asarray(vis, dtype=np.float64)
+        mean = vis.mean(axis=0)
+        _, _, vt = np.linalg.svd(vis - mean, full_matrices=False)
+        k = self.components.shape[0]
+        self.mean.copy_(torch.from_numpy(mean).float())
+        self.components.copy_(torch.from_numpy(vt[:k]).float())
+
+    def forward(self, obs):
+        vis, scalars = _split(obs)
+        proj = (vis - self.mean) @ self.components.T
+        return self.net(torch.cat([proj, scalars], dim=1))
+
+    def numpy_forward(self):
+        """
+        Returns f(obs (B, 1028) ndarray) → logits (B, n_actions). The projection is
+        folded into the first layer: W·C·(v − m) = (W·C)·v − (W·C)·m.
+        """
+        k = self.components.shape[0]
+        w1, b1 = _np(self.net[0].weight), _np(self.net[0].bias)
+        w2, b2 = _np(self.net[2].weight), _np(self.net[2].bias)
+        w_vis = w1[:, :k] @ _np(self.components)          # (hidden, 1024)
+        b_vis = b1 - w_vis @ _np(self.mean)
+        w_vis, w_sc = w_vis.T.copy(), w1[:, k:].T.copy()
+
+        def forward(obs):
+            hidden = np.maximum(obs[:, :VIS_DIM] @ w_vis + obs[:, VIS_DIM:VIS_DIM + N_SCALARS] @ w_sc + b_vis, 0.0)
+            return hidden @ w2.T + b2
+        return forward
+
+
+class ConvRouter(nn.Module):
+    """Strided stem → depthwise 3×3 → pointwise 1×1 → global average pool → linear."""
+
+    def __init__(self, channels=8, hidden=16, n_actions=N_ACTIONS):
+        super().__init__()
+        self.n_actions = n_actions
+        self.features = nn.Sequential(
+            nn.Conv2d(1, channels, 3, stride=2, padding=1), nn.ReLU(),                   # 16×16
+            nn.Conv2d(channels, channels, 3, stride=2, padding=1, groups=channels),      # 8×8
+            nn.Conv2d(channels, hidden, 1), nn.ReLU(),
+            nn.AdaptiveAvgPool2d(1),
+        )
+        self.head = nn.Linear(hidden + N_SCALARS, n_actions)
+
+    def forward(self, obs):
+        vis, scalars = _split(obs)
+        feats = self.features(vis.reshape(-1, 1, THUMB, THUMB)).flatten(1)
+        return self.head(torch.cat([feats, scalars], dim=1))
+
+
+ROUTER_KINDS = {
+    "pooled": PooledRouter,
+    "pca":    PCARouter,
+    "conv":   ConvRouter,
+}
+
+
+def build_router(kind, **config):
+    if kind not in ROUTER_KINDS:
+        raise ValueError(f"Unknown router kind '{kind}'. Choose from {sorted(ROUTER_KINDS)}")
+    return ROUTER_KINDS[kind](**config)
+
+
+def save_router(model, path, kind, **config):
+    torch.save({"kind": kind, "config": config, "state_dict": model.state_dict()}, path)
+    return path
+
+
+class RouterPolicy:
+    """
+    Wraps a student router with the subset of the SB3 policy API the serving
+    engine and evaluation scripts use: predict(obs, deterministic) → (action, None).
+    """
+
+    def __init__(self, model, kind):
+        self.model     = model.eval()
+        self.kind      = kind
+        self.n_actions = model.n_actions
+        self._forward = model.numpy_forward() if hasattr(model, "numpy_forward") else None
+
+    def predict(self, obs, deterministic=True):
+        obs    = np.asarray(obs, dtype=np.float32)
+        single = obs.ndim == 1
+        if single:
+            obs = obs[None, :]
+        if deterministic and self._forward is not None:
+            actions = self._forward(obs).argmax(axis=1)
+            return (actions[0] if single else actions), None
+
+        x = torch.from_numpy(np.array(obs))          # writable copy; memmap rows are read-only
+        with torch.inference_mode():
+            logits = self.model(x)
+            if deterministic:
+                actions = logits.argmax(dim=1)
+            else:
+                actions = torch.distributions.Categorical(logits=logits).sample()
+        actions = actions.numpy()
+        return (actions[0] if single else actions), None
+
+
+def load_router(path):
+    """Loads a saved student router as a RouterPolicy (CPU)."""
+    ckpt  = torch.load(path, map_location="cpu")
+    model = build_router(ckpt["kind"], **ckpt.get("config", {}))
+    model.load_state_dict(ckpt["state_dict"])
+    return RouterPolicy(model, ckpt["kind"])
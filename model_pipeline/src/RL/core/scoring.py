@@ -0,0 +1,59 @@
+import numpy as np
+from collections import namedtuple
+
+from core.actions import MODEL_KEYS
+
+EPS        = 1e-8
+MIN_SPREAD = 0.01   # below this score spread all models count as equivalent (reward 0.5)
+
+ProfileScores = namedtuple("ProfileScores", ["scores", "labels", "rewards"])
+
+
+def stack_metrics(source, keys=MODEL_KEYS):
+    """
+    Builds the (N, A) conf, latency and count matrices from a profile
+    DataFrame or a {column: array} dict, one column per action key — by
+    default (Nano, Small, Large); pass [a.key for a in core.actions.action_grid(...)] for
+    the (model, resolution) grid.
+    """
+    conf  = np.column_stack([np.asarray(source[f"{k}_conf"],  dtype=np.float64) for k in keys])
+    lat   = np.column_stack([np.asarray(source[f"{k}_time"],  dtype=np.float64) for k in keys])
+    count = np.column_stack([np.asarray(source[f"{k}_count"], dtype=np.float64) for k in keys])
+    return conf, lat, count
+
+
+def score_matrix(conf, lat, count, w_quality=0.84, w_efficiency=0.16):
+    """
+    Per-action blended score, (N, A):
+        quality    = conf × √(count + 1)
+        efficiency = quality / latency
+        score      = w_q · quality / max(quality) + w_e · efficiency / max(efficiency)
+    where both maxima are taken per row (over the actions).
+    """
+    quality    = conf * np.sqrt(count + 1)
+    efficiency = quality / (lat + EPS)
+    q_max      = quality.max(axis=1, keepdims=True)    + EPS
+    eff_max    = efficiency.max(axis=1, keepdims=True) + EPS
+    return w_quality * (quality / q_max) + w_efficiency * (efficiency / eff_max)
+
+
+def rank_normalized_rewards(scores, min_spread=MIN_SPREAD):
+    """
+    Maps each row of scores to [0, 1]: 1.0 = best model this row, 0.0 = worst.
+    Rows whose spread is <= min_spread get 0.5 for every model.
+    """
+    s_min  = scores.min(axis=1, keepdims=True)
+    spread = scores.max(axis=1, keepdims=True) - s_min
+    flat   = spread <= min_spread
+    rewards = (scores - s_min) / np.where(flat, 1.0, spread)
+    return np.where(flat, 0.5, rewards)
+
+
+def score_profile(conf, lat, count, w_quality=0.84, w_efficiency=0.16, min_spread=MIN_SPREAD):
+    """Score matrix, optimal-action labels and rank-normalised rewards in one pass."""
+    scores = score_matrix(conf, lat, count, w_quality, w_efficiency)
+    return ProfileScores(
+        scores=scores,
+        labels=scores.argmax(axis=1).astype(np.int64),
+        rewards=rank_normalized_rewards(scores, min_spread),
+    )
@@ -1,3 +1,11 @@
+"""
+Exports yolov8{n,s,l}.pt to .onnx for the serving engine's onnxruntime tiers.
+
+The exports have dynamic batch / height / width axes, so one graph per tier
+serves every input size of the (model, resolution) action grid
+(ROUTING_RESOLUTIONS / profile.resolutions) — OrtYOLO letterboxes each size
+into its own buffer and rejects non-default sizes on static exports.
+"""
 import torch
 
 _orig_load = torch.load
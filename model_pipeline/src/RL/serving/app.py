@@ -7,7 +7,15 @@ GET  /health          — liveness probe (always 200 if process is alive)
 GET  /health/startup  — startup probe (200 after engine fully loaded + warmed up)
 GET  /health/ready    — readiness probe (200 when engine is ready to serve)
 GET  /metrics         — Prometheus metrics (latency, model selection, frame count)
+GET  /switch_costs    — measured model-switch cost per variant (JSON)
+GET  /pools           — per-tier worker pools (device, workers, queue depth, wait times) and
+                        per-device queue depth / backlog (JSON)
+POST /admin/profile   — time-bounded profiling of the live process (zip); needs
+                        header X-Admin-Token = ADMIN_TOKEN, disabled when unset
+                        query: ?duration_s=10&mode=sampling|cprofile&torch_ops=1
+                               &thread_prefix=ThreadPoolExecutor
 WS   /ws/stream       — streaming inference over WebSocket
+                        optional query params: ?mode=frame|window&window=<frames>
 
 WebSocket protocol
 ------------------
@@ -15,7 +23,7 @@ Client → Server : JSON  {"frame": "<base64 JPEG>", "baseline_model": "Nano"|"S
 Server → Client : JSON packet:
     {
         "adaptive": {
-            "model_name":     "Nano" | "Small" | "Large",
+            "model_name":     "Nano" | "Small" | "Large" (| "Nano@320" … with ROUTING_RESOLUTIONS),
             "detections":     [{bbox, confidence, class_id, class_name}, …],
             "latency_ms":     float,
             "object_count":   int,
@@ -26,11 +34,46 @@ Server → Client : JSON packet:
 
 Environment variables
 ---------------------
-RL_MODEL_PATH      path to PPO .zip  (default: models/PPO_v6/final_adaptive_model.zip)
+RL_MODEL_PATH      path to PPO .zip or distilled router .pt
+                   (default: models/PPO_v6/final_adaptive_model.zip)
 YOLO_N_PATH        yolov8n.pt        (default: yolov8n.pt)
 YOLO_S_PATH        yolov8s.pt        (default: yolov8s.pt)
 YOLO_L_PATH        yolov8l.pt        (default: yolov8l.pt)
-INFERENCE_DEVICE   cuda | cpu        (default: cuda)
+INFERENCE_DEVICE   cuda | cpu        (default: cuda if available)
+TIER_DEVICES       per-tier placement (default: auto — Nano on CPU, Small / Large on
+                   INFERENCE_DEVICE when it is a GPU); a single device for all tiers,
+                   or e.g. Nano=cpu,Small=cuda:0,Large=cuda:1 — see serving/placement.py
+TIER_WORKERS       concurrent workers (model replicas) per tier pool, e.g. Nano=2 (default: 1)
+TIER_THREADS       intra-op threads per tier pool, e.g. Nano=2,Large=6 (default: 0 = share of
+                   ORT_THREAD_BUDGET)
+TIER_MAX_QUEUE     frames allowed to wait per tier pool before it sheds them (default: 0 = unbounded)
+MAX_QUEUE_WAIT_MS  re-route a frame to the same-size action with the shortest expected latency
+                   when its own pool's expected queue wait exceeds this (default: 0 = off)
+JPEG_DECODER       auto | opencv | turbojpeg (default: auto — turbojpeg when PyTurboJPEG and
+                   libjpeg-turbo are installed) — see serving/decode.py
+REDUCED_DECODE     1 = decode JPEGs at 1/2, 1/4 or 1/8 scale when their long side is at least
+                   twice the largest input size; boxes are returned in client pixels, but the
+                   router's features are measured on the reduced frame (default: 0 = off)
+ROUTING_MODE       frame | window    (default: frame) — per-session default, see engine.RoutingSession
+WINDOW_SIZE        frames per routing window in window mode (default: 10)
+KEEP_WARM_INTERVAL_S  run a keep-warm pass on variants idle this long (default: 0 = off)
+TRACE_SAMPLE_RATE  share of frames traced stage by stage (default: 0.01; 0 = off)
+TRACE_EXPORT_PATH  append sampled traces as OTLP/JSON lines to this file (default: unset)
+TRACE_OTLP_ENDPOINT  POST sampled traces to an OTLP/HTTP collector, e.g.
+                   http://otel-collector:4318/v1/traces (default: unset)
+ADMIN_TOKEN        shared secret for /admin/* endpoints (default: unset — admin disabled)
+PROFILE_MAX_DURATION_S  upper bound on one profiling session (default: 120)
+MLFLOW_SPILL_PATH  where session summaries are kept while MLflow is unreachable
+                   (default: logs/mlflow_spill.jsonl under the RL root)
+
+Online learning (opt-in)
+ONLINE_LEARNING            1 = route with a NeuralBanditAgent retrained from live feedback
+BANDIT_MODEL_PATH          initial bandit weights (default: models/rl_bandit_v1.pth if present)
+ONLINE_SAMPLE_RATE         share of routing decisions written to the replay buffer (default: 0.25)
+ONLINE_BUFFER_SIZE         replay buffer capacity (default: 10000)
+ONLINE_BATCH_SIZE          mini-batch size per update (default: 64)
+ONLINE_PUBLISH_INTERVAL_S  seconds between weight publications (default: 30)
+ONLINE_CHECKPOINT_PATH     where published weights are saved (default: unset — not saved)
 
 Run from the RL root directory:
     uvicorn serving.app:app --host 0.0.0.0 --port 8000
@@ -49,15 +92,14 @@ if _RL_ROOT not in sys.path:
     sys.path.insert(0, _RL_ROOT)
 
 import asyncio
-import base64
+import hmac
 import json
+import time
 from contextlib import asynccontextmanager
 from functools import partial
 from typing import Any, Dict
 
-import cv2
-import numpy as np
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import (
     Counter,
@@ -70,6 +112,14 @@ from pythonjsonlogger import jsonlogger
 
 # engine.py applies the PyTorch patch at import time — import before SB3/YOLO
 from serving.engine import AdaptiveInferenceSystem
+from serving.backends import OrtRuntime
+from serving.decode import FrameDecoder, resolve_jpeg_decoder
+from serving.mlflow_writer import MlflowWriter
+from serving.online_learning import OnlineLearner
+from serving.placement import parse_tier_devices
+from serving.worker_pools import PoolFull, parse_pool_configs
+from serving.profiling import PROFILE_MODES, ProfileSession
+from serving.tracing import OtlpExporter, Tracer
 from serving.tracking import SessionTracker
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -89,7 +139,8 @@ log = logging.getLogger("adaptive_inference")
 # ──────────────────────────────────────────────────────────────────────────────
 # Configuration (via environment variables with sensible defaults)
 # ──────────────────────────────────────────────────────────────────────────────
-RL_MODEL_PATH = os.path.join(_RL_ROOT, "models", "PPO_v6", "final_adaptive_model")
+RL_MODEL_PATH = os.getenv("RL_MODEL_PATH",
+                          os.path.join(_RL_ROOT, "models", "PPO_v6", "final_adaptive_model"))
 YOLO_N_PATH   = os.getenv("YOLO_N_PATH",   "yolov8n.pt")
 YOLO_S_PATH   = os.getenv("YOLO_S_PATH",   "yolov8s.pt")
 YOLO_L_PATH   = os.getenv("YOLO_L_PATH",   "yolov8l.pt")
@@ -97,6 +148,45 @@ DEVICE = os.getenv("INFERENCE_DEVICE")
 
 if DEVICE is None:
     DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+TIER_DEVICES = parse_tier_devices(os.getenv("TIER_DEVICES", "auto"), DEVICE, torch.cuda.is_available())
+TIER_POOLS = parse_pool_configs(os.getenv("TIER_WORKERS"), os.getenv("TIER_MAX_QUEUE"), os.getenv("TIER_THREADS"))
+MAX_QUEUE_WAIT_MS = float(os.getenv("MAX_QUEUE_WAIT_MS", "0"))
+JPEG_DECODER   = resolve_jpeg_decoder(os.getenv("JPEG_DECODER", "auto"))
+REDUCED_DECODE = os.getenv("REDUCED_DECODE", "0") == "1"
+
+ROUTING_MODE = os.getenv("ROUTING_MODE", "frame")
+WINDOW_SIZE  = int(os.getenv("WINDOW_SIZE", "10"))
+KEEP_WARM_INTERVAL_S = float(os.getenv("KEEP_WARM_INTERVAL_S", "0"))
+# Input sizes of the (model, resolution) action grid — must match profile.resolutions
+ROUTING_RESOLUTIONS = [int(r) for r in os.getenv("ROUTING_RESOLUTIONS", "640").split(",") if r.strip()]
+ROUTING_STRATEGY = os.getenv("ROUTING_STRATEGY", "policy")      # policy | gate
+# Written by training/evaluate_gating.py; gate defaults are used if missing
+GATE_PATH = os.getenv("GATE_PATH", os.path.join(_RL_ROOT, "models", "gate.json"))
+# Written by training/benchmark_backends.py; used only if the file exists
+BACKEND_CONFIG_PATH = os.getenv("BACKEND_CONFIG_PATH",
+                                os.path.join(_RL_ROOT, "models", "backend_config.json"))
+ORT_THREAD_BUDGET   = int(os.getenv("ORT_THREAD_BUDGET", "0"))   # 0 = usable CPUs
+ORT_ALLOW_SPINNING  = os.getenv("ORT_ALLOW_SPINNING", "0") == "1"
+ORT_ARENA           = os.getenv("ORT_ARENA", "shared")            # shared | session | off
+ORT_ARENA_EXTEND    = os.getenv("ORT_ARENA_EXTEND", "same_as_requested")
+ORT_ARENA_MAX_MB    = int(os.getenv("ORT_ARENA_MAX_MB", "0"))
+ORT_IO_BINDING      = os.getenv("ORT_IO_BINDING", "1") == "1"
+TRACE_SAMPLE_RATE   = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_EXPORT_PATH   = os.getenv("TRACE_EXPORT_PATH")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT")
+ADMIN_TOKEN            = os.getenv("ADMIN_TOKEN")
+PROFILE_MAX_DURATION_S = float(os.getenv("PROFILE_MAX_DURATION_S", "120"))
+MLFLOW_SPILL_PATH = os.getenv("MLFLOW_SPILL_PATH",
+                              os.path.join(_RL_ROOT, "logs", "mlflow_spill.jsonl"))
+
+ONLINE_LEARNING           = os.getenv("ONLINE_LEARNING", "0") == "1"
+BANDIT_MODEL_PATH         = os.getenv("BANDIT_MODEL_PATH",
+                                      os.path.join(_RL_ROOT, "models", "rl_bandit_v1.pth"))
+ONLINE_SAMPLE_RATE        = float(os.getenv("ONLINE_SAMPLE_RATE", "0.25"))
+ONLINE_BUFFER_SIZE        = int(os.getenv("ONLINE_BUFFER_SIZE", "10000"))
+ONLINE_BATCH_SIZE         = int(os.getenv("ONLINE_BATCH_SIZE", "64"))
+ONLINE_PUBLISH_INTERVAL_S = float(os.getenv("ONLINE_PUBLISH_INTERVAL_S", "30"))
+ONLINE_CHECKPOINT_PATH    = os.getenv("ONLINE_CHECKPOINT_PATH")
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Prometheus metrics
@@ -115,6 +205,12 @@ BASELINE_LATENCY = Histogram(
     "Baseline path inference latency in seconds",
     buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
 )
+STAGE_LATENCY = Histogram(
+    "adaptive_inference_stage_latency_seconds",
+    "Per-stage latency of sampled frames (see TRACE_SAMPLE_RATE)",
+    labelnames=["stage", "model"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+)
 MODEL_SELECTIONS = Counter(
     "adaptive_inference_model_selections_total",
     "Number of times each YOLO model was selected by the RL agent",
@@ -124,12 +220,88 @@ ACTIVE_CONNECTIONS = Gauge(
     "adaptive_inference_active_websocket_connections",
     "Number of currently active WebSocket connections",
 )
+MODEL_LATENCY_MEAN = Gauge(
+    "adaptive_inference_model_latency_mean_seconds",
+    "Mean adaptive-path latency per variant, first frame after a switch vs steady state",
+    labelnames=["model", "phase"],
+)
+SWITCH_COST = Gauge(
+    "adaptive_inference_switch_cost_seconds",
+    "Measured switch cost per variant (switch mean − steady mean)",
+    labelnames=["model"],
+)
+KEEP_WARM_PASSES = Gauge(
+    "adaptive_inference_keep_warm_passes",
+    "Keep-warm inference passes run per variant since startup",
+    labelnames=["model"],
+)
+POOL_QUEUE_DEPTH = Gauge(
+    "adaptive_inference_pool_queue_depth",
+    "Predict calls queued or running per tier pool",
+    labelnames=["model"],
+)
+POOL_QUEUE_WAIT = Gauge(
+    "adaptive_inference_pool_queue_wait_seconds",
+    "Queue wait of predict calls per tier pool since startup",
+    labelnames=["model", "stat"],
+)
+POOL_BUSY = Gauge(
+    "adaptive_inference_pool_busy_ratio",
+    "Share of a tier pool's worker time spent in predict calls since startup",
+    labelnames=["model"],
+)
+POOL_REJECTED = Gauge(
+    "adaptive_inference_pool_rejected",
+    "Predict calls a full tier pool refused since startup",
+    labelnames=["model"],
+)
+DEVICE_QUEUE_DEPTH = Gauge(
+    "adaptive_inference_device_queue_depth",
+    "Predict calls queued or running per device",
+    labelnames=["device"],
+)
+DEVICE_QUEUE_BACKLOG = Gauge(
+    "adaptive_inference_device_queue_backlog_seconds",
+    "Estimated work queued or running on the device's tier pools",
+    labelnames=["device"],
+)
+QUEUE_SPILLS = Gauge(
+    "adaptive_inference_queue_spills",
+    "Policy actions re-routed to another tier's pool since startup",
+    labelnames=["model"],
+)
+FRAMES_SHED = Counter(
+    "adaptive_inference_frames_shed_total",
+    "Frames dropped because the tier pools they needed were full",
+)
+ONLINE_BUFFER_SIZE_G = Gauge(
+    "adaptive_inference_online_buffer_size",
+    "Samples currently held in the online-learning replay buffer",
+)
+ONLINE_UPDATES = Gauge(
+    "adaptive_inference_online_updates",
+    "Mini-batch bandit updates run by the online trainer",
+)
+ONLINE_WEIGHTS_VERSION = Gauge(
+    "adaptive_inference_online_weights_version",
+    "Number of bandit weight publications since startup",
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Engine singleton — loaded once at startup, shared across all connections
 # ──────────────────────────────────────────────────────────────────────────────
 _engine: AdaptiveInferenceSystem | None = None
+_learner: OnlineLearner | None = None
+_mlflow_writer: MlflowWriter | None = None
+_trace_exporter = (OtlpExporter(path=TRACE_EXPORT_PATH, endpoint=TRACE_OTLP_ENDPOINT)
+                   if TRACE_EXPORT_PATH or TRACE_OTLP_ENDPOINT else None)
+_tracer = Tracer(
+    sample_rate=TRACE_SAMPLE_RATE,
+    observe=lambda stage, model, seconds: STAGE_LATENCY.labels(stage=stage, model=model).observe(seconds),
+    exporter=_trace_exporter,
+)
 _shutdown_requested: bool = False
+_profile_lock = asyncio.Lock()
 
 
 def _handle_sigterm(signum, frame):
@@ -144,21 +316,68 @@ signal.signal(signal.SIGTERM, _handle_sigterm)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _engine
+    global _engine, _learner, _mlflow_writer
     log.info("Loading AdaptiveInferenceSystem", extra={
         "rl_model_path": RL_MODEL_PATH,
         "device": DEVICE,
+        "tier_devices": TIER_DEVICES,
+        "jpeg_decoder": JPEG_DECODER,
+        "online_learning": ONLINE_LEARNING,
     })
+    if ONLINE_LEARNING:
+        _learner = OnlineLearner(
+            init_weights=BANDIT_MODEL_PATH if os.path.exists(BANDIT_MODEL_PATH) else None,
+            buffer_size=ONLINE_BUFFER_SIZE,
+            sample_rate=ONLINE_SAMPLE_RATE,
+            batch_size=ONLINE_BATCH_SIZE,
+            publish_interval_s=ONLINE_PUBLISH_INTERVAL_S,
+            checkpoint_path=ONLINE_CHECKPOINT_PATH,
+        )
     _engine = AdaptiveInferenceSystem(
         rl_model_path=RL_MODEL_PATH,
         yolo_n_path=YOLO_N_PATH,
         yolo_s_path=YOLO_S_PATH,
         yolo_l_path=YOLO_L_PATH,
         device=DEVICE,
+        online_learner=_learner,
+        routing_mode=ROUTING_MODE,
+        window_size=WINDOW_SIZE,
+        keep_warm_interval_s=KEEP_WARM_INTERVAL_S,
+        backend_config_path=BACKEND_CONFIG_PATH if os.path.exists(BACKEND_CONFIG_PATH) else None,
+        ort_runtime=OrtRuntime(
+            thread_budget=ORT_THREAD_BUDGET,
+            allow_spinning=ORT_ALLOW_SPINNING,
+            arena=ORT_ARENA,
+            arena_extend_strategy=ORT_ARENA_EXTEND,
+            arena_max_mb=ORT_ARENA_MAX_MB,
+            io_binding=ORT_IO_BINDING,
+        ),
+        resolutions=ROUTING_RESOLUTIONS,
+        routing_strategy=ROUTING_STRATEGY,
+        gate_path=GATE_PATH if os.path.exists(GATE_PATH) else None,
+        tier_devices=TIER_DEVICES,
+        pool_configs=TIER_POOLS,
+        max_queue_wait_ms=MAX_QUEUE_WAIT_MS,
     )
+    if _learner is not None:
+        _learner.start()
+        log.info("Online learner started", extra={"sample_rate": ONLINE_SAMPLE_RATE})
+    _mlflow_writer = MlflowWriter(spill_path=MLFLOW_SPILL_PATH)
+    _mlflow_writer.start()
+    if _trace_exporter is not None:
+        _trace_exporter.start()
     log.info("Engine ready — serving requests")
     yield
     log.info("Shutting down — engine teardown")
+    _engine.close()
+    log.info("Switch costs at shutdown", extra={"switch_costs": _engine.switch_costs.summary()})
+    if _learner is not None:
+        _learner.stop()
+        log.info("Online learner stopped", extra=_learner.stats())
+    _mlflow_writer.stop()
+    log.info("MLflow writer stopped", extra=_mlflow_writer.stats())
+    if _trace_exporter is not None:
+        _trace_exporter.stop()
 
 
 app = FastAPI(title="Adaptive ML Inference API", version="1.0.0", lifespan=lifespan)
@@ -174,21 +393,38 @@ app.add_middleware(
 # Helpers
 # ──────────────────────────────────────────────────────────────────────────────
 
-def _decode_frame(b64_payload: str) -> np.ndarray | None:
-    """Decode a raw base64 JPEG string into a BGR numpy array."""
-    try:
-        img_bytes = base64.b64decode(b64_payload)
-    except Exception:
+def _new_decoder() -> FrameDecoder:
+    """A stream's decoder, reducing to no less than the largest input size of the action grid."""
+    return FrameDecoder(target_size=max(a.imgsz for a in _engine.actions),
+                        reduced=REDUCED_DECODE, decoder=JPEG_DECODER)
+
+
+def _decode_and_infer(decoder: FrameDecoder, b64_payload: str, baseline_model_name: str,
+                      session, trace) -> Dict[str, Any] | None:
+    """
+    Runs on an executor thread: decodes the frame, then infers on it —
+    None if it cannot be decoded.  Decoding here keeps it off the event loop.
+    """
+    with trace.span("decode") as span:
+        decoded = decoder.decode(b64_payload)
+    if decoded is None:
         return None
-    arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    return frame  # None if imdecode fails
+    if trace.sampled:
+        span.attrs["decoder"] = decoder.decoder
+        span.attrs["scale"] = round(decoded.scale[0], 3)
+    return _engine.infer(decoded.image, baseline_model_name=baseline_model_name,
+                         session=session, trace=trace, source_shape=decoded.source_shape)
 
 
 def _error(msg: str) -> str:
     return json.dumps({"error": msg})
 
 
+def _mark_trace_error(trace, error: str) -> None:
+    if trace.sampled:
+        trace.attrs["error"] = error
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Health / probe routes
 # ──────────────────────────────────────────────────────────────────────────────
@@ -229,9 +465,114 @@ async def health_ready(response: Response) -> Dict[str, Any]:
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint scraped by the monitoring stack."""
+    if _engine is not None:
+        for model_name, row in _engine.switch_costs.summary().items():
+            for phase in ("switch", "steady"):
+                if row[f"{phase}_mean_ms"] is not None:
+                    MODEL_LATENCY_MEAN.labels(model=model_name, phase=phase).set(row[f"{phase}_mean_ms"] / 1000.0)
+            if row["switch_cost_ms"] is not None:
+                SWITCH_COST.labels(model=model_name).set(row["switch_cost_ms"] / 1000.0)
+            KEEP_WARM_PASSES.labels(model=model_name).set(row["keep_warm_passes"])
+        pools = _engine.pool_stats()
+        for model_name, row in pools["pools"].items():
+            POOL_QUEUE_DEPTH.labels(model=model_name).set(row["depth"])
+            for stat in ("mean", "p50", "p95"):
+                if row[f"wait_ms_{stat}"] is not None:
+                    POOL_QUEUE_WAIT.labels(model=model_name, stat=stat).set(row[f"wait_ms_{stat}"] / 1000.0)
+            POOL_BUSY.labels(model=model_name).set(row["busy_pct"] / 100.0)
+            POOL_REJECTED.labels(model=model_name).set(row["rejected"])
+        for device, row in pools["devices"].items():
+            DEVICE_QUEUE_DEPTH.labels(device=device).set(row["depth"])
+            DEVICE_QUEUE_BACKLOG.labels(device=device).set(row["backlog_ms"] / 1000.0)
+        for model_name, n in pools["queue_spills"].items():
+            QUEUE_SPILLS.labels(model=model_name).set(n)
+    if _learner is not None:
+        stats = _learner.stats()
+        ONLINE_BUFFER_SIZE_G.set(stats["buffer_size"])
+        ONLINE_UPDATES.set(stats["updates"])
+        ONLINE_WEIGHTS_VERSION.set(stats["weights_version"])
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
+@app.get("/switch_costs")
+async def switch_costs(response: Response) -> Dict[str, Any]:
+    """
+    Per-variant adaptive-path latency after a switch vs steady state.
+    Consumed by training/calibrate_switch_penalty.py.
+    """
+    if _engine is None:
+        response.status_code = 503
+        return {"status": "starting"}
+    return {
+        "keep_warm_interval_s": KEEP_WARM_INTERVAL_S,
+        "models": _engine.switch_costs.summary(),
+    }
+
+
+@app.get("/pools")
+async def pools(response: Response) -> Dict[str, Any]:
+    """Per-tier worker pools (device, workers, threads, queue depth and wait), per-device backlog and queue spills."""
+    if _engine is None:
+        response.status_code = 503
+        return {"status": "starting"}
+    return _engine.pool_stats()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Admin: on-demand profiling
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _check_admin(token: str | None) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if token is None or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/admin/profile")
+async def admin_profile(
+    duration_s: float = 10.0,
+    mode: str = "sampling",
+    torch_ops: bool = False,
+    thread_prefix: str | None = None,
+    x_admin_token: str | None = Header(default=None),
+):
+    """
+    Profiles the running process for duration_s while traffic keeps flowing
+    and returns a zip (see serving/profiling.py for its contents).
+    One session at a time; a concurrent request gets 409.
+    """
+    _check_admin(x_admin_token)
+    if _engine is None:
+        raise HTTPException(status_code=503, detail="Engine not ready")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {PROFILE_MODES}")
+    if not 0 < duration_s <= PROFILE_MAX_DURATION_S:
+        raise HTTPException(status_code=422,
+                            detail=f"duration_s must be in (0, {PROFILE_MAX_DURATION_S:g}]")
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+
+    async with _profile_lock:
+        session = ProfileSession(mode=mode, torch_ops=torch_ops, thread_prefix=thread_prefix)
+        log.info("Profiling session started", extra={
+            "mode": mode, "duration_s": duration_s, "torch_ops": torch_ops,
+        })
+        session.start()
+        _engine.profile_session = session
+        try:
+            await asyncio.sleep(duration_s)
+        finally:
+            _engine.profile_session = None
+            session.stop()
+        archive = await asyncio.get_running_loop().run_in_executor(None, session.archive)
+        log.info("Profiling session finished", extra={"mode": mode, "bytes": len(archive)})
+
+    filename = f"profile-{mode}-{time.strftime('%Y%m%dT%H%M%S')}.zip"
+    return Response(content=archive, media_type="application/zip",
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # WebSocket streaming inference
 # ──────────────────────────────────────────────────────────────────────────────
@@ -241,16 +582,31 @@ async def stream(websocket: WebSocket) -> None:
     """
     One WebSocket connection = one inference session.
 
-    - Resets RL state at the start of each session so history from a previous
-      client does not bleed into a new one.
+    - Gives each connection its own RoutingSession so routing history from
+      one client never bleeds into another.  ?mode=window&window=N selects
+      window-aggregated routing for this session.
     - Starts an MLflow run; logs summary metrics on disconnect.
     """
     await websocket.accept()
-    ACTIVE_CONNECTIONS.inc()
-    log.info("WebSocket session started")
 
-    _engine.reset_state()
-    tracker = SessionTracker()
+    params = websocket.query_params
+    try:
+        session = _engine.new_session(
+            mode=params.get("mode"),
+            window_size=int(params["window"]) if "window" in params else None,
+        )
+    except ValueError as exc:
+        await websocket.send_text(_error(f"Invalid session parameters: {exc}"))
+        await websocket.close(code=1008)
+        return
+
+    ACTIVE_CONNECTIONS.inc()
+    log.info("WebSocket session started", extra={
+        "routing_mode": session.mode,
+        "window_size": session.window_size,
+    })
+    tracker = SessionTracker(model_names=_engine.action_names, writer=_mlflow_writer)
+    decoder = _new_decoder()
 
     try:
         while True:
@@ -264,26 +620,41 @@ async def stream(websocket: WebSocket) -> None:
                 b64_frame = raw
                 baseline_model_name = "Small"
 
-            frame = _decode_frame(b64_frame)
-            if frame is None:
-                await websocket.send_text(_error("Could not decode frame"))
-                continue
-
-            loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(
-                None, partial(_engine.infer, frame, baseline_model_name=baseline_model_name)
-            )
-            tracker.record(result)
-
-            # Update Prometheus metrics
-            FRAMES_TOTAL.inc()
-            adaptive = result["adaptive"]
-            baseline = result["baseline"]
-            ADAPTIVE_LATENCY.observe(adaptive["latency_ms"] / 1000.0)
-            BASELINE_LATENCY.observe(baseline["latency_ms"] / 1000.0)
-            MODEL_SELECTIONS.labels(model=adaptive["model_name"]).inc()
-
-            await websocket.send_text(json.dumps(result))
+            trace = _tracer.start_trace(routing_mode=session.mode)
+            try:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(
+                        None, partial(_decode_and_infer, decoder, b64_frame, baseline_model_name,
+                                      session, trace)
+                    )
+                except PoolFull as exc:
+                    # Shed the frame; the client keeps streaming and the next one may fit
+                    FRAMES_SHED.inc()
+                    _mark_trace_error(trace, "pool_full")
+                    await websocket.send_text(_error(f"Server busy: {exc}"))
+                    continue
+                if result is None:
+                    _mark_trace_error(trace, "decode")
+                    await websocket.send_text(_error("Could not decode frame"))
+                    continue
+                tracker.record(result)
+
+                # Update Prometheus metrics
+                FRAMES_TOTAL.inc()
+                adaptive = result["adaptive"]
+                baseline = result["baseline"]
+                ADAPTIVE_LATENCY.observe(adaptive["latency_ms"] / 1000.0)
+                BASELINE_LATENCY.observe(baseline["latency_ms"] / 1000.0)
+                MODEL_SELECTIONS.labels(model=adaptive["model_name"]).inc()
+
+                with trace.span("serialize"):
+                    packet = json.dumps(result)
+                with trace.span("send"):
+                    await websocket.send_text(packet)
+            finally:
+                # Shed and undecodable frames are exported too, tagged with their error
+                _tracer.finish(trace)
 
     except WebSocketDisconnect:
         log.info("WebSocket session ended")
@@ -0,0 +1,427 @@
+"""
+backends.py — execution backends for the YOLO tiers.
+
+Each tier (Nano / Small / Large) can run on one of
+
+    torch           Ultralytics YOLO on the .pt weights (eager)
+    torch_compile   the same, with predict(compile=True) — needs an Ultralytics
+                    release that has the `compile` predict argument
+    onnxruntime     an onnxruntime.InferenceSession on the exported .onnx, with
+                    explicit SessionOptions (graph optimization level, intra/
+                    inter-op threads, execution mode) and execution provider —
+                    OpenVINOExecutionProvider is used when the installed
+                    onnxruntime build ships it
+
+training/benchmark_backends.py times every available configuration per tier
+on the same preloaded frames and writes the fastest one per tier to a backend
+config file (paths.backend_config in params.yaml):
+
+    {"tiers": {"Nano": {"backend": "onnxruntime", "graph_optimization": "all", …}, …}}
+
+which the engine loads via AdaptiveInferenceSystem(backend_config_path=…).
+
+OrtYOLO owns its onnxruntime session and is called like an Ultralytics model,
+returning [Detections] (serving/yolo_ops.py) instead of Results; its NumPy
+pre- and post-processing match Ultralytics' output.  Frames are letterboxed into a
+preallocated input buffer that is bound to the session with IOBinding together
+with a preallocated output buffer, so a call allocates nothing on either side
+of session.run.  Process-wide ONNX Runtime settings live in OrtRuntime:
+  - the thread budget that split_thread_budget() divides between the ONNX tiers,
+    so three sessions do not each start a pool sized to every core;
+  - spin-waiting of idle pool threads;
+  - the CPU memory arena, either one arena shared by all sessions (registered
+    once per process), one arena per session, or none.
+"""
+
+from __future__ import annotations
+
+import ast
+import copy
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from serving.yolo_ops import Detections, Letterbox, postprocess
+
+BACKENDS = ("torch", "torch_compile", "onnxruntime")
+GRAPH_OPTIMIZATION_LEVELS = ("disable", "basic", "extended", "all")
+EXECUTION_MODES = ("sequential", "parallel")
+ORT_PROVIDERS = ("OpenVINOExecutionProvider", "CPUExecutionProvider")
+ARENA_MODES = ("shared", "session", "off")
+ARENA_EXTEND_STRATEGIES = ("power_of_two", "same_as_requested")
+
+
+@dataclass(frozen=True)
+class BackendConfig:
+    """
+    One backend configuration for one tier.  provider, graph_optimization,
+    execution_mode and inter_op_threads only apply to onnxruntime;
+    intra_op_threads = 0 keeps the library default.
+    """
+    backend: str = "torch"
+    provider: str = "CPUExecutionProvider"
+    graph_optimization: str = "all"
+    execution_mode: str = "sequential"
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+
+    def __post_init__(self) -> None:
+        if self.backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, got {self.backend!r}")
+        if self.graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"graph_optimization must be one of {GRAPH_OPTIMIZATION_LEVELS}, "
+                             f"got {self.graph_optimization!r}")
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"execution_mode must be one of {EXECUTION_MODES}, "
+                             f"got {self.execution_mode!r}")
+
+    @property
+    def label(self) -> str:
+        if self.backend != "onnxruntime":
+            return f"{self.backend}[intra={self.intra_op_threads}]"
+        provider = self.provider.replace("ExecutionProvider", "").lower()
+        return (f"onnxruntime[{provider},{self.graph_optimization},{self.execution_mode[:3]},"
+                f"intra={self.intra_op_threads},inter={self.inter_op_threads}]")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "BackendConfig":
+        known = {k: d[k] for k in cls.__dataclass_fields__ if k in d}
+        return cls(**known)
+
+
+@dataclass(frozen=True)
+class OrtRuntime:
+    """
+    Process-wide ONNX Runtime settings for the engine's sessions.
+
+    thread_budget           intra-op threads shared by all ONNX tiers (0 = usable CPUs)
+    allow_spinning          let idle pool threads spin-wait; off avoids burning cores
+                            that another tier's pool is about to need
+    arena                   shared | session | off — CPU memory arena
+    arena_extend_strategy   power_of_two grows fast; same_as_requested stays tight
+    arena_max_mb            arena cap (0 = unlimited)
+    io_binding              bind preallocated input/output buffers to each session
+    """
+    thread_budget: int = 0
+    allow_spinning: bool = False
+    arena: str = "shared"
+    arena_extend_strategy: str = "same_as_requested"
+    arena_max_mb: int = 0
+    io_binding: bool = True
+
+    def __post_init__(self) -> None:
+        if self.arena not in ARENA_MODES:
+            raise ValueError(f"arena must be one of {ARENA_MODES}, got {self.arena!r}")
+        if self.arena_extend_strategy not in ARENA_EXTEND_STRATEGIES:
+            raise ValueError(f"arena_extend_strategy must be one of {ARENA_EXTEND_STRATEGIES}, "
+                             f"got {self.arena_extend_strategy!r}")
+
+
+def usable_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def split_thread_budget(configs: List[BackendConfig], budget: int = 0) -> List[BackendConfig]:
+    """
+    Gives every onnxruntime tier explicit thread counts that together fit
+    `budget` intra-op threads (0 = usable CPUs).  Tiers are weighted by the
+    intra_op_threads they ask for (0 = an even share); explicit requests
+    that already fit are kept.  Every tier gets at least one thread, and
+    inter-op threads are 1 unless the tier runs the parallel executor.
+    """
+    budget = budget or usable_cpus()
+    ort = [i for i, c in enumerate(configs) if c.backend == "onnxruntime"]
+    if not ort:
+        return list(configs)
+    fair = budget / len(ort)
+    weights = {i: configs[i].intra_op_threads or fair for i in ort}
+    if all(configs[i].intra_op_threads for i in ort) and sum(weights.values()) <= budget:
+        threads = {i: configs[i].intra_op_threads for i in ort}
+    else:
+        total = sum(weights.values())
+        threads = {i: max(1, int(budget * weights[i] / total)) for i in ort}
+        # Hand out what flooring left over, heaviest request (then highest tier) first
+        for i in sorted(ort, key=lambda i: (weights[i], i), reverse=True):
+            if sum(threads.values()) >= budget:
+                break
+            threads[i] += 1
+
+    out = list(configs)
+    for i in ort:
+        c = configs[i]
+        inter = (c.inter_op_threads or 1) if c.execution_mode == "parallel" else 1
+        out[i] = replace(c, intra_op_threads=threads[i], inter_op_threads=inter)
+    return out
+
+
+# ── Availability ──────────────────────────────────────────────────────────────
+
+def torch_compile_supported() -> bool:
+    """True if the installed Ultralytics accepts predict(compile=…)."""
+    try:
+        from ultralytics.cfg import DEFAULT_CFG_DICT
+    except ImportError:
+        return False
+    return "compile" in DEFAULT_CFG_DICT and hasattr(torch, "compile")
+
+
+def ort_providers() -> List[str]:
+    """Execution providers from ORT_PROVIDERS that this onnxruntime build offers."""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return []
+    available = set(ort.get_available_providers())
+    return [p for p in ORT_PROVIDERS if p in available]
+
+
+def available_backends() -> List[str]:
+    out = ["torch"]
+    if torch_compile_supported():
+        out.append("torch_compile")
+    if ort_providers():
+        out.append("onnxruntime")
+    return out
+
+
+def find_onnx(weights_path: str) -> Optional[str]:
+    """The exported .onnx for a .pt — alongside it, or in /app/models/ (deployed PVC path)."""
+    base = os.path.splitext(os.path.basename(weights_path))[0]
+    candidates = [
+        os.path.splitext(weights_path)[0] + ".onnx",
+        f"/app/models/{base}.onnx",
+    ]
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# ── ONNX Runtime ──────────────────────────────────────────────────────────────
+
+_shared_arena: Optional[OrtRuntime] = None
+_shared_arena_lock = threading.Lock()
+
+
+def _register_shared_arena(runtime: OrtRuntime) -> None:
+    """Registers one CPU arena allocator with the ORT environment (once per process)."""
+    global _shared_arena
+    import onnxruntime as ort
+
+    with _shared_arena_lock:
+        if _shared_arena is not None:
+            if (_shared_arena.arena_extend_strategy, _shared_arena.arena_max_mb) != \
+                    (runtime.arena_extend_strategy, runtime.arena_max_mb):
+                print("[Backends] Shared ORT arena already registered — keeping its first settings")
+            return
+        mem_info = ort.OrtMemoryInfo("Cpu", ort.OrtAllocatorType.ORT_ARENA_ALLOCATOR, 0,
+                                     ort.OrtMemType.DEFAULT)
+        arena = ort.OrtArenaCfg({
+            "max_mem": runtime.arena_max_mb * 1024 * 1024,
+            "arena_extend_strategy": ARENA_EXTEND_STRATEGIES.index(runtime.arena_extend_strategy),
+        })
+        ort.create_and_register_allocator(mem_info, arena)
+        _shared_arena = runtime
+
+
+def ort_session_options(cfg: BackendConfig, runtime: Optional[OrtRuntime] = None):
+    import onnxruntime as ort
+
+    runtime = runtime or OrtRuntime()
+
+    levels = {
+        "disable":  ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic":    ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all":      ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = levels[cfg.graph_optimization]
+    opts.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if cfg.execution_mode == "parallel"
+                           else ort.ExecutionMode.ORT_SEQUENTIAL)
+    opts.intra_op_num_threads = cfg.intra_op_threads
+    opts.inter_op_num_threads = cfg.inter_op_threads
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "1" if runtime.allow_spinning else "0")
+    opts.add_session_config_entry("session.inter_op.allow_spinning", "1" if runtime.allow_spinning else "0")
+    if runtime.arena == "off":
+        opts.enable_cpu_mem_arena = False
+    elif runtime.arena == "shared":
+        _register_shared_arena(runtime)
+        opts.add_session_config_entry("session.use_env_allocators", "1")
+    return opts
+
+
+class OrtYOLO:
+    """
+    YOLO detector on an engine-owned onnxruntime session, called like an
+    Ultralytics model: model(frame) → [Detections], or model(frame, imgsz=320)
+    for another input size (dynamic-shape exports only).  Class names, stride
+    and input size come from the metadata Ultralytics writes into the exported
+    graph.  Input and output buffers are reused across calls — one letterbox
+    and IOBinding per input size — so, like an Ultralytics model, an instance
+    must not be called concurrently; replica() gives another instance on the
+    same session for a second worker.
+    """
+
+    def __init__(self, onnx_path: str, cfg: BackendConfig, runtime: Optional[OrtRuntime] = None,
+                 conf: float = 0.25, iou: float = 0.7, max_det: int = 300) -> None:
+        import onnxruntime as ort
+
+        self.path = onnx_path
+        self.cfg = cfg
+        self.runtime = runtime or OrtRuntime()
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        providers = [cfg.provider] if cfg.provider == "CPUExecutionProvider" else [cfg.provider, "CPUExecutionProvider"]
+        self.session = ort.InferenceSession(onnx_path, sess_options=ort_session_options(cfg, self.runtime),
+                                            providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        self.stride = int(meta.get("stride", 32))
+        imgsz = ast.literal_eval(meta["imgsz"]) if "imgsz" in meta else [640, 640]
+        self.imgsz: Tuple[int, int] = (int(imgsz[0]), int(imgsz[1]))
+
+        # Dynamic-shape exports accept any input size and get Ultralytics'
+        # minimal (stride-multiple) padding
+        self.dynamic = any(not isinstance(d, int) for d in self.session.get_inputs()[0].shape[2:])
+        self.letterbox = Letterbox(self.imgsz, self.stride, auto=self.dynamic)
+        self._letterboxes: Dict[Tuple[int, int], Letterbox] = {self.imgsz: self.letterbox}
+        # input size → (bound input, IOBinding, output buffer)
+        self._bindings: Dict[Tuple[int, int], tuple] = {}
+
+    def replica(self) -> "OrtYOLO":
+        """
+        A detector on the same session with its own letterboxes and bindings,
+        safe to call concurrently with this one (InferenceSession.run is
+        thread-safe; the I/O buffers are what must not be shared).
+        """
+        twin = copy.copy(self)
+        twin.letterbox = Letterbox(self.imgsz, self.stride, auto=self.dynamic)
+        twin._letterboxes = {self.imgsz: twin.letterbox}
+        twin._bindings = {}
+        return twin
+
+    def _size(self, imgsz=None) -> Tuple[int, int]:
+        if imgsz is None:
+            return self.imgsz
+        size = (int(imgsz), int(imgsz)) if np.isscalar(imgsz) else (int(imgsz[0]), int(imgsz[1]))
+        if size != self.imgsz and not self.dynamic:
+            raise ValueError(f"{self.path} is a static {self.imgsz} export; re-export with dynamic=True "
+                             f"to run it at {size}")
+        return size
+
+    def _letterbox_for(self, size: Tuple[int, int]) -> Letterbox:
+        letterbox = self._letterboxes.get(size)
+        if letterbox is None:
+            letterbox = self._letterboxes[size] = Letterbox(size, self.stride, auto=self.dynamic)
+        return letterbox
+
+    def _bind_buffers(self, blob: np.ndarray, size: Tuple[int, int]) -> None:
+        """Binds `blob` as input and a preallocated array as output."""
+        # One plain run gives the output shape for this input shape
+        shape = self.session.run([self.output_name], {self.input_name: blob})[0].shape
+        output = np.empty(shape, dtype=np.float32)
+        binding = self.session.io_binding()
+        binding.bind_input(self.input_name, "cpu", 0, np.float32, list(blob.shape), blob.ctypes.data)
+        binding.bind_output(self.output_name, "cpu", 0, np.float32, list(shape), output.ctypes.data)
+        self._bindings[size] = (blob, binding, output)
+
+    def _preprocess(self, frame: np.ndarray, imgsz=None) -> np.ndarray:
+        return self._letterbox_for(self._size(imgsz))(frame)
+
+    def _infer(self, blob: np.ndarray, imgsz=None) -> np.ndarray:
+        """Raw (1, 4 + classes, anchors) output; with IOBinding it is overwritten by the next call."""
+        if self.runtime.io_binding:
+            size = self._size(imgsz)
+            # Each letterbox reallocates its buffer only when the source resolution changes
+            bound = self._bindings.get(size)
+            if bound is None or bound[0] is not blob:
+                self._bind_buffers(blob, size)
+                bound = self._bindings[size]
+            self.session.run_with_iobinding(bound[1])
+            return bound[2]
+        return self.session.run([self.output_name], {self.input_name: blob})[0]
+
+    def __call__(self, frame: np.ndarray, imgsz=None, **_: Any) -> List[Detections]:
+        size = self._size(imgsz)
+        letterbox = self._letterbox_for(size)
+        t0 = time.perf_counter()
+        blob = letterbox(frame)
+        t1 = time.perf_counter()
+        raw = self._infer(blob, size)
+        t2 = time.perf_counter()
+        xyxy, conf, cls = postprocess(raw, letterbox, frame.shape, self.conf, self.iou, self.max_det)
+        t3 = time.perf_counter()
+        speed = {
+            "preprocess":  (t1 - t0) * 1000.0,
+            "inference":   (t2 - t1) * 1000.0,
+            "postprocess": (t3 - t2) * 1000.0,
+        }
+        return [Detections(xyxy, conf, cls, self.names, frame.shape[:2], speed)]
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+
+def load_backend(weights_path: str, cfg: BackendConfig, device: str = "cpu",
+                 runtime: Optional[OrtRuntime] = None):
+    """Model for one tier under cfg; onnxruntime needs the exported .onnx to exist."""
+    if cfg.backend == "onnxruntime":
+        onnx_path = find_onnx(weights_path)
+        if onnx_path is None:
+            raise FileNotFoundError(f"No exported .onnx found for {weights_path}")
+        return OrtYOLO(onnx_path, cfg, runtime)
+    if cfg.backend == "torch_compile" and not torch_compile_supported():
+        raise RuntimeError("torch_compile needs an Ultralytics release with the `compile` predict argument")
+    from ultralytics import YOLO
+    return YOLO(weights_path).to(device)
+
+
+def predict_kwargs(cfg: BackendConfig, device: str) -> Dict[str, Any]:
+    """Keyword arguments for model(frame, **kwargs) under cfg."""
+    if cfg.backend == "onnxruntime":
+        return {"verbose": False}
+    kwargs: Dict[str, Any] = {"verbose": False, "device": device}
+    if cfg.backend == "torch_compile":
+        kwargs["compile"] = True
+    return kwargs
+
+
+def torch_threads(configs: List[BackendConfig]) -> int:
+    """
+    torch's intra-op pool is process-wide, so the torch tiers share one
+    setting: the largest they asked for (0 = leave torch's default).
+    """
+    return max((c.intra_op_threads for c in configs if c.backend != "onnxruntime"), default=0)
+
+
+# ── Config file ───────────────────────────────────────────────────────────────
+
+def load_backend_config(path: str) -> Dict[str, BackendConfig]:
+    """Tier name → BackendConfig from a file written by write_backend_config()."""
+    with open(path) as f:
+        data = json.load(f)
+    return {name: BackendConfig.from_dict(d) for name, d in data.get("tiers", {}).items()}
+
+
+def write_backend_config(path: str, tiers: Dict[str, BackendConfig],
+                         meta: Optional[Dict[str, Any]] = None) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = dict(meta or {})
+    data["tiers"] = {name: cfg.to_dict() for name, cfg in tiers.items()}
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,175 @@
+"""
+decode.py — client frame decoding for the WebSocket stream.
+
+A FrameDecoder turns one stream's base64 JPEG payloads into BGR frames.
+It is called on the executor thread that then runs the frame's inference
+(serving/app.py), never on the event loop, so a large client frame no
+longer holds up every other connection while it decodes.
+
+With reduced=True (REDUCED_DECODE=1), a JPEG whose long side is at least
+twice the largest model input size is decoded at 1/2, 1/4 or 1/8 scale by libjpeg's DCT scaling
+(IMREAD_REDUCED_COLOR_N, or TurboJPEG's scaling factors) — the largest
+factor that keeps the long side at or above the model input size, so the
+letterbox still only ever scales down.  A reduced decode is several times
+cheaper than a full one followed by the letterbox's own resize.  The
+DecodedFrame records the client's resolution so the engine can return
+boxes in client pixels.
+
+Decoders:
+    opencv      cv2.imdecode (always available)
+    turbojpeg   PyTurboJPEG ≥ 2 over libjpeg-turbo, decoding into a buffer
+                the decoder reuses across frames of the same size
+    auto        turbojpeg when importable and its library loads, else opencv
+
+Non-JPEG payloads (e.g. PNG) are always decoded by OpenCV at full size.
+Both decoders ignore EXIF orientation, so boxes are in the pixel layout the
+client encoded.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import inspect
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+JPEG_DECODERS = ("auto", "opencv", "turbojpeg")
+REDUCTIONS = (8, 4, 2)
+
+# cv2.imdecode flags that decode straight to BGR at 1/N scale (libjpeg DCT scaling).
+# EXIF orientation is ignored, as TurboJPEG does: the image keeps the JPEG header's
+# width × height, which is the source_shape boxes are scaled back to.
+_COLOR_DECODE_FLAGS = {
+    n: flag | cv2.IMREAD_IGNORE_ORIENTATION
+    for n, flag in {1: cv2.IMREAD_COLOR,
+                    2: cv2.IMREAD_REDUCED_COLOR_2,
+                    4: cv2.IMREAD_REDUCED_COLOR_4,
+                    8: cv2.IMREAD_REDUCED_COLOR_8}.items()
+}
+
+# Start-of-frame markers carry the image size; C4 (DHT), C8 (JPG) and CC (DAC) do not
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@lru_cache(maxsize=1)
+def _turbojpeg():
+    """The shared TurboJPEG instance, or None if PyTurboJPEG or libjpeg-turbo is missing."""
+    try:
+        from turbojpeg import TurboJPEG
+        turbo = TurboJPEG()
+    except (ImportError, OSError, RuntimeError):
+        return None
+    # PyTurboJPEG < 2 cannot decode into a caller's buffer
+    return turbo if "dst" in inspect.signature(turbo.decode).parameters else None
+
+
+def available_jpeg_decoders() -> List[str]:
+    out = ["opencv"]
+    if _turbojpeg() is not None:
+        out.append("turbojpeg")
+    return out
+
+
+def resolve_jpeg_decoder(name: str = "auto") -> str:
+    """The decoder to use for JPEG_DECODER=name; ValueError if unknown or not installed."""
+    if name not in JPEG_DECODERS:
+        raise ValueError(f"Unknown JPEG decoder '{name}'. Choose from {JPEG_DECODERS}")
+    available = available_jpeg_decoders()
+    if name == "auto":
+        return available[-1]
+    if name not in available:
+        raise ValueError(f"JPEG decoder '{name}' is not available (PyTurboJPEG and libjpeg-turbo "
+                         f"are needed); available: {available}")
+    return name
+
+
+def jpeg_size(buf) -> Optional[Tuple[int, int]]:
+    """(height, width) from a JPEG's start-of-frame header, or None if buf is not a JPEG."""
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 <= n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:                                  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:        # markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            return (buf[i + 5] << 8) | buf[i + 6], (buf[i + 7] << 8) | buf[i + 8]
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def reduction_for(shape: Tuple[int, int], target_size: int) -> int:
+    """Largest 1/N scale (N in 8, 4, 2) whose long side is still ≥ target_size; 1 if none."""
+    long_side = max(shape[0], shape[1])
+    for n in REDUCTIONS:
+        if long_side >= n * target_size:
+            return n
+    return 1
+
+
+@dataclass
+class DecodedFrame:
+    image: np.ndarray                   # BGR, possibly at reduced size
+    source_shape: Tuple[int, int]       # (height, width) of the client's frame
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """(x, y) factor from decoded to client pixels."""
+        h, w = self.image.shape[:2]
+        return self.source_shape[1] / w, self.source_shape[0] / h
+
+
+class FrameDecoder:
+    """
+    Decodes the frames of one stream.  With the turbojpeg decoder the
+    returned image lives in a buffer that the next decode() overwrites, so
+    one decoder serves one stream whose frames are handled one at a time —
+    not shared across threads.
+    """
+
+    def __init__(self, target_size: int = 640, reduced: bool = False, decoder: str = "auto") -> None:
+        self.target_size = target_size
+        self.reduced = reduced
+        self.decoder = resolve_jpeg_decoder(decoder)
+        self._turbo = _turbojpeg() if self.decoder == "turbojpeg" else None
+        self._buffer: Optional[np.ndarray] = None
+
+    def decode(self, b64_payload) -> Optional[DecodedFrame]:
+        """Decodes a base64 payload; None if it is not valid base64 or not an image."""
+        try:
+            data = base64.b64decode(b64_payload)
+        except (binascii.Error, ValueError):
+            return None
+        arr = np.frombuffer(data, dtype=np.uint8)       # a view, not a copy
+        size = jpeg_size(data)
+        if size is None:                                 # not a JPEG: OpenCV at full size
+            image = cv2.imdecode(arr, _COLOR_DECODE_FLAGS[1]) if arr.size else None
+            return None if image is None else DecodedFrame(image, image.shape[:2])
+
+        n = reduction_for(size, self.target_size) if self.reduced else 1
+        image = self._decode_turbo(data, size, n) if self._turbo is not None else None
+        if image is None:                                # OpenCV, or what TurboJPEG rejects
+            image = cv2.imdecode(arr, _COLOR_DECODE_FLAGS[n])
+        return None if image is None else DecodedFrame(image, size)
+
+    def _decode_turbo(self, data: bytes, size: Tuple[int, int], n: int) -> Optional[np.ndarray]:
+        # libjpeg-turbo rounds scaled sizes up
+        shape = (-(-size[0] // n), -(-size[1] // n), 3)
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+        try:
+            return self._turbo.decode(data, scaling_factor=None if n == 1 else (1, n), dst=self._buffer)
+        except (OSError, ValueError):
+            return None
@@ -3,10 +3,31 @@ engine.py — Modular inference engine for the Adaptive ML Inference System.
 
 Handles:
   - PyTorch 2.6+ weights_only=False patch (applied at import time)
-  - YOLO model loading on CUDA
-  - PPO agent loading on CPU
+  - YOLO model loading on CUDA, or per tier on the backend chosen by
+    training/benchmark_backends.py (serving/backends.py)
+  - Per-tier device placement (e.g. Nano on CPU ONNX Runtime, Small / Large
+    on the GPU — serving/placement.py) and one worker pool per tier with its
+    own queue, replicas, thread share and queue limit, so a frame only ever
+    waits for calls to its own tier (serving/worker_pools.py)
+  - Routing policy loading on CPU (PPO .zip or distilled router .pt)
+  - (model, resolution) routing: each action runs one tier at one input size
+    (core/actions.py); the default grid is Nano / Small / Large at 640
   - 1028-dim observation construction (must match environment.py exactly)
   - Dual-path inference: RL-adaptive and YOLOv8-Small baseline
+  - Per-session routing state: single-frame observations every
+    decision_interval frames ("frame" mode) or window-aggregated observations
+    once per window ("window" mode, matches WindowedInferenceEnv)
+  - Switch-cost accounting: adaptive-path latency of the first frame after a
+    model switch vs steady state, per variant (serving/switch_cost.py)
+  - Optional keep-warm passes that keep idle variants' weights/arenas hot
+  - Stage spans (features / policy / predict / postprocess) on sampled
+    frames when the caller passes a trace (serving/tracing.py)
+  - Hooks for on-demand profiling sessions (serving/profiling.py)
+  - Optional online learning: routes with a NeuralBanditAgent that is
+    retrained in the background from live feedback (serving/online_learning.py)
+  - Optional early-exit gating (routing_strategy="gate"): every frame runs on
+    Nano and is re-run on Small or Large only when Nano's output is unsure
+    (core/gating.py, thresholds from training/evaluate_gating.py)
 """
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -25,17 +46,33 @@ def _patched_load(*args, **kwargs):
 torch.load = _patched_load
 # ─────────────────────────────────────────────────────────────────────────────
 
-import os
+import threading
 import time
-from dataclasses import dataclass, field
-from typing import Any, Dict, List
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 from stable_baselines3 import PPO
 from ultralytics import YOLO
 
+from core.actions import DEFAULT_IMGSZ, MODEL_KEYS, RoutingAction, action_grid, prev_action_feature
+from core.buffer_manager import WindowBufferManager
 from core.features import FeatureExtractor
+from core.gating import ConfidenceGate, load_gate
+from core.routers import load_router
+from serving.backends import (BackendConfig, OrtRuntime, find_onnx, load_backend,
+                              load_backend_config, predict_kwargs, split_thread_budget,
+                              torch_threads)
+from serving.placement import is_cuda, torch_device
+from serving.switch_cost import SwitchCostTracker
+from serving.tracing import NULL_TRACE
+from serving.worker_pools import PoolConfig, TierPool, TierPools
+from serving.yolo_ops import Detections
+
+if TYPE_CHECKING:
+    from serving.online_learning import OnlineLearner
+    from serving.profiling import ProfileSession
 
 MODEL_NAMES: List[str] = ["Nano", "Small", "Large"]
 
@@ -64,11 +101,57 @@ class InferenceResult:
             "avg_confidence": round(self.avg_confidence, 4),
         }
 
+    def scale_boxes(self, sx: float, sy: float) -> None:
+        """Maps bboxes from the frame inferred on to one sx × sy times its size."""
+        for d in self.detections:
+            x1, y1, x2, y2 = d["bbox"]
+            d["bbox"] = [x1 * sx, y1 * sy, x2 * sx, y2 * sy]
+
+
+ROUTING_MODES = ("frame", "window")
+ROUTING_STRATEGIES = ("policy", "gate")
+
+
+@dataclass
+class RoutingSession:
+    """
+    Routing state for one client stream (one WebSocket connection).
+
+    mode="frame"  — the policy sees the current frame and is re-evaluated
+                    every decision_interval frames.
+    mode="window" — every frame is pushed into a ring buffer; the policy is
+                    re-evaluated once per window_size frames (and after the
+                    first frame) on the window-aggregated observation.
+    """
+    mode: str = "frame"
+    decision_interval: int = 5
+    window_size: int = 10
+    n_actions: int = len(MODEL_KEYS)
+    prev_action: int = 0
+    prev_conf: float = 0.5
+    frame_count: int = 0
+    current_action: int = 0
+    buffer: Optional[WindowBufferManager] = None
+    # Window-mode feedback for online learning: decision obs + window stats
+    decision_obs: Optional[np.ndarray] = None
+    window_conf_sum: float = 0.0
+    window_latency_sum: float = 0.0
+    window_frames: int = 0
+
+    def __post_init__(self) -> None:
+        if self.mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode '{self.mode}'. Choose from {ROUTING_MODES}")
+        self.decision_interval = max(1, self.decision_interval)
+        self.window_size = max(1, self.window_size)
+        if self.mode == "window" and self.buffer is None:
+            self.buffer = WindowBufferManager(window_size=self.window_size, n_actions=self.n_actions)
+
 
 class AdaptiveInferenceSystem:
     """
     Standalone engine that routes frames between three YOLOv8 variants
-    (Nano / Small / Large) using a trained PPO reinforcement learning agent.
+    (Nano / Small / Large) using a trained PPO reinforcement learning agent —
+    or, with several `resolutions`, between every (variant, input size) pair.
 
     Observation space (1028-dim) matches environment.py exactly:
         [1024 visual features | 1 scaled edge density (×10) | 3 metadata]
@@ -76,11 +159,60 @@ class AdaptiveInferenceSystem:
     Parameters
     ----------
     rl_model_path : str
-        Path to the trained PPO .zip file.
+        Path to the trained PPO .zip file, or a distilled router .pt
+        (core/routers.py) — both expose predict(obs, deterministic).
     yolo_n_path, yolo_s_path, yolo_l_path : str
         Paths to the YOLOv8 nano / small / large .pt weights.
     device : str
-        Torch device for YOLO inference ("cuda" or "cpu").
+        Torch device for YOLO inference ("cuda" or "cpu") — every tier's,
+        unless tier_devices places them individually.
+    decision_interval, routing_mode, window_size :
+        Defaults for sessions created by new_session().
+    keep_warm_interval_s : float
+        If > 0, a background thread runs a dummy inference on any variant
+        that has been idle for this long, so switching to it does not pay
+        for cold caches / arenas.  0 disables keep-warm.
+    online_learner : OnlineLearner, optional
+        When given, routing decisions come from the learner's bandit instead
+        of rl_model_path, and each decision's observed confidence and latency
+        are fed back to it.
+    backend_config_path : str, optional
+        Backend config written by training/benchmark_backends.py; each tier
+        listed there is loaded on its benchmarked backend.  Tiers not listed
+        (or all, without a file) use the exported .onnx when one exists and
+        the .pt otherwise.
+    ort_runtime : OrtRuntime, optional
+        Thread budget, spinning, arena and IOBinding settings for the ONNX
+        Runtime sessions the engine creates for ONNX tiers.  The budget is
+        split across those tiers instead of each session sizing its pool to
+        every core.
+    resolutions : sequence of int
+        Inference sizes of the action grid (core/actions.py): action i runs
+        tier actions[i].model at actions[i].imgsz.  Must match the grid the
+        policy was trained on (profile.resolutions).  ONNX tiers need a
+        dynamic-shape export for sizes other than their export size.
+    routing_strategy : str
+        "policy" routes with the policy (or online learner) before inference;
+        "gate" runs Nano on every frame and escalates it to Small or Large
+        per the confidence gate instead (default resolution grid only).
+    gate_path : str, optional
+        Gate thresholds written by training/evaluate_gating.py; without one
+        the gate uses ConfidenceGate's defaults.
+    tier_devices : sequence of str, optional
+        Device per tier (Nano, Small, Large), e.g. ["cpu", "cuda", "cuda"]
+        (serving/placement.parse_tier_devices).  Tiers placed on a GPU run
+        on torch.  Default: every tier on `device`.
+    pool_configs : sequence of PoolConfig, optional
+        Worker pool per tier (serving/worker_pools.py): concurrent workers
+        (one model replica each), queue limit and intra-op threads.  Every
+        predict call of a tier runs on its pool.  Default: one worker per
+        tier, unbounded queues, threads from the shared budget.
+    max_queue_wait_ms : float
+        If > 0, a policy action whose pool is expected to keep the frame
+        waiting longer than this is replaced by the action of the same input
+        size with the shortest expected latency.  Actions whose pool queue
+        is full are replaced the same way regardless.  0 otherwise always
+        runs the policy's action.
     """
 
     def __init__(
@@ -91,72 +223,255 @@ class AdaptiveInferenceSystem:
         yolo_l_path: str = "yolov8l.pt",
         device: str = "cuda",
         decision_interval: int = 5,
+        online_learner: Optional["OnlineLearner"] = None,
+        routing_mode: str = "frame",
+        window_size: int = 10,
+        keep_warm_interval_s: float = 0.0,
+        backend_config_path: Optional[str] = None,
+        ort_runtime: Optional[OrtRuntime] = None,
+        resolutions: Sequence[int] = (DEFAULT_IMGSZ,),
+        routing_strategy: str = "policy",
+        gate_path: Optional[str] = None,
+        tier_devices: Optional[Sequence[str]] = None,
+        pool_configs: Optional[Sequence[PoolConfig]] = None,
+        max_queue_wait_ms: float = 0.0,
     ) -> None:
         self.device = device
+        self.tier_devices: List[str] = list(tier_devices or [device] * len(MODEL_NAMES))
+        if len(self.tier_devices) != len(MODEL_NAMES):
+            raise ValueError(f"tier_devices needs one device per tier {MODEL_NAMES}, got {self.tier_devices}")
+        pool_configs = list(pool_configs or [PoolConfig()] * len(MODEL_NAMES))
+        if len(pool_configs) != len(MODEL_NAMES):
+            raise ValueError(f"pool_configs needs one config per tier {MODEL_NAMES}, got {len(pool_configs)}")
+        self.max_queue_wait_ms = max_queue_wait_ms
+        self.ort_runtime = ort_runtime or OrtRuntime()
         self.extractor = FeatureExtractor()
+        self.online_learner = online_learner
 
         # RL agent on CPU — keeps GPU headroom for YOLO inference
-        print(f"[Engine] Loading PPO agent from: {rl_model_path}")
-        self.agent = PPO.load(rl_model_path, device="cpu")
-
-        # Three YOLO variants — prefer .onnx (faster CPU) over .pt when available
-        print(f"[Engine] Loading YOLO n/s/l on {device} …")
-        _pairs = [
-            AdaptiveInferenceSystem._load_yolo(yolo_n_path, device),
-            AdaptiveInferenceSystem._load_yolo(yolo_s_path, device),
-            AdaptiveInferenceSystem._load_yolo(yolo_l_path, device),
+        if rl_model_path.endswith(".pt"):
+            print(f"[Engine] Loading distilled router from: {rl_model_path}")
+            self.agent = load_router(rl_model_path)
+        else:
+            print(f"[Engine] Loading PPO agent from: {rl_model_path}")
+            self.agent = PPO.load(rl_model_path, device="cpu")
+
+        self.actions: List[RoutingAction] = action_grid(resolutions)
+        self.action_names: List[str] = [a.name for a in self.actions]
+        self._check_action_space()
+
+        if routing_strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{routing_strategy}'. Choose from {ROUTING_STRATEGIES}")
+        self.routing_strategy = routing_strategy
+        self.gate: Optional[ConfidenceGate] = None
+        if routing_strategy == "gate":
+            if online_learner is not None or self.actions != action_grid():
+                raise ValueError("Gating routes between the three tiers at their default size; "
+                                 "it cannot be combined with online learning or extra resolutions")
+            if gate_path:
+                print(f"[Engine] Loading confidence gate from: {gate_path}")
+            self.gate = load_gate(gate_path) if gate_path else ConfidenceGate()
+            print(f"[Engine] Early-exit gating: {self.gate}")
+
+        # Three YOLO variants — benchmarked backend per tier if configured,
+        # else prefer .onnx (faster CPU) over .pt when available
+        tier_backends: Dict[str, BackendConfig] = {}
+        if backend_config_path:
+            print(f"[Engine] Loading backend config from: {backend_config_path}")
+            tier_backends = load_backend_config(backend_config_path)
+        paths = (yolo_n_path, yolo_s_path, yolo_l_path)
+        # A pool's threads are its tier's request in the budget split; an ONNX
+        # tier's workers share one session and so its intra-op thread pool
+        self.backends: List[BackendConfig] = split_thread_budget(
+            [self._pool_backend(self._place_backend(self._resolve_backend(path, tier_backends.get(name)), dev), cfg)
+             for name, path, dev, cfg in zip(MODEL_NAMES, paths, self.tier_devices, pool_configs)],
+            self.ort_runtime.thread_budget,
+        )
+        print("[Engine] Loading YOLO n/s/l on "
+              + ", ".join(f"{n}={d}×{c.workers}" for n, d, c in zip(MODEL_NAMES, self.tier_devices, pool_configs))
+              + " …")
+        self.pools = TierPools([
+            TierPool(name, self._load_replicas(path, torch_device(dev), backend, cfg.workers),
+                     replace(cfg, threads=backend.intra_op_threads), device=dev)
+            for name, path, dev, backend, cfg
+            in zip(MODEL_NAMES, paths, self.tier_devices, self.backends, pool_configs)
+        ])
+        self.models: List[YOLO] = [pool.replicas[0] for pool in self.pools.pools]
+        self._is_onnx: List[bool] = [b.backend == "onnxruntime" for b in self.backends]
+        self._predict_kwargs = [predict_kwargs(b, torch_device(dev))
+                                for b, dev in zip(self.backends, self.tier_devices)]
+        # Per action: its tier and predict kwargs.  The legacy grid calls every
+        # tier exactly as before; any other grid passes imgsz on every call.
+        self._action_tier: List[int] = [MODEL_KEYS.index(a.model) for a in self.actions]
+        legacy = self.actions == action_grid()
+        self._action_kwargs: List[Dict[str, Any]] = [
+            self._predict_kwargs[t] if legacy else {**self._predict_kwargs[t], "imgsz": a.imgsz}
+            for a, t in zip(self.actions, self._action_tier)
         ]
-        self.models: List[YOLO] = [m for m, _ in _pairs]
-        self._is_onnx: List[bool] = [f for _, f in _pairs]
-
-        # RL state — must be reset between independent sessions
-        self.prev_action: int = 0
-        self.prev_conf: float = 0.5
-
+        if torch_threads(self.backends) > 0:
+            torch.set_num_threads(torch_threads(self.backends))
+
+        # Every predict call — live frames and keep-warm passes alike — runs on
+        # its tier's pool, one call per replica at a time: YOLO objects are
+        # not safe to call concurrently.
+        self.queue_spills: Dict[str, int] = {name: 0 for name in self.action_names}
+        self._spill_lock = threading.Lock()
+        self._last_used: List[float] = [time.monotonic()] * len(self.models)
+        # Switch costs per action: a resolution change on one tier is a switch too
+        self.switch_costs = SwitchCostTracker(self.action_names)
+        self._keep_warm_action = [self._action_tier.index(t) for t in range(len(self.models))]
+        self.keep_warm_interval_s = keep_warm_interval_s
+        self._keep_warm_stop = threading.Event()
+        self._keep_warm_thread: Optional[threading.Thread] = None
+        # Set by the admin profiling endpoint for the duration of a session
+        self.profile_session: Optional["ProfileSession"] = None
+
+        # Session defaults; each client stream gets its own RoutingSession.
         # Decision throttling: re-evaluate the RL policy only every N frames.
         self.decision_interval: int = max(1, decision_interval)
-        self._frame_count: int = 0
-        self._current_action: int = 0
+        self.routing_mode: str = routing_mode
+        self.window_size: int = max(1, window_size)
+        self._session: RoutingSession = self.new_session()
 
         # Warm up CUDA kernels on all three models.
         self._warmup()
+        if self.keep_warm_interval_s > 0:
+            self.start_keep_warm()
 
         print("[Engine] Ready.")
 
+    def _check_action_space(self) -> None:
+        """The policy must score exactly the configured (model, resolution) grid."""
+        space = getattr(self.agent, "action_space", None)
+        n_policy = getattr(space, "n", None) or getattr(self.agent, "n_actions", None)
+        if n_policy is not None and int(n_policy) != len(self.actions):
+            raise ValueError(f"Routing policy has {int(n_policy)} actions but the resolution grid "
+                             f"{sorted({a.imgsz for a in self.actions})} gives {len(self.actions)}")
+        if self.online_learner is not None and len(self.actions) != len(MODEL_KEYS):
+            raise ValueError("Online learning routes between the three tiers only; "
+                             "use the default resolution grid with it")
+
     @staticmethod
-    def _load_yolo(path: str, device: str):
-        """Prefer .onnx over .pt for faster CPU inference (deployed only).
-        Checks alongside the .pt file and in /app/models/ (deployed PVC path).
-        Returns (YOLO model, is_onnx). ONNX models skip .to(device)."""
-        base = os.path.splitext(os.path.basename(path))[0]
-        candidates = [
-            os.path.splitext(path)[0] + ".onnx",   # sibling of .pt (local)
-            f"/app/models/{base}.onnx",             # deployed PVC path
-        ]
-        for onnx_path in candidates:
-            if os.path.exists(onnx_path):
-                print(f"[Engine] Using ONNX: {onnx_path}")
-                return YOLO(onnx_path), True
-        print(f"[Engine] Using PyTorch: {path}")
-        return YOLO(path).to(device), False
+    def _resolve_backend(path: str, backend: Optional[BackendConfig] = None) -> BackendConfig:
+        """The configured backend, else .onnx over .pt for faster CPU inference
+        (deployed only) — checked alongside the .pt file and in /app/models/
+        (deployed PVC path)."""
+        if backend is not None:
+            return backend
+        return BackendConfig("onnxruntime" if find_onnx(path) else "torch")
+
+    @staticmethod
+    def _place_backend(backend: BackendConfig, device: str) -> BackendConfig:
+        """The backend a tier runs on when placed on `device`: the engine's
+        ONNX Runtime sessions use CPU providers only, so GPU tiers run on torch."""
+        if is_cuda(device) and backend.backend == "onnxruntime":
+            return BackendConfig("torch")
+        return backend
+
+    @staticmethod
+    def _pool_backend(backend: BackendConfig, pool: PoolConfig) -> BackendConfig:
+        """The tier's thread request for the budget split: its pool's threads when set."""
+        return replace(backend, intra_op_threads=pool.threads) if pool.threads else backend
+
+    def _load_replicas(self, path: str, device: str, backend: BackendConfig, n: int) -> List[Any]:
+        """n models for one tier's workers; ONNX replicas share the first one's session
+        (and its thread pool) and only own their I/O buffers."""
+        first = self._load_yolo(path, device, backend, self.ort_runtime)
+        if hasattr(first, "replica"):
+            return [first] + [first.replica() for _ in range(n - 1)]
+        return [first] + [self._load_yolo(path, device, backend, self.ort_runtime) for _ in range(n - 1)]
+
+    @staticmethod
+    def _load_yolo(path: str, device: str, backend: BackendConfig, runtime: Optional[OrtRuntime] = None):
+        """Loads one tier on `backend` (serving/backends.py). ONNX tiers get an
+        engine-owned ORT session and skip .to(device)."""
+        print(f"[Engine] Using {backend.label}: {path}")
+        return load_backend(path, backend, device, runtime)
 
     def _warmup(self) -> None:
-        print("[Engine] Warming up models (n/s/l) …")
+        print(f"[Engine] Warming up {len(self.actions)} actions ({', '.join(self.action_names)}) …")
         dummy = np.zeros((480, 640, 3), dtype=np.uint8)
-        for i, model in enumerate(self.models):
-            if self._is_onnx[i]:
-                model(dummy, verbose=False)
-            else:
-                model(dummy, verbose=False, device=self.device)
+        # Every replica of every action's tier; also seeds each pool's service-time estimate
+        for tier, kwargs in zip(self._action_tier, self._action_kwargs):
+            self.pools[tier].warm(lambda model: model(dummy, **kwargs))
         print("[Engine] Warm-up complete.")
 
-    def _build_obs(self, frame: np.ndarray) -> np.ndarray:
-        """
-        Build the 1028-dim observation vector that matches the training
-        environment (environment.py → _get_obs):
+    # ── Keep-warm ─────────────────────────────────────────────────────────────
 
-          [visual_feats (1024)] + [edge * 10.0 (1)] + [prev_action/2, prev_conf, 0.0 (3)]
-        """
+    def start_keep_warm(self) -> None:
+        if self._keep_warm_thread is not None and self._keep_warm_thread.is_alive():
+            return
+        self._keep_warm_stop.clear()
+        self._keep_warm_thread = threading.Thread(
+            target=self._keep_warm_loop, name="keep-warm", daemon=True
+        )
+        self._keep_warm_thread.start()
+        print(f"[Engine] Keep-warm enabled (idle > {self.keep_warm_interval_s:.1f}s)")
+
+    def stop_keep_warm(self) -> None:
+        self._keep_warm_stop.set()
+        if self._keep_warm_thread is not None:
+            self._keep_warm_thread.join(timeout=5.0)
+            self._keep_warm_thread = None
+
+    def close(self) -> None:
+        """Stops keep-warm and the tier pools (after their queued calls)."""
+        self.stop_keep_warm()
+        self.pools.shutdown()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Per-tier pool state, per-device backlog and the policy actions re-routed to another tier's pool."""
+        return {"pools": self.pools.stats(), "devices": self.pools.device_stats(),
+                "queue_spills": dict(self.queue_spills), "max_queue_wait_ms": self.max_queue_wait_ms}
+
+    def _keep_warm_loop(self) -> None:
+        dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+        interval = self.keep_warm_interval_s
+        while not self._keep_warm_stop.wait(interval / 2.0):
+            for idx, model in enumerate(self.models):
+                if time.monotonic() - self._last_used[idx] < interval:
+                    continue
+                # Skip rather than queue ahead of live frames — the pool is busy anyway.
+                if self.pools[idx].depth() > 0:
+                    continue
+                try:
+                    action = self._keep_warm_action[idx]
+                    self.pools.run(idx, self._predict, idx, dummy, self._action_kwargs[action])
+                    self._last_used[idx] = time.monotonic()
+                    self.switch_costs.record_keep_warm(self.action_names[action])
+                except Exception as exc:
+                    print(f"[Engine] Keep-warm pass failed for {MODEL_NAMES[idx]} (non-fatal): {exc}")
+
+    def _predict(self, model, idx: int, frame: np.ndarray, kwargs: Optional[Dict[str, Any]] = None):
+        """One call of tier idx's replica `model` — runs on a worker of the tier's pool."""
+        kwargs = kwargs or self._predict_kwargs[idx]
+        if self._is_onnx[idx]:
+            if self.profile_session is not None:
+                self.profile_session.onnx_calls += 1
+            return model(frame, **kwargs)
+        p = self.profile_session
+        if p is not None and p.torch_ops is not None:
+            return p.torch_ops.profile_call(
+                f"yolo_{MODEL_NAMES[idx]}", lambda: model(frame, **kwargs))
+        return model(frame, **kwargs)
+
+    def new_session(
+        self,
+        mode: Optional[str] = None,
+        window_size: Optional[int] = None,
+        decision_interval: Optional[int] = None,
+    ) -> RoutingSession:
+        """Fresh routing state for one client stream; unset args use the engine defaults."""
+        return RoutingSession(
+            mode=mode or self.routing_mode,
+            window_size=window_size or self.window_size,
+            decision_interval=decision_interval or self.decision_interval,
+            n_actions=len(self.actions),
+        )
+
+    @staticmethod
+    def _frame_features(frame: np.ndarray):
+        """(visual_feats (1024,), raw edge density) — same as core/features.py."""
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
         resized = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA)
@@ -164,36 +479,113 @@ class AdaptiveInferenceSystem:
 
         edges = cv2.Canny(gray, 100, 200)
         edge_val = float(np.sum(edges > 0)) / (edges.shape[0] * edges.shape[1])
+        return vis_feats, edge_val
+
+    def _build_obs(self, frame: np.ndarray, session: RoutingSession) -> np.ndarray:
+        """
+        Build the 1028-dim observation vector that matches the training
+        environment (environment.py → _get_obs):
+
+          [visual_feats (1024)] + [edge * 10.0 (1)] + [prev_action/(n_actions−1), prev_conf, 0.0 (3)]
+        """
+        vis_feats, edge_val = self._frame_features(frame)
         scaled_edge = np.array([edge_val * 10.0], dtype=np.float32)
 
         metadata = np.array(
-            [self.prev_action / 2.0, self.prev_conf, 0.0], dtype=np.float32
+            [prev_action_feature(session.prev_action, len(self.actions)), session.prev_conf, 0.0],
+            dtype=np.float32
         )
 
         return np.concatenate([vis_feats, scaled_edge, metadata]).astype(np.float32)
 
-    def _run_yolo(self, model: YOLO, frame: np.ndarray) -> InferenceResult:
-        """Run one YOLO model on a frame and return structured detections."""
-        t0 = time.perf_counter()
-        idx = self.models.index(model)
-        if self._is_onnx[idx]:
-            results = model(frame, verbose=False)
-        else:
-            results = model(frame, verbose=False, device=self.device)
-        latency_ms = (time.perf_counter() - t0) * 1000.0
+    def _decide(self, obs: np.ndarray) -> int:
+        if self.online_learner is not None:
+            return self.online_learner.select_action(obs)
+        action_arr, _ = self.agent.predict(obs, deterministic=True)
+        return int(action_arr)
 
-        boxes = results[0].boxes
-        if len(boxes) > 0:
-            avg_conf = float(torch.mean(boxes.conf).item())
-            count = len(boxes)
+    def _route_by_queue(self, action: int) -> int:
+        """
+        The policy's action, unless its tier's pool is full or (with
+        max_queue_wait_ms) the frame is expected to wait longer than that —
+        in its own pool or behind the other pools on its device: then the
+        action at the same input size whose pool has room and the shortest
+        expected latency (counted as a spill).  With no pool to spill to, the
+        policy's action stands and its submit raises PoolFull.
+        """
+        pools = self.pools
+        tier = self._action_tier[action]
+        if pools[tier].has_room() and (self.max_queue_wait_ms <= 0
+                                       or pools.expected_wait_ms(tier) <= self.max_queue_wait_ms):
+            return action
+        imgsz = self.actions[action].imgsz
+        candidates = [a for a, act in enumerate(self.actions)
+                      if act.imgsz == imgsz and pools[self._action_tier[a]].has_room()]
+        if not candidates:
+            return action
+        best = min(candidates, key=lambda a: (pools.expected_latency_ms(self._action_tier[a]), a != action))
+        if best != action:
+            with self._spill_lock:
+                self.queue_spills[self.action_names[action]] += 1
+        return best
+
+    def _run_action(self, action: int, frame: np.ndarray, switched: bool, trace=NULL_TRACE) -> InferenceResult:
+        """Adaptive path: the action's tier at the action's input size."""
+        result = self._run_yolo(self._action_tier[action], frame, switched=switched, trace=trace,
+                                kwargs=self._action_kwargs[action], name=self.action_names[action])
+        result.model_name = self.action_names[action]
+        return result
+
+    def _run_yolo(
+        self, idx: int, frame: np.ndarray, switched: Optional[bool] = None,
+        trace=NULL_TRACE, stage: str = "", kwargs: Optional[Dict[str, Any]] = None,
+        name: Optional[str] = None,
+    ) -> InferenceResult:
+        """
+        Run YOLO tier idx on a frame and return structured detections.
+
+        switched — for adaptive-path calls, whether the session's previous
+        frame used a different action; the latency is then recorded as a
+        switch or steady-state sample of action `name`.  None (baseline
+        path) records nothing.
+        stage    — span name prefix ("" adaptive, "baseline_" baseline).
+        kwargs   — predict kwargs (default: the tier's, at its default size).
+        """
+        name = name or MODEL_NAMES[idx]
+        with trace.span(stage + "predict", model=name) as span:
+            # latency_ms is the call's own time on a worker, without its queue wait
+            results, latency_ms, wait_ms = self.pools.run(idx, self._predict, idx, frame, kwargs)
+        self._last_used[idx] = time.monotonic()
+        if trace.sampled:
+            # Ultralytics' own pre/inference/post split inside the predict span
+            for key, ms in results[0].speed.items():
+                span.attrs[f"yolo.{key}_ms"] = float(ms)
+            span.attrs["device"] = self.tier_devices[idx]
+            span.attrs["queue_wait_ms"] = round(wait_ms, 3)
+            if switched is not None:
+                span.attrs["switched"] = switched
+        if switched is not None:
+            self.switch_costs.observe(name, latency_ms, switched)
+
+        with trace.span(stage + "postprocess", model=name):
+            return self._to_result(results, latency_ms)
+
+    @staticmethod
+    def _to_result(results, latency_ms: float) -> InferenceResult:
+        det = results[0]
+        if not isinstance(det, Detections):     # Ultralytics Results (torch backends)
+            det = Detections.from_ultralytics(det)
+        if len(det) > 0:
+            avg_conf = float(det.conf.mean())
+            count = len(det)
             detections = [
                 {
-                    "bbox":       box.xyxy[0].tolist(),
-                    "confidence": float(box.conf.item()),
-                    "class_id":   int(box.cls.item()),
-                    "class_name": results[0].names[int(box.cls.item())],
+                    "bbox":       bbox,
+                    "confidence": conf,
+                    "class_id":   cls,
+                    "class_name": det.names[cls],
                 }
-                for box in boxes
+                for bbox, conf, cls in zip(det.xyxy.tolist(), det.conf.tolist(), det.cls.tolist())
             ]
         else:
             avg_conf, count, detections = 0.0, 0, []
@@ -206,37 +598,144 @@ class AdaptiveInferenceSystem:
             avg_confidence=avg_conf,
         )
 
-    def infer(self, frame: np.ndarray, baseline_model_name: str = "Small") -> Dict[str, Any]:
+    def infer(
+        self,
+        frame: np.ndarray,
+        baseline_model_name: str = "Small",
+        session: Optional[RoutingSession] = None,
+        trace=NULL_TRACE,
+        source_shape: Optional[Tuple[int, int]] = None,
+    ) -> Dict[str, Any]:
         """
         Dual-path inference on a single BGR frame.
 
         Path A — Adaptive: PPO agent selects the optimal YOLO variant.
         Path B — Baseline: runs the model specified by baseline_model_name.
+
+        session carries the routing state of the calling stream; the engine's
+        default session is used when omitted.  trace (serving/tracing.py)
+        receives stage spans when the frame is sampled.  source_shape is the
+        client's (height, width) when frame was decoded at reduced size
+        (serving/decode.py); detections are then returned in client pixels.
         """
-        self._frame_count += 1
-        if self._frame_count % self.decision_interval == 1:
-            obs = self._build_obs(frame)
-            action_arr, _ = self.agent.predict(obs, deterministic=True)
-            self._current_action = int(action_arr)
+        p = self.profile_session
+        if p is not None and p.cprofile is not None:
+            return p.cprofile.run(self._infer, frame, baseline_model_name, session, trace, source_shape)
+        return self._infer(frame, baseline_model_name, session, trace, source_shape)
+
+    def _infer(self, frame, baseline_model_name, session, trace, source_shape=None) -> Dict[str, Any]:
+        s = session or self._session
+        s.frame_count += 1
+        source_shape = source_shape or frame.shape[:2]
+
+        if self.gate is not None:
+            adaptive, action = self._infer_gated(frame, s, trace, source_shape)
+        elif s.mode == "window":
+            adaptive, action = self._infer_windowed(frame, s, trace)
+        else:
+            obs = None
+            if s.frame_count % s.decision_interval == 1 or s.decision_interval == 1:
+                with trace.span("features"):
+                    obs = self._build_obs(frame, s)
+                with trace.span("policy"):
+                    s.current_action = self._decide(obs)
+            action = self._route_by_queue(s.current_action)
+            if trace.sampled:
+                trace.attrs["model"] = self.action_names[action]
 
-        action = self._current_action
+            adaptive = self._run_action(action, frame, self._is_switch(s, action), trace)
 
-        adaptive = self._run_yolo(self.models[action], frame)
-        adaptive.model_name = MODEL_NAMES[action]
+            if obs is not None and self.online_learner is not None:
+                self.online_learner.record(obs, action, adaptive.avg_confidence,
+                                           adaptive.latency_ms / 1000.0)
 
-        self.prev_action = action
-        self.prev_conf = adaptive.avg_confidence
+        s.prev_action = action
+        s.prev_conf = adaptive.avg_confidence
 
         _baseline_index = {"Nano": 0, "Small": 1, "Large": 2}
         baseline_idx = _baseline_index.get(baseline_model_name, 1)
-        baseline = self._run_yolo(self.models[baseline_idx], frame)
+        baseline = self._run_yolo(baseline_idx, frame, trace=trace, stage="baseline_")
         baseline.model_name = baseline_model_name
 
+        h, w = frame.shape[:2]
+        if (h, w) != tuple(source_shape):
+            for r in (adaptive, baseline):
+                r.scale_boxes(source_shape[1] / w, source_shape[0] / h)
+
         return {"adaptive": adaptive.to_dict(), "baseline": baseline.to_dict()}
 
+    def _infer_windowed(self, frame: np.ndarray, s: RoutingSession, trace=NULL_TRACE):
+        """
+        Runs the current window's model, pushes the frame into the session's
+        ring buffer and re-decides at window boundaries (and after the first
+        frame, so a session does not spend a whole window on the default model).
+        """
+        with trace.span("features"):
+            vis_feats, edge_val = self._frame_features(frame)
+        action = self._route_by_queue(s.current_action)
+        if trace.sampled:
+            trace.attrs["model"] = self.action_names[action]
+
+        adaptive = self._run_action(action, frame, self._is_switch(s, action), trace)
+
+        s.buffer.add_frame_data(vis_feats, edge_val, adaptive.avg_confidence, adaptive.object_count)
+        s.window_conf_sum += adaptive.avg_confidence
+        s.window_latency_sum += adaptive.latency_ms / 1000.0
+        s.window_frames += 1
+
+        if s.frame_count == 1 or s.buffer.is_window_complete():
+            if self.online_learner is not None and s.decision_obs is not None:
+                # Feedback for the previous decision: its observation and how
+                # the chosen model did over the window it governed.
+                self.online_learner.record(s.decision_obs, action,
+                                           s.window_conf_sum / s.window_frames,
+                                           s.window_latency_sum / s.window_frames)
+            with trace.span("window_obs"):
+                obs = s.buffer.build_observation(action)
+            with trace.span("policy"):
+                s.current_action = self._decide(obs)
+            s.decision_obs = obs
+            s.window_conf_sum = s.window_latency_sum = 0.0
+            s.window_frames = 0
+
+        return adaptive, action
+
+    def _infer_gated(self, frame: np.ndarray, s: RoutingSession, trace=NULL_TRACE,
+                     source_shape: Optional[Tuple[int, int]] = None):
+        """
+        Runs Nano, then re-runs the whole frame on the tier the gate picks
+        from Nano's mean confidence, box count and box density.  The result
+        is the final model's, with Nano's latency included.  Gated frames do
+        not feed the switch-cost statistics: Nano runs on every frame, so an
+        escalation is not a cold switch.  Box density is per megapixel of
+        source_shape, the client's frame (default: frame's own size).
+        """
+        nano = self._run_yolo(0, frame, trace=trace, stage="gate_")
+        with trace.span("gate"):
+            tier = self.gate.decide_one(nano.avg_confidence, nano.object_count,
+                                       source_shape or frame.shape)
+        if trace.sampled:
+            trace.attrs["model"] = MODEL_NAMES[tier]
+            trace.attrs["escalated"] = tier > 0
+        if tier > 0 and not self.pools[tier].has_room():
+            # Nano's answer now beats a frame shed at the escalation tier's full queue
+            with self._spill_lock:
+                self.queue_spills[MODEL_NAMES[tier]] += 1
+            tier = 0
+        if tier == 0:
+            adaptive = nano
+        else:
+            adaptive = self._run_yolo(tier, frame, trace=trace)
+            adaptive.latency_ms += nano.latency_ms
+        adaptive.model_name = MODEL_NAMES[tier]
+        s.current_action = tier
+        return adaptive, tier
+
+    @staticmethod
+    def _is_switch(s: RoutingSession, action: int) -> bool:
+        """True if this frame uses a different action than the session's previous frame."""
+        return s.frame_count > 1 and action != s.prev_action
+
     def reset_state(self) -> None:
-        """Reset RL state tracking. Call at the start of each new session."""
-        self.prev_action = 0
-        self.prev_conf = 0.5
-        self._frame_count = 0
-        self._current_action = 0
+        """Reset the default session's RL state. Call at the start of each new session."""
+        self._session = self.new_session()
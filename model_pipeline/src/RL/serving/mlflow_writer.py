@@ -0,0 +1,228 @@
+"""
+mlflow_writer.py — background MLflow writer for session summaries.
+
+SessionTracker hands finished sessions to MlflowWriter.submit(), which only
+enqueues; no MLflow call ever runs on the event-loop thread.  A daemon thread
+drains the queue and writes each session through MlflowClient with an explicit
+run id (create_run → one log_batch → set_terminated), so concurrent sessions
+never share MLflow's process-global active run.
+
+Failed writes are retried with exponential backoff.  If the tracking server is
+still unreachable the record is appended to a local JSONL spill file, which is
+replayed once the server accepts writes again and at every start().
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+_STOP = object()
+
+
+def session_record(
+    experiment_name: str,
+    metrics: Dict[str, float],
+    params: Optional[Dict[str, Any]] = None,
+    tags: Optional[Dict[str, str]] = None,
+    start_time_ms: Optional[int] = None,
+    end_time_ms: Optional[int] = None,
+) -> Dict[str, Any]:
+    """JSON-serialisable description of one run, as queued and spilled."""
+    now = int(time.time() * 1000)
+    return {
+        "experiment": experiment_name,
+        "metrics":    {k: float(v) for k, v in metrics.items()},
+        "params":     {k: str(v) for k, v in (params or {}).items()},
+        "tags":       dict(tags or {}),
+        "start_time": start_time_ms or now,
+        "end_time":   end_time_ms or now,
+        "run_id":     None,   # filled in once create_run succeeds, so retries reuse the run
+    }
+
+
+class MlflowWriter:
+    """
+    Owns the queue, the writer thread and the spill file.
+
+    Usage
+    -----
+        writer = MlflowWriter(spill_path="/tmp/mlflow_spill.jsonl")
+        writer.start()
+        writer.submit(session_record("adaptive_inference", {"total_frames": 120}))
+        writer.stop()     # drains the queue; anything unwritten is spilled
+    """
+
+    def __init__(
+        self,
+        tracking_uri: Optional[str] = None,
+        spill_path: Optional[str] = None,
+        max_queue: int = 1000,
+        max_retries: int = 3,
+        retry_backoff_s: float = 0.5,
+        replay_interval_s: float = 60.0,
+        client: Optional[MlflowClient] = None,
+    ) -> None:
+        self.tracking_uri = tracking_uri
+        self.spill_path = spill_path
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.replay_interval_s = replay_interval_s
+
+        self._client = client
+        self._experiment_ids: Dict[str, str] = {}
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_replay = 0.0
+
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    # ── Event-loop API ───────────────────────────────────────────────────────
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queues a record without blocking; spills it if the queue is full."""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self._spill(record)
+            return False
+
+    # ── Writer thread ────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="mlflow-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        # Whatever the thread did not get to is kept for the next start()
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                self._spill(record)
+
+    def _run(self) -> None:
+        self._replay_spill()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.replay_interval_s)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+            if record is _STOP:
+                return
+            if self._write_with_retry(record):
+                if time.monotonic() - self._last_replay >= self.replay_interval_s:
+                    self._replay_spill()
+            else:
+                self._spill(record)
+
+    def _client_or_create(self) -> MlflowClient:
+        if self._client is None:
+            self._client = MlflowClient(tracking_uri=self.tracking_uri)
+        return self._client
+
+    def _experiment_id(self, name: str) -> str:
+        if name not in self._experiment_ids:
+            client = self._client_or_create()
+            exp = client.get_experiment_by_name(name)
+            self._experiment_ids[name] = exp.experiment_id if exp else client.create_experiment(name)
+        return self._experiment_ids[name]
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Writes one record synchronously; raises on failure."""
+        client = self._client_or_create()
+        if record.get("run_id") is None:
+            run = client.create_run(
+                self._experiment_id(record["experiment"]),
+                start_time=record["start_time"],
+            )
+            record["run_id"] = run.info.run_id
+        ts = record["end_time"]
+        client.log_batch(
+            record["run_id"],
+            metrics=[Metric(k, v, ts, 0) for k, v in record["metrics"].items()],
+            params=[Param(k, v) for k, v in record["params"].items()],
+            tags=[RunTag(k, v) for k, v in record.get("tags", {}).items()],
+        )
+        client.set_terminated(record["run_id"], "FINISHED", end_time=record["end_time"])
+
+    def _write_with_retry(self, record: Dict[str, Any]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write(record)
+                self.written += 1
+                return True
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    print(f"[Tracking] MLflow write failed after {attempt + 1} attempts "
+                          f"(non-fatal): {exc}")
+                    return False
+                time.sleep(self.retry_backoff_s * (2 ** attempt))
+        return False
+
+    # ── Spill file ───────────────────────────────────────────────────────────
+
+    def _spill(self, record: Dict[str, Any]) -> None:
+        if not self.spill_path:
+            print("[Tracking] Dropping session summary — no spill path configured")
+            return
+        self._append([record])
+        self.spilled += 1
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """Appends records to the spill file without counting them as newly spilled."""
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            with open(self.spill_path, "a") as f:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _replay_spill(self) -> None:
+        """Rewrites spilled records; those that still fail go back to the file."""
+        self._last_replay = time.monotonic()
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock:
+            os.replace(self.spill_path, replay_path)
+        with open(replay_path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+        for i, record in enumerate(records):
+            try:
+                self.write(record)
+            except Exception:
+                # Server still down — keep this and the rest for the next attempt
+                self._append(records[i:])
+                break
+            self.written += 1
+            self.replayed += 1
+        os.remove(replay_path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued":   self._queue.qsize(),
+            "written":  self.written,
+            "spilled":  self.spilled,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,175 @@
+"""
+online_learning.py — incremental NeuralBanditAgent training from live feedback.
+
+Serving records (observation, action, observed confidence, latency) for a
+sampled fraction of routing decisions into a bounded ReplayBuffer.  A daemon
+trainer thread, decoupled from the inference threads, repeatedly samples
+mini-batches, converts them to rewards with RewardCalculator and runs
+NeuralBanditAgent.update_batch().  Every `publish_interval_s` it publishes a
+frozen copy of the network; the inference path only ever reads the published
+copy, which is swapped in with a single reference assignment, so routing
+never waits on training.
+
+Because rewards use latencies measured on the serving hardware, the router
+drifts toward the model mix that suits each deployment without an offline
+retrain.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import torch
+
+from core.agent import NeuralBanditAgent
+from core.replay_buffer import ReplayBuffer
+from core.reward_functions import RewardCalculator
+
+
+class OnlineLearner:
+    """
+    Owns the replay buffer, the training agent and the published serving copy.
+
+    Usage
+    -----
+        learner = OnlineLearner(init_weights="models/rl_bandit_v1.pth")
+        learner.start()
+        action = learner.select_action(obs)              # inference thread
+        learner.record(obs, action, conf, latency_s)     # inference thread
+        learner.stop()
+    """
+
+    def __init__(
+        self,
+        init_weights: Optional[str] = None,
+        buffer_size: int = 10000,
+        sample_rate: float = 0.25,
+        batch_size: int = 64,
+        min_samples: int = 256,
+        updates_per_cycle: int = 4,
+        cycle_interval_s: float = 1.0,
+        publish_interval_s: float = 30.0,
+        learning_rate: float = 1e-3,
+        epsilon: float = 0.05,
+        checkpoint_path: Optional[str] = None,
+        reward: Optional[RewardCalculator] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.agent = NeuralBanditAgent(learning_rate=learning_rate, epsilon=epsilon)
+        if init_weights:
+            self.agent.model.load_state_dict(torch.load(init_weights, map_location="cpu"))
+
+        self.buffer = ReplayBuffer(capacity=buffer_size)
+        self.reward = reward or RewardCalculator()
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.min_samples = min_samples
+        self.updates_per_cycle = updates_per_cycle
+        self.cycle_interval_s = cycle_interval_s
+        self.publish_interval_s = publish_interval_s
+        self.epsilon = epsilon
+        self.checkpoint_path = checkpoint_path
+
+        # Every inference thread draws from _rng; numpy Generators are not thread-safe
+        self._rng = np.random.default_rng(seed)
+        self._rng_lock = threading.Lock()
+        self._train_rng = np.random.default_rng(None if seed is None else seed + 1)
+        self._serving_model = self._frozen_copy()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.version = 0
+        self.updates = 0
+        self.last_loss: Optional[float] = None
+
+    # ── Inference-thread API ─────────────────────────────────────────────────
+
+    def select_action(self, obs: np.ndarray) -> int:
+        """ε-greedy action from the latest published network."""
+        with self._rng_lock:
+            explore = self._rng.random() < self.epsilon
+            random_action = int(self._rng.integers(0, 3)) if explore else None
+        if explore:
+            return random_action
+        model = self._serving_model                     # single atomic read
+        with torch.inference_mode():
+            q_values = model(torch.from_numpy(np.asarray(obs, dtype=np.float32)).unsqueeze(0))
+        return int(torch.argmax(q_values).item())
+
+    def record(self, obs: np.ndarray, action: int, confidence: float, latency_s: float) -> bool:
+        """Adds the decision to the replay buffer with probability sample_rate."""
+        with self._rng_lock:
+            sampled = self._rng.random() < self.sample_rate
+        if not sampled:
+            return False
+        self.buffer.add(obs, action, confidence, latency_s)
+        return True
+
+    # ── Trainer thread ───────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="online-learner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.updates:
+            self.publish()
+
+    def train_step(self) -> Optional[float]:
+        """One mini-batch update; returns the loss, or None if the buffer is too small."""
+        if len(self.buffer) < max(self.min_samples, self.batch_size):
+            return None
+        obs, actions, confs, latencies = self.buffer.sample(self.batch_size, self._train_rng)
+        rewards = self.reward.calculate_batch(confs, latencies)
+        self.last_loss = self.agent.update_batch(obs, actions, rewards)
+        self.updates += 1
+        return self.last_loss
+
+    def publish(self) -> None:
+        """Makes the current training weights visible to select_action()."""
+        self._serving_model = self._frozen_copy()
+        self.version += 1
+        if self.checkpoint_path:
+            tmp_path = self.checkpoint_path + ".tmp"
+            torch.save(self.agent.model.state_dict(), tmp_path)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def _frozen_copy(self) -> torch.nn.Module:
+        model = copy.deepcopy(self.agent.model).eval()
+        for p in model.parameters():
+            p.requires_grad_(False)
+        return model
+
+    def _run(self) -> None:
+        last_publish = time.monotonic()
+        while not self._stop.wait(self.cycle_interval_s):
+            try:
+                for _ in range(self.updates_per_cycle):
+                    if self.train_step() is None:
+                        break
+                if self.updates and time.monotonic() - last_publish >= self.publish_interval_s:
+                    self.publish()
+                    last_publish = time.monotonic()
+            except Exception as exc:
+                print(f"[Online] Trainer step failed (non-fatal): {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffer_size":    len(self.buffer),
+            "samples_seen":   self.buffer.total_added,
+            "updates":        self.updates,
+            "weights_version": self.version,
+            "last_loss":      self.last_loss,
+        }
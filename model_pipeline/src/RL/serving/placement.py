@@ -0,0 +1,83 @@
+"""
+placement.py — per-tier device placement.
+
+Each tier (Nano / Small / Large) is placed on a device of its own choosing:
+
+    auto                      Nano on the CPU (ONNX Runtime when exported),
+                              Small and Large on the GPU when one is present,
+                              every tier on the CPU otherwise
+    cuda                      one device for every tier (the old INFERENCE_DEVICE)
+    Nano=cpu,Small=cuda,…     explicit per-tier devices; unlisted tiers use
+                              the default device
+
+Device names are torch device strings ("cpu", "cuda", "cuda:1").  "cpu:N"
+names a separate CPU execution context that runs on the CPU like "cpu", so
+CPU-only hosts (and tests) can stand in for a multi-device pod.  Tiers on
+one device share its backlog: the router counts work queued on a device's
+other tier pools when it estimates a tier's wait (serving/worker_pools.py).
+
+The same "<tier>=<value>,…" syntax sizes the per-tier worker pools
+(serving/worker_pools.py) through parse_tier_spec().
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, List, Optional
+
+from core.actions import MODEL_KEYS, TIER_NAMES
+
+TIERS = [TIER_NAMES[k] for k in MODEL_KEYS]     # Nano, Small, Large
+
+
+def is_cuda(device: str) -> bool:
+    return device.startswith("cuda")
+
+
+def torch_device(device: str) -> str:
+    """The torch device string for a placement name ("cpu:1" runs on "cpu")."""
+    return "cpu" if device.startswith("cpu") else device
+
+
+def parse_tier_spec(spec: Optional[str], default: Any, cast: Callable[[str], Any] = str) -> List[Any]:
+    """
+    One value per tier (Nano, Small, Large) from "<value>" (every tier) or
+    "<tier>=<value>,…" (unlisted tiers keep `default`); None or "" gives
+    `default` everywhere.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return [default] * len(TIERS)
+    if "=" not in spec:
+        return [cast(spec)] * len(TIERS)
+    values = [default] * len(TIERS)
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        tier, _, value = part.partition("=")
+        tier, value = tier.strip(), value.strip()
+        if tier not in TIERS or not value:
+            raise ValueError(f"Bad tier setting {part.strip()!r}; expected <tier>=<value> "
+                             f"with tier one of {TIERS}")
+        values[TIERS.index(tier)] = cast(value)
+    return values
+
+
+def parse_tier_devices(spec: Optional[str], default_device: str = "cpu",
+                       cuda_available: bool = False) -> List[str]:
+    """
+    Device per tier (Nano, Small, Large) from a placement spec (see module
+    docstring).  None or "" places every tier on default_device; "auto"
+    uses default_device for Small and Large when it is a GPU and
+    cuda_available, and the CPU for everything else.
+    """
+    if (spec or "").strip() == "auto":
+        gpu = default_device if is_cuda(default_device) and cuda_available else "cpu"
+        devices = ["cpu", gpu, gpu]
+    else:
+        devices = parse_tier_spec(spec, default_device)
+    for device in devices:
+        if not (device.startswith("cpu") or is_cuda(device)):
+            raise ValueError(f"Unknown device {device!r}; expected cpu, cpu:N, cuda or cuda:N")
+        if is_cuda(device) and not cuda_available:
+            raise ValueError(f"Tier placement asks for {device!r} but CUDA is not available")
+    return devices
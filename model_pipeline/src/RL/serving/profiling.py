@@ -0,0 +1,224 @@
+"""
+profiling.py — time-bounded, on-demand profiling of the live serving process.
+
+A ProfileSession is started by the admin endpoint (POST /admin/profile in
+app.py) while real traffic keeps flowing, and produces a zip archive with
+
+    sampling mode  stacks.collapsed   — "thread;frame;frame… count" lines, the
+                                        input format of flamegraph.pl / speedscope
+    cprofile mode  profile.pstats     — pstats dump of every engine.infer() call,
+                   profile.txt          merged across executor threads, + top-N text
+    torch_ops=True torch_ops.txt      — aggregated torch.profiler operator table for
+                   torch_trace_*.json   the YOLO calls, plus Chrome traces of the
+                                        first few calls (chrome://tracing, Perfetto)
+
+The sampling profiler reads sys._current_frames() from its own thread, so it
+sees the event loop and every executor thread without touching them.
+cProfile and torch.profiler only record the thread that enabled them, so the
+engine routes calls through the session instead (engine.profile_session):
+each executor thread gets its own cProfile.Profile, and each YOLO call runs
+inside its own torch.profiler context.  The torch profiler is process-global
+state — two threads entering it at once crash the process — so profiled YOLO
+calls run one at a time while torch_ops is on.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+PROFILE_MODES = ("sampling", "cprofile")
+
+# Held around every torch.profiler context; concurrent profilers segfault
+_TORCH_PROFILER_LOCK = threading.Lock()
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """Folded stack for one thread, root first: "thread;file:func;…"."""
+    names: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples the stacks of all (or prefix-matching) threads every interval_s."""
+
+    def __init__(self, interval_s: float = 0.005, thread_prefix: Optional[str] = None) -> None:
+        self.interval_s = interval_s
+        self.thread_prefix = thread_prefix
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == own or (self.thread_prefix and not name.startswith(self.thread_prefix)):
+                    continue
+                self.stacks[collapse_stack(frame, name)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class CProfileCollector:
+    """One cProfile.Profile per calling thread, merged on dump."""
+
+    def __init__(self) -> None:
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+
+    def run(self, fn: Callable, *args, **kwargs):
+        ident = threading.get_ident()
+        with self._lock:
+            prof = self._profiles.setdefault(ident, cProfile.Profile())
+        return prof.runcall(fn, *args, **kwargs)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for prof in profiles[1:]:
+            stats.add(prof)
+        return stats
+
+
+class TorchOpProfiler:
+    """
+    Runs each YOLO call under torch.profiler, aggregates the operator table
+    and keeps Chrome traces of the first max_traces calls.  Calls from
+    different threads are serialized.
+    """
+
+    def __init__(self, trace_dir: str, max_traces: int = 5) -> None:
+        self.trace_dir = trace_dir
+        self.max_traces = max_traces
+        self.calls = 0
+        # op key → [count, cpu_time_total_us, self_cpu_time_total_us]
+        self._ops: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def profile_call(self, name: str, fn: Callable[[], Any]):
+        import torch
+        from torch.profiler import ProfilerActivity, profile, record_function
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        with _TORCH_PROFILER_LOCK, profile(activities=activities) as prof:
+            with record_function(name):
+                out = fn()
+
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+            for evt in prof.key_averages():
+                row = self._ops.setdefault(evt.key, [0, 0.0, 0.0])
+                row[0] += evt.count
+                row[1] += evt.cpu_time_total
+                row[2] += evt.self_cpu_time_total
+        if call_no <= self.max_traces:
+            prof.export_chrome_trace(os.path.join(self.trace_dir, f"torch_trace_{call_no:02d}_{name}.json"))
+        return out
+
+    def table(self, limit: int = 40) -> str:
+        with self._lock:
+            rows = sorted(self._ops.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+        lines = [f"{self.calls} profiled YOLO calls — sorted by self CPU time",
+                 f"{'op':<48} {'count':>8} {'self_cpu_ms':>12} {'cpu_total_ms':>13}"]
+        for key, (count, total, self_total) in rows:
+            lines.append(f"{key[:48]:<48} {int(count):>8} {self_total / 1000:>12.2f} {total / 1000:>13.2f}")
+        return "\n".join(lines) + "\n"
+
+
+class ProfileSession:
+    """
+    One profiling run.  The engine consults `cprofile` / `torch_ops` while the
+    session is attached; the sampling profiler runs on its own thread.
+    """
+
+    def __init__(self, mode: str = "sampling", torch_ops: bool = False,
+                 interval_s: float = 0.005, thread_prefix: Optional[str] = None) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {PROFILE_MODES}, got {mode!r}")
+        self.mode = mode
+        self._tmp = tempfile.TemporaryDirectory(prefix="profile-")
+        self.sampler = SamplingProfiler(interval_s, thread_prefix) if mode == "sampling" else None
+        self.cprofile = CProfileCollector() if mode == "cprofile" else None
+        self.torch_ops = TorchOpProfiler(self._tmp.name) if torch_ops else None
+        self.onnx_calls = 0
+        self.started_at: Optional[float] = None
+        self.duration_s = 0.0
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def stop(self) -> None:
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.duration_s = time.monotonic() - (self.started_at or time.monotonic())
+
+    def archive(self) -> bytes:
+        """Zip of everything collected; call after stop()."""
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            notes = [f"mode: {self.mode}", f"duration_s: {self.duration_s:.2f}"]
+            if self.sampler is not None:
+                zf.writestr("stacks.collapsed", self.sampler.collapsed())
+                notes.append(f"samples: {self.sampler.samples} every {self.sampler.interval_s * 1000:g} ms")
+            if self.cprofile is not None:
+                stats = self.cprofile.stats()
+                if stats is not None:
+                    path = os.path.join(self._tmp.name, "profile.pstats")
+                    stats.dump_stats(path)
+                    zf.write(path, "profile.pstats")
+                    text = io.StringIO()
+                    stats.stream = text
+                    stats.sort_stats("cumulative").print_stats(50)
+                    zf.writestr("profile.txt", text.getvalue())
+                else:
+                    notes.append("no engine.infer() calls during the session")
+            if self.torch_ops is not None:
+                zf.writestr("torch_ops.txt", self.torch_ops.table())
+                for name in sorted(os.listdir(self._tmp.name)):
+                    if name.startswith("torch_trace_"):
+                        zf.write(os.path.join(self._tmp.name, name), name)
+            if self.onnx_calls:
+                notes.append(f"{self.onnx_calls} ONNX Runtime calls were not operator-profiled: "
+                             "ORT profiling is a session option fixed when the model is loaded")
+            zf.writestr("README.txt", "\n".join(notes) + "\n")
+        self._tmp.cleanup()
+        return buf.getvalue()
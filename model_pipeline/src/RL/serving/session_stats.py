@@ -0,0 +1,123 @@
+"""
+session_stats.py — constant-memory streaming statistics for serving sessions.
+
+RunningStats keeps count, sum, sum of squares, min and max together with a
+DDSketch for quantiles, so a session of any length costs the same few KB.
+DDSketch maps each positive value x to bucket ceil(log_γ x), γ = (1+α)/(1-α),
+which guarantees every reported quantile is within relative error α of the
+true value.  Buckets live in a fixed-size integer array; values below the
+lowest representable bucket collapse into it (they only affect the extreme
+low quantiles), and sketches with the same parameters merge by adding
+their arrays.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+QUANTILES = (0.50, 0.95, 0.99)
+
+
+class DDSketch:
+    """Mergeable relative-error quantile sketch over non-negative values."""
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-4,
+                 n_bins: int = 2048) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.n_bins = n_bins
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        self.bins = np.zeros(n_bins, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+
+    @property
+    def max_value(self) -> float:
+        """Largest value represented within the accuracy guarantee."""
+        return self.gamma ** (self._offset + self.n_bins - 1)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value <= 0.0:
+            self.zero_count += 1
+            return
+        i = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        self.bins[min(max(i, 0), self.n_bins - 1)] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        i = int(np.searchsorted(np.cumsum(self.bins), rank - self.zero_count, side="right"))
+        i = min(i, self.n_bins - 1)
+        # Bucket i covers (γ^(k-1), γ^k]; this midpoint is within α of every value in it
+        k = i + self._offset
+        return 2.0 * self.gamma ** k / (self.gamma + 1.0)
+
+    def merge(self, other: "DDSketch") -> None:
+        if (other.gamma, other._offset, other.n_bins) != (self.gamma, self._offset, self.n_bins):
+            raise ValueError("can only merge DDSketches with identical parameters")
+        self.bins += other.bins
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+
+class RunningStats:
+    """count / sum / sum² / min / max plus a DDSketch, updated per value."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = DDSketch(relative_accuracy)
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def merge(self, other: "RunningStats") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    @property
+    def std(self) -> Optional[float]:
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return math.sqrt(max(self.total_sq / self.count - mean * mean, 0.0))
+
+    def summary(self, quantiles: Iterable[float] = QUANTILES) -> Dict[str, float]:
+        """{mean, std, min, max, p50, p95, p99}; empty if nothing was recorded."""
+        if not self.count:
+            return {}
+        out = {"mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+        for q in quantiles:
+            # The sketch's bucket midpoint can fall just outside the observed range
+            out[f"p{round(q * 100):d}"] = min(max(self.sketch.quantile(q), self.min), self.max)
+        return out
@@ -0,0 +1,65 @@
+"""
+switch_cost.py — measures what a model switch costs in serving.
+
+Every adaptive-path YOLO call is classified as
+    switch — the session's previous frame was routed to a different variant
+    steady — same variant as the previous frame
+and its latency is accumulated per (variant, phase).  The difference between
+the two means is the measured switch cost: cache misses, ONNX arena growth
+and GPU memory churn that the training environment only models as a fixed
+reward.switching_penalty.  training/calibrate_switch_penalty.py maps the
+summary back into params.yaml.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Any, Dict, List
+
+PHASES = ("switch", "steady")
+
+
+class SwitchCostTracker:
+    """Thread-safe running latency statistics per (variant, phase)."""
+
+    def __init__(self, model_names: List[str]) -> None:
+        self.model_names = list(model_names)
+        self._lock = threading.Lock()
+        # [n, sum, sum_sq] per (model, phase)
+        self._stats = {(m, p): [0, 0.0, 0.0] for m in self.model_names for p in PHASES}
+        self.keep_warm_passes = {m: 0 for m in self.model_names}
+
+    def observe(self, model_name: str, latency_ms: float, switched: bool) -> None:
+        with self._lock:
+            s = self._stats[(model_name, "switch" if switched else "steady")]
+            s[0] += 1
+            s[1] += latency_ms
+            s[2] += latency_ms * latency_ms
+
+    def record_keep_warm(self, model_name: str) -> None:
+        with self._lock:
+            self.keep_warm_passes[model_name] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        {model: {switch_n, switch_mean_ms, switch_std_ms, steady_n, steady_mean_ms,
+                 steady_std_ms, switch_cost_ms, keep_warm_passes}}
+        switch_cost_ms is None until both phases have been observed.
+        """
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for m in self.model_names:
+                row: Dict[str, Any] = {}
+                for p in PHASES:
+                    n, total, total_sq = self._stats[(m, p)]
+                    mean = total / n if n else None
+                    var = max(total_sq / n - mean * mean, 0.0) if n else None
+                    row[f"{p}_n"] = n
+                    row[f"{p}_mean_ms"] = round(mean, 3) if n else None
+                    row[f"{p}_std_ms"] = round(math.sqrt(var), 3) if n else None
+                sw, st = row["switch_mean_ms"], row["steady_mean_ms"]
+                row["switch_cost_ms"] = round(sw - st, 3) if sw is not None and st is not None else None
+                row["keep_warm_passes"] = self.keep_warm_passes[m]
+                out[m] = row
+            return out
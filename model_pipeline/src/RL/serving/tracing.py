@@ -0,0 +1,266 @@
+"""
+tracing.py — per-frame span instrumentation for the serving pipeline.
+
+A Tracer decides per frame (sample_rate) whether the frame is traced.  For a
+sampled frame, app.py and engine.py open spans around each stage
+
+    decode → features → [window_obs] → policy → predict → postprocess
+           → baseline_predict → baseline_postprocess → serialize → send
+
+and Tracer.finish() reports every span's duration to an observer callback
+(app.py feeds a Prometheus histogram labelled by stage and model) and, if an
+exporter is configured, queues the trace for OTLP/JSON export.  Unsampled
+frames get NULL_TRACE, whose span() is a shared no-op context manager, so
+the cost of instrumentation off the sampled path is one attribute lookup.
+
+The trace object is passed explicitly (engine.infer(..., trace=...)) rather
+than through context variables, because each frame hops from the event loop
+to an executor thread and back.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional
+
+SERVICE_NAME = "adaptive-inference"
+SCOPE_NAME = "serving.tracing"
+
+
+def _span_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "start_ns", "end_ns", "attrs")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = _span_id()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = 0
+        self.attrs = attrs
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class _SpanContext:
+    __slots__ = ("_trace", "_span")
+
+    def __init__(self, trace: "Trace", span: Span) -> None:
+        self._trace = trace
+        self._span = span
+
+    def __enter__(self) -> Span:
+        return self._span
+
+    def __exit__(self, *exc) -> None:
+        self._span.end_ns = time.perf_counter_ns()
+        self._trace.spans.append(self._span)
+
+
+class Trace:
+    """Spans of one frame, all children of a root "frame" span."""
+
+    sampled = True
+
+    def __init__(self, **attrs: Any) -> None:
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span("frame", attrs)
+        # perf_counter is used for durations; this maps it onto wall-clock time for export
+        self._epoch_offset_ns = time.time_ns() - self.root.start_ns
+        self.spans: List[Span] = []
+
+    @property
+    def attrs(self) -> Dict[str, Any]:
+        return self.root.attrs
+
+    def span(self, name: str, **attrs: Any) -> _SpanContext:
+        return _SpanContext(self, Span(name, attrs))
+
+    def end(self) -> None:
+        self.root.end_ns = time.perf_counter_ns()
+
+    def to_otlp_spans(self) -> List[Dict[str, Any]]:
+        out = []
+        for span in [self.root] + self.spans:
+            item = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,   # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns + self._epoch_offset_ns),
+                "endTimeUnixNano": str(span.end_ns + self._epoch_offset_ns),
+                "attributes": [_otlp_attr(k, v) for k, v in span.attrs.items()],
+            }
+            if span is not self.root:
+                item["parentSpanId"] = self.root.span_id
+            out.append(item)
+        return out
+
+
+class _NullTrace:
+    """Stand-in for unsampled frames; every operation is a no-op."""
+
+    sampled = False
+    attrs: Dict[str, Any] = {}
+    _ctx = contextlib.nullcontext()
+
+    def span(self, name: str, **attrs: Any):
+        return self._ctx
+
+    def end(self) -> None:
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def _otlp_attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+def otlp_payload(spans: List[Dict[str, Any]], service_name: str = SERVICE_NAME) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for a batch of spans."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attr("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpExporter:
+    """
+    Batches finished traces on a daemon thread and writes them as OTLP/JSON —
+    one ExportTraceServiceRequest per line to `path`, and/or POSTed to
+    `endpoint` (an OTLP/HTTP collector's /v1/traces).  Export failures are
+    logged and dropped; they never reach the request path.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        batch_size: int = 64,
+        flush_interval_s: float = 5.0,
+        max_queue: int = 10000,
+    ) -> None:
+        self.path = path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.exported = 0
+        self.dropped = 0
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        batch: List[Trace] = []
+        deadline = time.monotonic() + self.flush_interval_s
+        while True:
+            try:
+                trace = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                trace = False
+            if trace:
+                batch.append(trace)
+            if trace is None or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self.export(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval_s
+            if trace is None:
+                return
+
+    def export(self, traces: List[Trace]) -> None:
+        spans = [s for t in traces for s in t.to_otlp_spans()]
+        body = json.dumps(otlp_payload(spans))
+        try:
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(body + "\n")
+            if self.endpoint:
+                req = urllib.request.Request(self.endpoint, data=body.encode(), method="POST",
+                                             headers={"Content-Type": "application/json"})
+                urllib.request.urlopen(req, timeout=5).close()
+            self.exported += len(traces)
+        except Exception as exc:
+            self.dropped += len(traces)
+            print(f"[Tracing] Export failed (non-fatal): {exc}")
+
+
+class Tracer:
+    """
+    Samples frames and reports finished traces.
+
+    observe(stage, model, seconds) is called for every span of a sampled frame;
+    spans without a "model" attribute are labelled with the trace's "model"
+    (the adaptive variant chosen for the frame).
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        observe: Optional[Callable[[str, str, float], None]] = None,
+        exporter: Optional[OtlpExporter] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be in [0, 1], got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.observe = observe
+        self.exporter = exporter
+        self._rng = random.Random(seed)
+
+    def start_trace(self, **attrs: Any):
+        if self.sample_rate and self._rng.random() < self.sample_rate:
+            return Trace(**attrs)
+        return NULL_TRACE
+
+    def finish(self, trace) -> None:
+        if not trace.sampled:
+            return
+        trace.end()
+        if self.observe is not None:
+            default_model = str(trace.attrs.get("model", "none"))
+            for span in trace.spans:
+                self.observe(span.name, str(span.attrs.get("model", default_model)), span.duration_s)
+        if self.exporter is not None:
+            self.exporter.submit(trace)
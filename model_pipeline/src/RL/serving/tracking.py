@@ -1,8 +1,11 @@
 """
 tracking.py — MLflow session tracking for the Adaptive ML Inference System.
 
-Accumulates per-frame dual-path results during a WebSocket session and logs
-a summary to MLflow when the session ends (finalize()).
+Accumulates per-frame dual-path results during a WebSocket session and, when
+the session ends (finalize()), hands a summary to the background MlflowWriter
+(see mlflow_writer.py).  Nothing here talks to the tracking server, so
+connection accept and disconnect never wait on MLflow; the run itself is only
+created by the writer thread, and only for sessions that processed frames.
 
 Logged metrics
 --------------
@@ -11,6 +14,12 @@ avg_baseline_latency_ms   — mean latency of the fixed-Small baseline
 latency_savings_ms        — baseline_avg − adaptive_avg  (positive = faster)
 total_frames              — total frames processed in the session
 model_pct_nano/small/large — percentage of frames routed to each YOLO variant
+{adaptive,baseline}_latency_{p50,p95,p99,std,min,max}_ms — latency distribution
+adaptive_confidence_{p50,p95,p99} — confidence distribution
+
+Per-frame values are folded into constant-memory RunningStats (see
+session_stats.py) as they arrive, so tracker memory does not grow with the
+session length.
 
 Logged params
 -------------
@@ -19,10 +28,29 @@ model_distribution        — raw counts per model as a string
 
 from __future__ import annotations
 
-from collections import defaultdict
-from typing import Any, Dict, List
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from serving.mlflow_writer import MlflowWriter, session_record
+from serving.session_stats import QUANTILES, RunningStats
+
+DEFAULT_MODEL_NAMES = ("Nano", "Small", "Large")
+
+_default_writer: Optional[MlflowWriter] = None
+_default_writer_lock = threading.Lock()
+
 
-import mlflow
+def default_writer() -> MlflowWriter:
+    """Process-wide writer used when a tracker is not given one explicitly."""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = MlflowWriter()
+            _default_writer.start()
+        return _default_writer
 
 
 class SessionTracker:
@@ -31,23 +59,25 @@ class SessionTracker:
 
     Usage
     -----
-        tracker = SessionTracker()
+        tracker = SessionTracker(writer=writer)
         for frame_result in session:
             tracker.record(frame_result)
         tracker.finalize()   # called in the WebSocket disconnect handler
     """
 
-    def __init__(self, experiment_name: str = "adaptive_inference") -> None:
-        mlflow.set_experiment(experiment_name)
-        # End any stale run left over from a session that disconnected without finalizing
-        if mlflow.active_run() is not None:
-            mlflow.end_run()
-        self._run = mlflow.start_run()
-
-        self._adaptive_latencies: List[float] = []
-        self._baseline_latencies: List[float] = []
-        self._adaptive_confidences: List[float] = []
-        self._model_counts: Dict[str, int] = defaultdict(int)
+    def __init__(self, experiment_name: str = "adaptive_inference",
+                 model_names: Sequence[str] = DEFAULT_MODEL_NAMES,
+                 writer: Optional[MlflowWriter] = None) -> None:
+        self.experiment_name = experiment_name
+        self._writer = writer
+        self._start_time_ms = int(time.time() * 1000)
+
+        self._adaptive_latency = RunningStats()
+        self._baseline_latency = RunningStats()
+        self._adaptive_confidence = RunningStats()
+        self._model_names = tuple(model_names)
+        self._model_index = {name: i for i, name in enumerate(self._model_names)}
+        self._model_counts = np.zeros(len(self._model_names), dtype=np.int64)
         self._frame_count: int = 0
 
     # ──────────────────────────────────────────────────────────────────────────
@@ -64,26 +94,36 @@ class SessionTracker:
             "latency_ms" and "model_name".
         """
         self._frame_count += 1
-        self._adaptive_latencies.append(result["adaptive"]["latency_ms"])
-        self._baseline_latencies.append(result["baseline"]["latency_ms"])
-        self._model_counts[result["adaptive"]["model_name"]] += 1
+        self._adaptive_latency.add(result["adaptive"]["latency_ms"])
+        self._baseline_latency.add(result["baseline"]["latency_ms"])
+        self._model_counts[self._model_index[result["adaptive"]["model_name"]]] += 1
         conf = result["adaptive"].get("avg_confidence")
         if conf is not None:
-            self._adaptive_confidences.append(float(conf))
+            self._adaptive_confidence.add(conf)
+
+    def model_distribution(self) -> Dict[str, int]:
+        return {name: int(c) for name, c in zip(self._model_names, self._model_counts) if c}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Streaming statistics so far: {adaptive_latency_ms, baseline_latency_ms, adaptive_confidence}."""
+        return {
+            "adaptive_latency_ms": self._adaptive_latency.summary(),
+            "baseline_latency_ms": self._baseline_latency.summary(),
+            "adaptive_confidence": self._adaptive_confidence.summary(),
+        }
 
     def finalize(self) -> None:
         """
-        Compute session summary, log to MLflow, and close the active run.
-        Safe to call even if no frames were recorded or if MLflow is unavailable.
+        Compute the session summary and queue it for the MLflow writer.
+        Never blocks on the tracking server; sessions without frames log nothing.
         """
         try:
             if self._frame_count == 0:
-                mlflow.end_run()
                 return
 
             n = self._frame_count
-            avg_adaptive = sum(self._adaptive_latencies) / n
-            avg_baseline = sum(self._baseline_latencies) / n
+            avg_adaptive = self._adaptive_latency.mean
+            avg_baseline = self._baseline_latency.mean
             savings = avg_baseline - avg_adaptive
 
             metrics_payload: Dict[str, float] = {
@@ -92,30 +132,39 @@ class SessionTracker:
                 "latency_savings_ms":      round(savings, 2),
                 "total_frames":            n,
             }
-            if self._adaptive_confidences:
-                avg_conf = sum(self._adaptive_confidences) / len(self._adaptive_confidences)
-                metrics_payload["avg_adaptive_confidence"] = round(avg_conf, 4)
-
-            mlflow.log_metrics(metrics_payload)
-
-            for model_name, count in self._model_counts.items():
+            for prefix, stats in (("adaptive", self._adaptive_latency),
+                                  ("baseline", self._baseline_latency)):
+                for key, value in stats.summary().items():
+                    if key != "mean":
+                        metrics_payload[f"{prefix}_latency_{key}_ms"] = round(value, 2)
+            if self._adaptive_confidence.count:
+                conf = self._adaptive_confidence.summary()
+                metrics_payload["avg_adaptive_confidence"] = round(conf["mean"], 4)
+                for q in QUANTILES:
+                    key = f"p{round(q * 100):d}"
+                    metrics_payload[f"adaptive_confidence_{key}"] = round(conf[key], 4)
+
+            distribution = self.model_distribution()
+            for model_name, count in distribution.items():
                 pct = (count / n) * 100.0
-                mlflow.log_metric(f"model_pct_{model_name.lower()}", round(pct, 2))
-
-            mlflow.log_param("model_distribution", str(dict(self._model_counts)))
+                # "Nano@320" → model_pct_nano_320 (MLflow keys allow no "@")
+                metrics_payload[f"model_pct_{model_name.lower().replace('@', '_')}"] = round(pct, 2)
 
-            mlflow.end_run()
+            writer = self._writer or default_writer()
+            writer.submit(session_record(
+                self.experiment_name,
+                metrics_payload,
+                params={"model_distribution": distribution},
+                start_time_ms=self._start_time_ms,
+            ))
 
             print(
                 f"[Tracking] Session complete — {n} frames | "
                 f"adaptive avg {avg_adaptive:.1f} ms | "
                 f"baseline avg {avg_baseline:.1f} ms | "
+                f"p95 {self._adaptive_latency.sketch.quantile(0.95):.1f} ms | "
                 f"savings {savings:+.1f} ms | "
-                f"distribution {dict(self._model_counts)}"
+                f"distribution {distribution}"
             )
         except Exception as exc:
-            print(f"[Tracking] MLflow logging failed (non-fatal): {exc}")
-            try:
-                mlflow.end_run()
-            except Exception:
-                pass
+            print(f"[Tracking] Session summary failed (non-fatal): {exc}")
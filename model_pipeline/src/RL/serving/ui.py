@@ -69,7 +69,8 @@ def _draw_boxes(frame, detections, color):
 
 def _overlay_hud(frame, model_name, latency_ms, avg_conf, is_adaptive):
     out = frame.copy()
-    color = MODEL_COLORS.get(model_name, (200, 200, 200)) if is_adaptive else BASELINE_COLOR
+    # "Nano@320" keeps its tier's colour
+    color = MODEL_COLORS.get(model_name.split("@")[0], (200, 200, 200)) if is_adaptive else BASELINE_COLOR
     prefix = "RL" if is_adaptive else "Baseline"
     cv2.putText(out, f"{prefix}: {model_name}", (10, 32),
                 cv2.FONT_HERSHEY_DUPLEX, 0.85, color, 2)
@@ -165,7 +166,7 @@ def _update_ui(frame, result, lats_a, lats_b, confs_a, confs_b, update_left=True
     adp = result["adaptive"]
     bsl = result["baseline"]
 
-    adp_color = MODEL_COLORS.get(adp["model_name"], (200, 200, 200))
+    adp_color = MODEL_COLORS.get(adp["model_name"].split("@")[0], (200, 200, 200))
     af = _overlay_hud(_draw_boxes(frame, adp["detections"], adp_color),
                       adp["model_name"], adp["latency_ms"], adp["avg_confidence"], True)
     bf = _overlay_hud(_draw_boxes(frame, bsl["detections"], BASELINE_COLOR),
@@ -393,7 +394,7 @@ function renderLoop() {{
     if (lastResult) {{
       const adp = lastResult.adaptive;
       const bsl = lastResult.baseline;
-      overlayResult(xA, adp.detections, MODEL_COLORS[adp.model_name] || '#ccc',
+      overlayResult(xA, adp.detections, MODEL_COLORS[adp.model_name.split('@')[0]] || '#ccc',
                     'RL: ' + adp.model_name, adp.latency_ms, adp.avg_confidence);
       overlayResult(xB, bsl.detections, BL_COLOR,
                     'Baseline: ' + bsl.model_name, bsl.latency_ms, bsl.avg_confidence);
@@ -0,0 +1,243 @@
+"""
+worker_pools.py — one worker pool per YOLO tier, each with its own queue.
+
+Every tier (Nano / Small / Large) runs its predict calls on a TierPool:
+`workers` threads, each owning one model replica (ONNX replicas share their
+InferenceSession and only own their I/O buffers), fed from the pool's own
+queue.  The router enqueues each frame to the pool of the tier it picked,
+so a Large call in progress never delays a Nano frame, and the CPU a tier
+gets follows its pool size instead of whichever thread handles the frame.
+
+Per pool (PoolConfig):
+    workers     concurrent predict calls, one replica each
+    max_queue   calls allowed to wait for a free worker; submit() raises
+                PoolFull beyond that (0 = unbounded)
+    threads     intra-op threads for the whole pool — an ONNX tier's workers
+                share one session and its thread pool; torch's pool is
+                process-wide (0 = the tier's share of the engine's budget)
+
+Each pool reports queue depth, queue wait (mean / p50 / p95 from a
+RunningStats), service time, busy share and rejections, and estimates
+how long a call submitted now would wait from an EWMA of its service
+times — which the engine's router reads before enqueueing a frame.
+
+Pools on the same device (serving/placement.py — e.g. Small and Large on
+one GPU, or two tiers on one "cpu:N" context) share its compute, so
+TierPools adds the backlog of a device's other pools to a tier's expected
+wait: a busy Large pool makes Small on the same GPU look busy too, while
+tiers on other devices are unaffected.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from serving.placement import parse_tier_spec
+from serving.session_stats import RunningStats
+
+EWMA_ALPHA = 0.2      # weight of the newest sample in the service-time estimate
+
+
+class PoolFull(RuntimeError):
+    """A tier pool's queue is at max_queue; the frame should be shed or re-routed."""
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    workers: int = 1
+    max_queue: int = 0
+    threads: int = 0
+
+    def __post_init__(self) -> None:
+        if self.workers < 1:
+            raise ValueError(f"workers must be ≥ 1, got {self.workers}")
+        if self.max_queue < 0 or self.threads < 0:
+            raise ValueError(f"max_queue and threads must be ≥ 0, got {self.max_queue}, {self.threads}")
+
+
+def parse_pool_configs(workers: Optional[str] = None, max_queue: Optional[str] = None,
+                       threads: Optional[str] = None) -> List[PoolConfig]:
+    """PoolConfig per tier from "<n>" or "<tier>=<n>,…" specs (serving/placement.parse_tier_spec)."""
+    return [PoolConfig(w, q, t) for w, q, t in zip(parse_tier_spec(workers, 1, int),
+                                                   parse_tier_spec(max_queue, 0, int),
+                                                   parse_tier_spec(threads, 0, int))]
+
+
+class TierPool:
+    """
+    Worker pool of one tier.  submit(fn, *args) runs fn(replica, *args) on
+    a free worker's replica; its future resolves to (fn's result, service
+    ms, queue wait ms).
+    """
+
+    def __init__(self, name: str, replicas: Sequence[Any], config: Optional[PoolConfig] = None,
+                 device: str = "cpu") -> None:
+        self.name = name
+        self.replicas = list(replicas)
+        self.config = config or PoolConfig(workers=len(self.replicas))
+        if len(self.replicas) != self.config.workers:
+            raise ValueError(f"{name}: {len(self.replicas)} replicas for {self.config.workers} workers")
+        self.device = device
+        self._executor = ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix=f"pool-{name}")
+        self._free: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        for replica in self.replicas:
+            self._free.put(replica)
+        self._lock = threading.Lock()
+        self._pending = 0             # queued + running
+        self._running = 0
+        self._service_ms: Optional[float] = None
+        self._busy_ms = 0.0
+        self._started = time.monotonic()
+        self.wait_ms = RunningStats()
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def workers(self) -> int:
+        return self.config.workers
+
+    def estimate_ms(self) -> float:
+        """EWMA service time of this tier's calls (0 before the first one)."""
+        return self._service_ms or 0.0
+
+    def depth(self) -> int:
+        """Calls queued or running."""
+        return self._pending
+
+    def waiting(self) -> int:
+        return self._pending - self._running
+
+    def has_room(self) -> bool:
+        return not self.config.max_queue or self._pending - self.workers < self.config.max_queue
+
+    def expected_wait_ms(self) -> float:
+        """Estimated queue wait of a call submitted now: the work ahead of it spread over the workers."""
+        ahead = self._pending - self.workers + 1
+        return max(ahead, 0) * self.estimate_ms() / self.workers
+
+    def backlog_ms(self) -> float:
+        """Estimated work queued or running on this pool, spread over its workers."""
+        return self._pending * self.estimate_ms() / self.workers
+
+    def _observe_service(self, service_ms: float) -> None:
+        prev = self._service_ms
+        self._service_ms = service_ms if prev is None else prev + EWMA_ALPHA * (service_ms - prev)
+        self._busy_ms += service_ms
+
+    def warm(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Runs fn(replica, *args) on every replica in the calling thread — before serving, to
+        warm each replica and seed the service-time estimate."""
+        for replica in self.replicas:
+            t0 = time.perf_counter()
+            fn(replica, *args, **kwargs)
+            with self._lock:
+                self._observe_service((time.perf_counter() - t0) * 1000.0)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self.config.max_queue and self._pending - self.workers >= self.config.max_queue:
+                self.rejected += 1
+                raise PoolFull(f"{self.name} pool queue is full ({self.config.max_queue} waiting)")
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            replica = self._free.get()
+            with self._lock:
+                self._running += 1
+            try:
+                result = fn(replica, *args, **kwargs)
+            finally:
+                self._free.put(replica)
+                service_ms = (time.perf_counter() - started) * 1000.0
+                wait_ms = (started - submitted) * 1000.0
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._observe_service(service_ms)
+                    self.wait_ms.add(wait_ms)
+                    self.completed += 1
+            return result, service_ms, wait_ms
+
+        return self._executor.submit(run)
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        """Submits and waits: (fn's result, service ms, queue wait ms)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            wait = self.wait_ms.summary()
+            elapsed_ms = (time.monotonic() - self._started) * 1000.0
+            return {
+                "device":        self.device,
+                "workers":       self.workers,
+                "threads":       self.config.threads,
+                "max_queue":     self.config.max_queue,
+                "depth":         self._pending,
+                "waiting":       self._pending - self._running,
+                "wait_ms_mean":  round(wait["mean"], 3) if wait else None,
+                "wait_ms_p50":   round(wait["p50"], 3) if wait else None,
+                "wait_ms_p95":   round(wait["p95"], 3) if wait else None,
+                "service_ms":    round(self._service_ms, 3) if self._service_ms is not None else None,
+                "busy_pct":      round(self._busy_ms / max(elapsed_ms * self.workers, 1e-9) * 100.0, 2),
+                "completed":     self.completed,
+                "rejected":      self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+class TierPools:
+    """The TierPool of every tier, indexed like MODEL_NAMES (Nano, Small, Large)."""
+
+    def __init__(self, pools: Sequence[TierPool]) -> None:
+        self.pools = list(pools)
+
+    def __getitem__(self, tier: int) -> TierPool:
+        return self.pools[tier]
+
+    def __len__(self) -> int:
+        return len(self.pools)
+
+    def run(self, tier: int, fn: Callable[..., Any], *args: Any, **kwargs: Any):
+        return self.pools[tier].run(fn, *args, **kwargs)
+
+    def device_peers(self, tier: int) -> List[TierPool]:
+        """The other pools placed on `tier`'s device."""
+        device = self.pools[tier].device
+        return [p for t, p in enumerate(self.pools) if t != tier and p.device == device]
+
+    def expected_wait_ms(self, tier: int) -> float:
+        """Expected wait of a call to `tier`: its own pool's queue plus the device's other pools' backlog."""
+        return self.pools[tier].expected_wait_ms() + sum(p.backlog_ms() for p in self.device_peers(tier))
+
+    def expected_latency_ms(self, tier: int) -> float:
+        """Expected wait of a call to `tier` plus its own estimated service time."""
+        return self.expected_wait_ms(tier) + self.pools[tier].estimate_ms()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {pool.name: pool.stats() for pool in self.pools}
+
+    def device_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per device: its tiers, calls queued or running, and estimated backlog."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for pool in self.pools:
+            row = out.setdefault(pool.device, {"tiers": [], "depth": 0, "backlog_ms": 0.0})
+            row["tiers"].append(pool.name)
+            row["depth"] += pool.depth()
+            row["backlog_ms"] += pool.backlog_ms()
+        for row in out.values():
+            row["backlog_ms"] = round(row["backlog_ms"], 3)
+        return out
+
+    def shutdown(self) -> None:
+        for pool in self.pools:
+            pool.shutdown()
@@ -0,0 +1,185 @@
+"""
+yolo_ops.py — engine-owned pre- and post-processing for the ONNX Runtime YOLO path.
+
+Letterbox reproduces Ultralytics' LetterBox geometry (scale to fit, centre,
+pad with 114 — to the full input size, or with auto=True only to a multiple of
+the stride, as Ultralytics does for dynamic-shape exports) but writes into
+buffers that are only reallocated when the source resolution changes: cv2.resize
+writes straight into a persistent uint8 canvas, and the BGR HWC → RGB NCHW
+float conversion is a single ufunc call into a preallocated (1, 3, H, W)
+float32 array.  That array is what OrtYOLO binds as the session input, so a
+frame of a steady stream costs no allocations between decode and inference.
+
+postprocess() turns the raw (1, 4 + classes, anchors) head output into
+Detections in original-frame pixels with NumPy / OpenCV only: best class per
+anchor, confidence filter, per-class NMS via the same class-offset trick and
+float32 arithmetic as Ultralytics' non_max_suppression, then the letterbox
+undone as in Ultralytics' scale_boxes.  Results match Ultralytics box for
+box without building tensors or Results objects per frame.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+PAD_VALUE = 114
+MAX_WH = 7680        # class offset for per-class NMS (Ultralytics' max_wh)
+MAX_NMS = 30000      # boxes kept for NMS, by confidence
+CV2_NMS_MAX = 1000   # above this many candidates the greedy NumPy NMS (which stops at max_det) is faster
+
+
+class Letterbox:
+    """
+    Letterboxes BGR frames into `buffer`, a (1, 3, H, W) float32 RGB array in
+    [0, 1].  The returned array is overwritten by the next call.  H, W is
+    imgsz, or with auto=True the smallest stride multiple that holds the
+    resized frame.
+    """
+
+    def __init__(self, imgsz: Tuple[int, int] = (640, 640), stride: int = 32, auto: bool = False) -> None:
+        self.imgsz = (int(imgsz[0]), int(imgsz[1]))
+        self.stride = stride
+        self.auto = auto
+        h, w = self.imgsz
+        self.buffer = np.empty((1, 3, h, w), dtype=np.float32)
+        self._canvas = np.full((h, w, 3), PAD_VALUE, dtype=np.uint8)
+        self._src_shape: Tuple[int, int] = (0, 0)
+        self.ratio = 1.0
+        self.gain: Tuple[float, float] = (1.0, 1.0)   # (x, y) from the rounded resized size
+        self.pad: Tuple[int, int] = (0, 0)            # (left, top)
+        self._unpad: Tuple[int, int] = (w, h)     # resized (width, height)
+
+    def _set_geometry(self, h0: int, w0: int) -> None:
+        h, w = self.imgsz
+        r = min(h / h0, w / w0)
+        new_w, new_h = int(round(w0 * r)), int(round(h0 * r))
+        dw, dh = w - new_w, h - new_h
+        if self.auto:
+            dw, dh = dw % self.stride, dh % self.stride
+        # The ±0.1 matches Ultralytics' split of odd padding between the two sides
+        left, top = int(round(dw / 2 - 0.1)), int(round(dh / 2 - 0.1))
+        out_h = new_h + top + int(round(dh / 2 + 0.1))
+        out_w = new_w + left + int(round(dw / 2 + 0.1))
+        if self._canvas.shape[:2] != (out_h, out_w):
+            self.buffer = np.empty((1, 3, out_h, out_w), dtype=np.float32)
+            self._canvas = np.empty((out_h, out_w, 3), dtype=np.uint8)
+        self.ratio = r
+        self.gain = (new_w / w0, new_h / h0)
+        self.pad = (left, top)
+        self._unpad = (new_w, new_h)
+        self._src_shape = (h0, w0)
+        self._canvas.fill(PAD_VALUE)
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        h0, w0 = frame.shape[:2]
+        if (h0, w0) != self._src_shape:
+            self._set_geometry(h0, w0)
+        (left, top), (new_w, new_h) = self.pad, self._unpad
+        region = self._canvas[top:top + new_h, left:left + new_w]
+        if (new_w, new_h) == (w0, h0):
+            region[...] = frame
+        else:
+            cv2.resize(frame, (new_w, new_h), dst=region, interpolation=cv2.INTER_LINEAR)
+        # BGR HWC → RGB CHW, scaled to [0, 1], straight into the bound input buffer
+        np.divide(self._canvas.transpose(2, 0, 1)[::-1], np.float32(255.0), out=self.buffer[0])
+        return self.buffer
+
+
+@dataclass
+class Detections:
+    """Detections of one frame: xyxy (n, 4) in frame pixels, conf (n,), cls (n,)."""
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+    names: Dict[int, str]
+    orig_shape: Tuple[int, int]
+    speed: Dict[str, float] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    @classmethod
+    def from_ultralytics(cls, result) -> "Detections":
+        boxes = result.boxes
+        return cls(
+            xyxy=boxes.xyxy.cpu().numpy(),
+            conf=boxes.conf.cpu().numpy(),
+            cls=boxes.cls.cpu().numpy().astype(np.int64),
+            names=result.names,
+            orig_shape=tuple(result.orig_shape),
+            speed=dict(result.speed),
+        )
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float, max_keep: int = 0) -> np.ndarray:
+    """
+    NMS with torchvision.ops.nms semantics: highest score first, drop every
+    remaining box with IoU > iou_thres.  Returns at most max_keep (0 = all)
+    kept indices, in score order.  Typical frames go through OpenCV's
+    NMSBoxes; crowded ones through the NumPy loop.
+    """
+    if len(scores) > CV2_NMS_MAX:
+        return _greedy_nms(boxes, scores, iou_thres, max_keep)
+    xywh = boxes.copy()
+    xywh[:, 2:] -= boxes[:, :2]
+    keep = np.asarray(cv2.dnn.NMSBoxes(xywh, scores, 0.0, iou_thres), dtype=np.int64).reshape(-1)
+    return keep[:max_keep] if max_keep else keep
+
+
+def _greedy_nms(boxes: np.ndarray, scores: np.ndarray, iou_thres: float, max_keep: int = 0) -> np.ndarray:
+    order = np.argsort(-scores, kind="stable")
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if len(keep) == max_keep:
+            break
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(raw: np.ndarray, letterbox: Letterbox, orig_shape: Tuple[int, int],
+                conf_thres: float = 0.25, iou_thres: float = 0.7, max_det: int = 300):
+    """
+    Raw (1, 4 + classes, anchors) output → (xyxy, conf, cls) in the pixels of
+    the frame `letterbox` last processed.  Boxes are new arrays; `raw` may be
+    an IOBinding buffer that the next call overwrites.
+    """
+    pred = raw[0]
+    scores = pred[4:]
+    # max over classes is a contiguous row-wise reduce; argmax along axis 0 is
+    # not, so it only runs on the anchors that pass the threshold
+    conf = scores.max(0)
+    idx = np.flatnonzero(conf > conf_thres)
+    if idx.size > MAX_NMS:
+        idx = idx[np.argsort(-conf[idx], kind="stable")[:MAX_NMS]]
+    conf, cls = conf[idx], scores[:, idx].argmax(0)
+
+    xywh = pred[:4, idx].T
+    xyxy = np.empty_like(xywh)
+    half_w, half_h = xywh[:, 2] / 2, xywh[:, 3] / 2
+    xyxy[:, 0] = xywh[:, 0] - half_w
+    xyxy[:, 1] = xywh[:, 1] - half_h
+    xyxy[:, 2] = xywh[:, 0] + half_w
+    xyxy[:, 3] = xywh[:, 1] + half_h
+
+    offset = (cls * MAX_WH).astype(xyxy.dtype)[:, None]
+    keep = nms(xyxy + offset, conf, iou_thres, max_det)
+    xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+    (pad_x, pad_y), (gain_x, gain_y) = letterbox.pad, letterbox.gain
+    h0, w0 = orig_shape[:2]
+    xyxy[:, [0, 2]] = np.clip((xyxy[:, [0, 2]] - pad_x) / gain_x, 0, w0)
+    xyxy[:, [1, 3]] = np.clip((xyxy[:, [1, 3]] - pad_y) / gain_y, 0, h0)
+    return xyxy, conf, cls
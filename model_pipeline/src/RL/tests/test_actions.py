@@ -0,0 +1,73 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from core.actions import action_grid, metric_columns, prev_action_feature
+from core.environment import AdaptiveInferenceEnv, WindowedInferenceEnv
+from core.profile_store import METRIC_COLUMNS, open_profile, read_profile_arrays, write_profile
+from core.routers import build_router, load_router, save_router
+from core.scoring import stack_metrics
+
+
+def _profile(tmp_path, keys, n=120):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"path": [f"/missing/{i}.jpg" for i in range(n)]})   # images absent → zero features
+    for k in keys:
+        df[f"{k}_conf"]  = rng.random(n)
+        df[f"{k}_time"]  = rng.random(n) * 0.05
+        df[f"{k}_count"] = rng.integers(0, 30, n)
+    path = str(tmp_path / "profile.arrow")
+    write_profile(df, path)
+    return path
+
+
+def test_default_grid_is_legacy():
+    grid = action_grid()
+    assert [a.key for a in grid] == ["n", "s", "l"]
+    assert [a.name for a in grid] == ["Nano", "Small", "Large"]
+    assert metric_columns([a.key for a in grid]) == METRIC_COLUMNS
+    assert prev_action_feature(2) == 1.0 and prev_action_feature(1) == 0.5
+
+
+def test_resolution_grid_order_and_keys():
+    grid = action_grid([640, 320, 480, 320])
+    assert [a.key for a in grid] == ["n320", "n480", "n", "s320", "s480", "s", "l320", "l480", "l"]
+    assert grid[0].name == "Nano@320" and grid[2].name == "Nano"
+    assert (grid[4].model, grid[4].imgsz) == ("s", 480)
+    assert prev_action_feature(8, len(grid)) == 1.0
+
+
+def test_env_on_resolution_grid(tmp_path):
+    grid = action_grid([320, 640])
+    keys = [a.key for a in grid]
+    path = _profile(tmp_path, keys)
+    schema = open_profile(path).schema
+    assert schema.field("n320_conf").type == pa.float32()
+    assert schema.field("l320_count").type == pa.int16()
+
+    env = AdaptiveInferenceEnv(path, resolutions=[320, 640])
+    assert env.action_space.n == 6 and env.rewards.shape == (120, 6)
+    np.testing.assert_allclose(env.confs, stack_metrics(read_profile_arrays(path, metric_columns(keys)), keys)[0])
+    env.reset(seed=0)
+    obs, reward, _, _, _ = env.step(3)
+    assert np.isclose(obs[1025], 3 / 5)
+    assert np.isclose(reward, env.rewards[env.current_step - 1, 3] - env.switching_penalty)
+
+    wenv = WindowedInferenceEnv(path, window_size=4, resolutions=[320, 640])
+    wenv.reset(seed=0)
+    obs, _, _, _, _ = wenv.step(5)
+    assert np.isclose(obs[1025], 1.0)
+
+
+def test_router_saves_action_count(tmp_path):
+    model = build_router("pooled", hidden=8, n_actions=9)
+    policy = load_router(save_router(model, str(tmp_path / "pooled.pt"), "pooled", hidden=8, n_actions=9))
+    assert policy.n_actions == 9
+    obs = np.random.default_rng(0).random((16, 1028), dtype=np.float32)
+    actions, _ = policy.predict(obs)
+    assert actions.max() < 9
@@ -0,0 +1,97 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pytest
+import torch
+
+from serving.backends import (BackendConfig, OrtRuntime, OrtYOLO, load_backend_config,
+                              predict_kwargs, split_thread_budget, torch_threads,
+                              write_backend_config)
+from training.benchmark_backends import backend_grid, select_best
+
+
+def test_backend_config_round_trip(tmp_path):
+    tiers = {
+        "Nano":  BackendConfig("onnxruntime", graph_optimization="extended",
+                               execution_mode="parallel", intra_op_threads=2, inter_op_threads=2),
+        "Large": BackendConfig("torch_compile", intra_op_threads=4),
+    }
+    path = str(tmp_path / "backend_config.json")
+    write_backend_config(path, tiers, {"select_by": "p50_ms"})
+    assert load_backend_config(path) == tiers
+
+    assert predict_kwargs(tiers["Nano"], "cpu") == {"verbose": False}
+    assert predict_kwargs(tiers["Large"], "cpu")["compile"] is True
+    assert torch_threads(list(tiers.values())) == 4
+    with pytest.raises(ValueError):
+        BackendConfig("tensorrt")
+
+
+def test_grid_and_selection():
+    b = {"torch_threads": [0, 2], "graph_optimization": ["basic", "all"],
+         "execution_modes": ["sequential", "parallel"], "intra_op_threads": [0, 4],
+         "inter_op_threads": [0, 2]}
+    grid = backend_grid(b, ["torch", "onnxruntime"])
+    ort = [c for c in grid if c.backend == "onnxruntime"]
+    assert len(grid) - len(ort) == 2
+    # inter-op threads only vary under the parallel executor
+    assert all(c.inter_op_threads == 0 for c in ort if c.execution_mode == "sequential")
+    assert len(ort) == 2 * (2 + 2 * 2) * len({c.provider for c in ort})
+
+    rows = [
+        {"tier": "Nano", "config": grid[0].to_dict(), "p50_ms": 9.0},
+        {"tier": "Nano", "config": grid[1].to_dict(), "p50_ms": 7.0},
+        {"tier": "Nano", "config": grid[-1].to_dict(), "error": "RuntimeError: boom"},
+    ]
+    cfg, row = select_best(rows, "p50_ms")["Nano"]
+    assert cfg == grid[1] and row["p50_ms"] == 7.0
+
+
+def test_thread_budget_split_across_onnx_tiers():
+    ort = BackendConfig("onnxruntime")
+    tiers = split_thread_budget([ort, ort, BackendConfig("torch")], budget=6)
+    assert [c.intra_op_threads for c in tiers] == [3, 3, 0]
+    assert tiers[0].inter_op_threads == 1
+
+    # Explicit requests that fit are kept; oversubscribed ones are scaled down by weight
+    fits = split_thread_budget([BackendConfig("onnxruntime", intra_op_threads=2),
+                                BackendConfig("onnxruntime", intra_op_threads=4)], budget=8)
+    assert [c.intra_op_threads for c in fits] == [2, 4]
+    scaled = split_thread_budget([BackendConfig("onnxruntime", intra_op_threads=4),
+                                  BackendConfig("onnxruntime", intra_op_threads=12)], budget=8)
+    assert [c.intra_op_threads for c in scaled] == [2, 6]
+    assert [c.intra_op_threads for c in split_thread_budget([ort] * 3, budget=2)] == [1, 1, 1]
+
+
+def test_ort_backend_matches_torch_graph(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ultralytics import YOLO
+
+    monkeypatch.chdir(tmp_path)     # the export lands next to the (yaml-built) model
+    yolo = YOLO("yolov8n.yaml")
+    onnx_path = yolo.export(format="onnx", imgsz=320, opset=12)
+    model = OrtYOLO(onnx_path, BackendConfig("onnxruntime", graph_optimization="all"))
+    assert model.imgsz == (320, 320) and len(model.names) == 80
+
+    frame = np.random.default_rng(0).integers(0, 256, (240, 320, 3), dtype=np.uint8)
+    blob = model._preprocess(frame)
+    assert blob.shape == (1, 3, 320, 320)
+    ort_out = model.session.run(None, {model.input_name: blob})[0]
+    with torch.no_grad():
+        torch_out = yolo.model.eval()(torch.from_numpy(blob))[0].numpy()
+    np.testing.assert_allclose(ort_out, torch_out, rtol=1e-3, atol=1e-3)
+
+    result = model(frame)[0]
+    assert result.orig_shape == frame.shape[:2]
+    assert set(result.speed) == {"preprocess", "inference", "postprocess"}
+
+    # IOBinding writes into the same preallocated output on every call
+    unbound = OrtYOLO(onnx_path, BackendConfig("onnxruntime"), OrtRuntime(arena="off", io_binding=False))
+    out = model._infer(model._preprocess(frame))
+    np.testing.assert_allclose(out, unbound._infer(unbound._preprocess(frame)), atol=1e-4)
+    assert model._infer(model._preprocess(frame)) is out
@@ -0,0 +1,56 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+from collections import deque
+
+import numpy as np
+import pytest
+from core.buffer_manager import WindowBufferManager
+
+
+def _reference_state(frames, window, prev_model_idx):
+    """The original deque-based aggregation."""
+    last = deque(frames, maxlen=window)
+    vis, edge, conf, count = zip(*last)
+    return (np.mean(vis, axis=0), np.mean(edge),
+            np.array([prev_model_idx, np.mean(conf), count[-1] - count[0]], dtype=np.float32))
+
+
+@pytest.mark.parametrize("n_frames", [1, 3, 10, 27])
+def test_matches_deque_reference(n_frames):
+    rng = np.random.default_rng(n_frames)
+    buf = WindowBufferManager(window_size=10)
+    frames = []
+    for _ in range(n_frames):
+        f = (rng.random(1024, dtype=np.float32), rng.random(), rng.random(), int(rng.integers(0, 30)))
+        frames.append(f)
+        buf.add_frame_data(*f)
+
+    avg_vis, avg_edge, meta = buf.get_aggregated_state(prev_model_idx=2)
+    ref_vis, ref_edge, ref_meta = _reference_state(frames, 10, 2)
+    np.testing.assert_allclose(avg_vis, ref_vis, rtol=1e-5, atol=1e-6)
+    assert avg_edge == pytest.approx(ref_edge)
+    np.testing.assert_allclose(meta, ref_meta, rtol=1e-5)
+    assert len(buf) == min(n_frames, 10)
+
+
+def test_window_boundaries_and_resync():
+    buf = WindowBufferManager(window_size=4)
+    flags = []
+    for i in range(4 * WindowBufferManager.RESYNC_WINDOWS + 3):
+        buf.add_frame_data(np.full(1024, i % 7, dtype=np.float32), 0.1, 0.5, i)
+        flags.append(buf.is_window_complete())
+    assert flags[:8] == [False, False, False, True] * 2
+
+    avg_vis, _, meta = buf.get_aggregated_state(0)
+    last = [(i % 7) for i in range(len(flags) - 4, len(flags))]
+    np.testing.assert_allclose(avg_vis, np.mean(last), rtol=1e-6)
+    assert meta[2] == 3                     # count grew by one per frame
+
+
+def test_empty_buffer_raises():
+    with pytest.raises(ValueError):
+        WindowBufferManager(window_size=5).get_aggregated_state(0)
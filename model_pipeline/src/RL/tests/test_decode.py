@@ -0,0 +1,96 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from serving.decode import FrameDecoder, jpeg_size, reduction_for, resolve_jpeg_decoder
+from serving.engine import InferenceResult
+
+
+def _payload(frame, ext=".jpg"):
+    ok, buf = cv2.imencode(ext, frame)
+    assert ok
+    return base64.b64encode(buf.tobytes()).decode()
+
+
+def _frame(h, w):
+    """Smooth gradients, so a reduced decode is close to a resized full one."""
+    y, x = np.mgrid[0:h, 0:w]
+    return np.dstack([x * 255 // w, y * 255 // h, (x + y) * 255 // (w + h)]).astype(np.uint8)
+
+
+def test_jpeg_size_and_reduction():
+    data = base64.b64decode(_payload(_frame(1440, 2560)))
+    assert jpeg_size(data) == (1440, 2560)
+    assert jpeg_size(base64.b64decode(_payload(_frame(8, 8), ".png"))) is None
+    assert jpeg_size(b"\xff\xd8\xff") is None
+    assert reduction_for((1440, 2560), 640) == 4
+    assert reduction_for((1080, 1920), 640) == 2
+    assert reduction_for((720, 1280), 320) == 4
+    assert reduction_for((480, 640), 640) == 1
+
+
+def test_reduced_decode_keeps_client_shape():
+    frame = _frame(1440, 2560)
+    decoded = FrameDecoder(target_size=640, reduced=True, decoder="opencv").decode(_payload(frame))
+    assert decoded.image.shape == (360, 640, 3) and decoded.source_shape == (1440, 2560)
+    assert decoded.scale == (4.0, 4.0)
+    expected = cv2.resize(frame, (640, 360), interpolation=cv2.INTER_AREA)
+    assert np.abs(decoded.image.astype(int) - expected).mean() < 3
+
+    full = FrameDecoder(target_size=640, decoder="opencv").decode(_payload(frame))
+    assert full.image.shape == (1440, 2560, 3) and full.scale == (1.0, 1.0)
+
+
+def _with_exif_orientation(payload, orientation):
+    """The JPEG with an EXIF APP1 segment holding only the Orientation tag."""
+    data = base64.b64decode(payload)
+    tiff = (b"MM\x00\x2a\x00\x00\x00\x08" + b"\x00\x01"
+            + b"\x01\x12\x00\x03\x00\x00\x00\x01" + bytes([0, orientation, 0, 0]) + b"\x00" * 4)
+    app1 = b"Exif\x00\x00" + tiff
+    data = data[:2] + b"\xff\xe1" + (len(app1) + 2).to_bytes(2, "big") + app1 + data[2:]
+    return base64.b64encode(data).decode()
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+def test_exif_orientation_is_ignored(reduced):
+    payload = _with_exif_orientation(_payload(_frame(600, 1200)), 6)      # "rotate 90° CW"
+    decoded = FrameDecoder(target_size=300, reduced=reduced, decoder="opencv").decode(payload)
+    assert decoded.source_shape == (600, 1200)
+    assert decoded.image.shape == ((150, 300, 3) if reduced else (600, 1200, 3))
+    assert decoded.scale == ((4.0, 4.0) if reduced else (1.0, 1.0))
+
+
+def test_non_jpeg_and_bad_payloads():
+    decoder = FrameDecoder(target_size=32, reduced=True, decoder="opencv")
+    png = decoder.decode(_payload(_frame(256, 256), ".png"))
+    assert png.image.shape == (256, 256, 3) and png.scale == (1.0, 1.0)
+    assert decoder.decode("not base64!") is None
+    assert decoder.decode(base64.b64encode(b"not an image").decode()) is None
+    assert decoder.decode("") is None
+    with pytest.raises(ValueError):
+        resolve_jpeg_decoder("pillow")
+
+
+def test_turbojpeg_reuses_its_buffer():
+    if resolve_jpeg_decoder("auto") != "turbojpeg":
+        pytest.skip("PyTurboJPEG / libjpeg-turbo not installed")
+    decoder = FrameDecoder(target_size=640, reduced=True, decoder="turbojpeg")
+    first = decoder.decode(_payload(_frame(1440, 2560)))
+    assert first.image.shape == (360, 640, 3)
+    second = decoder.decode(_payload(_frame(1440, 2560)[::-1].copy()))
+    assert second.image is first.image
+
+
+def test_boxes_scale_back_to_client_pixels():
+    result = InferenceResult("Nano", [{"bbox": [10.0, 20.0, 30.0, 40.0], "confidence": 0.9,
+                                       "class_id": 0, "class_name": "person"}], 1.0, 1, 0.9)
+    result.scale_boxes(4.0, 2.0)
+    assert result.detections[0]["bbox"] == [40.0, 40.0, 120.0, 80.0]
@@ -0,0 +1,64 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+from training.feature_store import (
+    FeatureCache, MemmapBatchDataset, create_store, load_store, make_loader, save_store_labels,
+)
+
+
+def _make_store(store_dir, n=100):
+    obs = create_store(str(store_dir), n)
+    obs[:] = np.arange(n, dtype=np.float32)[:, None]
+    obs.flush()
+    del obs
+    save_store_labels(str(store_dir), np.arange(n) % 3, np.arange(n) * 2)
+
+
+def test_store_round_trip(tmp_path):
+    _make_store(tmp_path)
+    obs, actions, rows = load_store(str(tmp_path))
+    assert obs.shape == (100, 1028) and obs.dtype == np.float32
+    assert actions.dtype == np.int64
+    np.testing.assert_array_equal(rows, np.arange(100) * 2)
+
+
+def test_batch_loader_covers_subset_once(tmp_path):
+    _make_store(tmp_path)
+    subset = np.arange(0, 100, 3)
+    loader = make_loader(MemmapBatchDataset(str(tmp_path)), subset, batch_size=8, shuffle=True)
+    seen = []
+    for xb, yb in loader:
+        assert xb.shape[1] == 1028 and len(xb) <= 8
+        ids = xb[:, 0].long().numpy()
+        np.testing.assert_array_equal(yb.numpy(), ids % 3)
+        seen.extend(ids)
+    assert sorted(seen) == list(subset)
+
+
+def test_feature_cache_extend_appends(tmp_path):
+    src = np.random.default_rng(0).random((10, 1028), dtype=np.float32)
+    FeatureCache(str(tmp_path)).extend(["a", "b", "c"], src, np.array([0, 1, 2]))
+    FeatureCache(str(tmp_path)).extend(["d"], src, np.array([9]))
+
+    cache = FeatureCache(str(tmp_path))
+    np.testing.assert_array_equal(cache.lookup(["d", "a", "x"]), [3, 0, -1])
+    np.testing.assert_allclose(cache.features()[3], src[9, :1025])
+
+
+def test_full_size_features_match_serving(tmp_path):
+    import cv2
+    from core.features import FeatureExtractor
+    from serving.engine import AdaptiveInferenceSystem
+
+    rng = np.random.default_rng(0)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8), (5, 5), 0)
+    path = str(tmp_path / "frame.jpg")
+    cv2.imwrite(path, frame)
+    vis, edge = FeatureExtractor().extract_from_file(path)
+    served_vis, served_edge = AdaptiveInferenceSystem._frame_features(cv2.imread(path))
+    np.testing.assert_array_equal(vis, served_vis)
+    assert edge == served_edge
@@ -0,0 +1,78 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+from core.gating import ConfidenceGate, fit_gate, gate_outcomes, gate_scores, load_gate, save_gate
+from training.evaluate_gating import strategy_metrics, tier_and_gate_rewards
+
+
+def _profile(n=2000, seed=0):
+    """Nano is right on confident frames; on unsure ones Large finds far more."""
+    rng = np.random.default_rng(seed)
+    n_conf = rng.uniform(0.2, 0.9, n)
+    n_count = rng.integers(0, 8, n).astype(np.float64)
+    unsure = n_conf < 0.45
+    conf = np.column_stack([n_conf, n_conf + 0.05, np.where(unsure, 0.85, n_conf + 0.02)])
+    count = np.column_stack([n_count, n_count, np.where(unsure, n_count + 10, n_count)])
+    lat = np.column_stack([np.full(n, 0.01), np.full(n, 0.03), np.full(n, 0.08)])
+    return conf, lat, count, np.full(n, 0.3)
+
+
+def test_decide_rule():
+    gate = ConfidenceGate(small_conf=0.6, large_conf=0.3, large_density=20.0, empty_action=1)
+    conf  = [0.8, 0.5, 0.2, 0.9, 0.0]
+    count = [3,   3,   3,   9,   0]
+    tiers = gate.decide(conf, count, [1.0, 1.0, 1.0, 0.3, 1.0])     # 9 boxes on 0.3 MP = 30 / MP
+    np.testing.assert_array_equal(tiers, [0, 1, 2, 2, 1])
+    assert gate.decide_one(0.8, 3, (1000, 1000, 3)) == 0
+
+
+def test_outcomes_pay_for_nano():
+    conf, lat, count, _ = _profile(10)
+    _, eff_lat, _ = gate_outcomes(conf, lat, count)
+    np.testing.assert_allclose(eff_lat, [[0.01, 0.04, 0.09]] * 10)
+    assert lat[0, 1] == 0.03                       # input untouched
+
+
+def test_fit_escalates_unsure_frames():
+    conf, lat, count, mp = _profile()
+    gate, score = fit_gate(conf, lat, count, mp)
+    busy = count[:, 0] > 0
+    tiers = gate.decide(conf[:, 0], count[:, 0], mp)
+    assert (tiers[busy & (conf[:, 0] < 0.4)] == 2).all()
+    assert (tiers[busy & (conf[:, 0] > 0.5)] == 0).all()
+
+    rows = np.arange(len(mp))
+    scores = gate_scores(conf, lat, count)
+    never = ConfidenceGate(0.0, 0.0, np.inf, gate.empty_action).decide(conf[:, 0], count[:, 0], mp)
+    assert np.isclose(score, scores[rows, tiers].mean())
+    assert score > scores[rows, never].mean()
+
+
+def test_gate_round_trip(tmp_path):
+    gate = ConfidenceGate(0.55, 0.25, np.inf, 2)
+    path = save_gate(gate, str(tmp_path / "gate.json"), {"fit_rows": 10})
+    assert load_gate(path) == gate
+
+
+def test_strategy_metrics_counts_escalation_latency():
+    conf, lat, count, _ = _profile(4)
+    choice = np.array([0, 1, 2, 2])
+    m = strategy_metrics(*gate_outcomes(conf, lat, count), choice, ["n", "s", "l"])
+    assert np.isclose(m["latency_ms_mean"], (10 + 40 + 90 + 90) / 4)
+    assert m["tier_pct"] == {"Nano": 25.0, "Small": 25.0, "Large": 50.0}
+
+
+def test_escalated_frames_earn_less_than_the_tier_alone():
+    conf, lat, count, _ = _profile(50)
+    tier_rewards, gate_rewards = tier_and_gate_rewards(conf, lat, count, 0.84, 0.16)
+    np.testing.assert_array_equal(gate_rewards[:, 0], tier_rewards[:, 0])
+    assert (gate_rewards[:, 1:] < tier_rewards[:, 1:]).all()
+
+    small = np.ones(50, dtype=np.int64)
+    alone = strategy_metrics(conf, lat, count, small, ["n", "s", "l"], tier_rewards)
+    gated = strategy_metrics(*gate_outcomes(conf, lat, count), small, ["n", "s", "l"], gate_rewards)
+    assert gated["avg_reward"] < alone["avg_reward"]
@@ -0,0 +1,93 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import json
+from types import SimpleNamespace
+
+from serving.mlflow_writer import MlflowWriter, session_record
+
+
+class FakeClient:
+    """Stands in for MlflowClient; raises while `down` is True."""
+
+    def __init__(self):
+        self.down = False
+        self.runs = {}
+        self.created = 0
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("tracking server unreachable")
+
+    def get_experiment_by_name(self, name):
+        self._check()
+        return None
+
+    def create_experiment(self, name):
+        self._check()
+        return "1"
+
+    def create_run(self, experiment_id, start_time=None):
+        self._check()
+        self.created += 1
+        run_id = f"run{self.created}"
+        self.runs[run_id] = {"metrics": {}, "params": {}, "status": "RUNNING"}
+        return SimpleNamespace(info=SimpleNamespace(run_id=run_id))
+
+    def log_batch(self, run_id, metrics=(), params=(), tags=()):
+        self._check()
+        self.runs[run_id]["metrics"].update({m.key: m.value for m in metrics})
+        self.runs[run_id]["params"].update({p.key: p.value for p in params})
+
+    def set_terminated(self, run_id, status, end_time=None):
+        self._check()
+        self.runs[run_id]["status"] = status
+
+
+def _record(frames):
+    return session_record("adaptive_inference", {"total_frames": frames},
+                          params={"model_distribution": {"Nano": frames}})
+
+
+def test_sessions_get_separate_runs():
+    client = FakeClient()
+    writer = MlflowWriter(client=client, retry_backoff_s=0.0)
+    writer.start()
+    writer.submit(_record(10))
+    writer.submit(_record(20))
+    writer.stop()
+
+    assert writer.written == 2
+    assert sorted(r["metrics"]["total_frames"] for r in client.runs.values()) == [10.0, 20.0]
+    assert all(r["status"] == "FINISHED" for r in client.runs.values())
+
+
+def test_unreachable_server_spills_then_replays(tmp_path):
+    spill = str(tmp_path / "spill.jsonl")
+    client = FakeClient()
+    client.down = True
+    writer = MlflowWriter(client=client, spill_path=spill, max_retries=1, retry_backoff_s=0.0)
+    writer.start()
+    writer.submit(_record(5))
+    writer.stop()
+
+    assert writer.written == 0 and writer.spilled == 1
+    with open(spill) as f:
+        assert json.loads(f.readline())["metrics"]["total_frames"] == 5.0
+
+    writer.start()   # replay fails again: the record goes back, but is not spilled twice
+    writer.stop()
+    assert writer.spilled == 1 and writer.replayed == 0
+    with open(spill) as f:
+        assert len(f.readlines()) == 1
+
+    client.down = False
+    writer.start()   # replays the spill file before taking new records
+    writer.stop()
+    assert writer.replayed == 1
+    assert not os.path.exists(spill)
+    (run,) = client.runs.values()
+    assert run["params"]["model_distribution"] == "{'Nano': 5}"
@@ -0,0 +1,70 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from core.replay_buffer import ReplayBuffer
+from core.reward_functions import RewardCalculator
+from serving.online_learning import OnlineLearner
+
+
+def test_replay_buffer_is_bounded():
+    buf = ReplayBuffer(capacity=5, obs_dim=4)
+    for i in range(8):
+        buf.add(np.full(4, i, dtype=np.float32), i % 3, 0.5, 0.01 * i)
+    assert len(buf) == 5 and buf.total_added == 8
+    # oldest three entries were overwritten
+    assert sorted(buf.obs[:, 0].astype(int)) == [3, 4, 5, 6, 7]
+
+    obs, actions, confs, lats = buf.sample(16, np.random.default_rng(0))
+    assert obs.shape == (16, 4) and actions.shape == (16,)
+    np.testing.assert_array_equal(actions, obs[:, 0].astype(int) % 3)
+
+
+def test_reward_batch_matches_scalar():
+    calc = RewardCalculator()
+    conf = np.array([0.95, 0.5, 0.0, 0.91])
+    lat  = np.array([0.010, 0.045, 0.030, 0.031])
+    expected = [calc.calculate(c, l, False) for c, l in zip(conf, lat)]
+    np.testing.assert_allclose(calc.calculate_batch(conf, lat), expected)
+
+
+def test_learner_trains_and_publishes(tmp_path):
+    ckpt = str(tmp_path / "bandit.pth")
+    learner = OnlineLearner(sample_rate=1.0, batch_size=16, min_samples=32,
+                            epsilon=0.0, checkpoint_path=ckpt, seed=0)
+    rng = np.random.default_rng(0)
+    obs = rng.random((64, 1028), dtype=np.float32)
+
+    assert learner.train_step() is None                 # buffer still too small
+    for o in obs:
+        learner.record(o, learner.select_action(o), 0.95, 0.005)
+    assert len(learner.buffer) == 64
+
+    before = [p.clone() for p in learner._serving_model.parameters()]
+    for _ in range(5):
+        assert learner.train_step() is not None
+    # training alone does not touch the serving copy …
+    assert all(torch.equal(a, b) for a, b in zip(before, learner._serving_model.parameters()))
+
+    learner.publish()
+    assert learner.version == 1 and os.path.exists(ckpt)
+    assert not all(torch.equal(a, b) for a, b in zip(before, learner._serving_model.parameters()))
+
+
+def test_sampling_is_thread_safe():
+    # Each record() makes one draw, so with a shared, locked generator the number
+    # sampled from 4 threads equals the number sampled from one
+    obs = np.zeros(1028, dtype=np.float32)
+    serial = OnlineLearner(sample_rate=0.5, seed=3)
+    expected = sum(serial.record(obs, 0, 0.9, 0.01) for _ in range(2000))
+
+    learner = OnlineLearner(sample_rate=0.5, seed=3)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sampled = sum(pool.map(lambda _: learner.record(obs, 0, 0.9, 0.01), range(2000)))
+    assert sampled == expected == learner.buffer.total_added
@@ -0,0 +1,105 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import threading
+
+import numpy as np
+import pytest
+
+from serving.placement import parse_tier_devices, parse_tier_spec, torch_device
+from serving.worker_pools import TierPool, TierPools
+
+
+def _placed_pools(devices):
+    return TierPools([TierPool(name, [name], device=dev)
+                      for name, dev in zip(("Nano", "Small", "Large"), devices)])
+
+
+def test_parse_tier_devices():
+    assert parse_tier_devices("auto", "cuda", cuda_available=True) == ["cpu", "cuda", "cuda"]
+    assert parse_tier_devices("auto", "cuda", cuda_available=False) == ["cpu"] * 3
+    assert parse_tier_devices(None, "cpu") == ["cpu"] * 3
+    assert parse_tier_devices("Small=cpu:1, Large=cpu:1", "cpu:0") == ["cpu:0", "cpu:1", "cpu:1"]
+    assert torch_device("cpu:1") == "cpu" and torch_device("cuda:1") == "cuda:1"
+    with pytest.raises(ValueError, match="CUDA"):
+        parse_tier_devices("Large=cuda", "cpu", cuda_available=False)
+    with pytest.raises(ValueError, match="tier"):
+        parse_tier_devices("Huge=cpu", "cpu")
+
+
+def test_parse_tier_spec():
+    assert parse_tier_spec("3", 1, int) == [3, 3, 3]
+    assert parse_tier_spec("Nano=2,Large=4", 1, int) == [2, 1, 4]
+    assert parse_tier_spec("", 0, int) == [0, 0, 0]
+
+
+def test_tiers_on_other_devices_do_not_wait():
+    """Two CPU execution contexts stand in for a CPU and a GPU."""
+    pools = _placed_pools(["cpu:0", "cpu:1", "cpu:1"])
+    release = threading.Event()
+    try:
+        large = pools[2].submit(lambda model: release.wait(5.0))
+        assert pools.run(0, lambda model: model)[0] == "Nano"     # Nano's device is free
+        assert not large.done()
+        assert pools.device_stats()["cpu:1"] == {"tiers": ["Small", "Large"], "depth": 1, "backlog_ms": 0.0}
+        assert pools.device_stats()["cpu:0"]["depth"] == 0
+        release.set()
+        assert large.result(timeout=5.0)[1] > 0
+    finally:
+        release.set()
+        pools.shutdown()
+
+
+def test_backlog_uses_per_tier_service_times():
+    pools = _placed_pools(["cpu:0", "cpu:1", "cpu:1"])
+    release = threading.Event()
+    try:
+        _, large_ms, _ = pools.run(2, lambda model: threading.Event().wait(0.05))
+        assert pools[2].estimate_ms() == pytest.approx(large_ms)
+        assert pools.expected_wait_ms(1) == 0.0                 # cpu:1 idle
+        for _ in range(2):
+            pools[2].submit(lambda model: release.wait(5.0))
+        # Small's own pool is empty, but it shares cpu:1 with two Large calls
+        assert pools.expected_wait_ms(1) == pytest.approx(2 * large_ms)
+        assert pools.expected_wait_ms(0) == 0.0
+        assert pools.device_stats()["cpu:1"]["backlog_ms"] == pytest.approx(2 * large_ms, abs=1e-3)
+    finally:
+        release.set()
+        pools.shutdown()
+    assert pools.device_stats()["cpu:1"]["backlog_ms"] == 0.0
+
+
+def test_engine_routes_around_a_busy_device(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ultralytics import YOLO
+    from core.routers import build_router, save_router
+    from serving.engine import AdaptiveInferenceSystem
+
+    monkeypatch.chdir(tmp_path)     # the export lands next to the (missing) yolov8n.pt
+    YOLO("yolov8n.yaml").export(format="onnx", imgsz=320, opset=12)
+    router = save_router(build_router("pooled", hidden=8), str(tmp_path / "router.pt"), "pooled", hidden=8)
+    weights = str(tmp_path / "yolov8n.pt")
+    engine = AdaptiveInferenceSystem(router, weights, weights, weights, device="cpu",
+                                     tier_devices=["cpu:0", "cpu:1", "cpu:1"], max_queue_wait_ms=1.0)
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    release = threading.Event()
+    try:
+        assert engine.backends[2].backend == "onnxruntime"
+        assert set(engine.pool_stats()["devices"]) == {"cpu:0", "cpu:1"}
+        assert all(engine.pools[t].estimate_ms() > 0 for t in range(3))     # seeded by warm-up
+        for _ in range(2):                                      # cpu:1 is now busy with Large
+            engine.pools[2].submit(lambda model: release.wait(5.0))
+
+        assert engine._run_yolo(0, frame).latency_ms > 0       # Nano does not wait for it
+        assert engine.pools[1].depth() == 0
+        assert engine._route_by_queue(1) == 0                   # Small's device is busy
+        assert engine.queue_spills["Small"] == 1
+        engine.max_queue_wait_ms = 0.0
+        assert engine._route_by_queue(1) == 1
+    finally:
+        release.set()
+        engine.close()
@@ -10,7 +10,7 @@ from core.environment import AdaptiveInferenceEnv
 import numpy as np
 
 def verify_model():
-    csv_path = os.path.join(_RL_ROOT, "model_performance_profile.csv")
+    profile_path = os.path.join(_RL_ROOT, "model_performance_profile.arrow")
     # Use latest available model: v3 > v2 > v1
     for version in ["PPO_v6", "PPO_v5", "PPO_v4", "PPO_v3", "PPO_v2", "PPO"]:
         candidate = os.path.join(_RL_ROOT, "models", version, "final_adaptive_model.zip")
@@ -18,7 +18,7 @@ def verify_model():
             model_path = candidate
             break
 
-    env = AdaptiveInferenceEnv(csv_path=csv_path)
+    env = AdaptiveInferenceEnv(profile_path=profile_path)
     model = PPO.load(model_path)
 
     actions_taken = []
@@ -0,0 +1,74 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from core.profile_store import (
+    METRIC_COLUMNS, open_profile, read_profile, read_profile_arrays, write_profile,
+)
+
+
+def _make_profile(n=50, root="/data/Data-Pipeline"):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"path": [f"{root}/data/processed/images/train/{i:06d}.jpg" for i in range(n)]})
+    for k in ["n", "s", "l"]:
+        df[f"{k}_conf"]  = rng.random(n)
+        df[f"{k}_time"]  = rng.random(n) * 0.05
+        df[f"{k}_count"] = rng.integers(0, 30, n)
+    return df
+
+
+def test_round_trip_types_and_paths(tmp_path):
+    df   = _make_profile()
+    path = str(tmp_path / "profile.arrow")
+    write_profile(df, path, image_root="/data/Data-Pipeline")
+
+    schema = open_profile(path).schema
+    assert schema.field("n_conf").type == pa.float32()
+    assert schema.field("l_count").type == pa.int16()
+    assert pa.types.is_dictionary(schema.field("path").type)
+
+    out = read_profile(path)
+    assert list(out["path"].astype(str)) == list(df["path"])
+    np.testing.assert_allclose(out["s_time"], df["s_time"], rtol=1e-6)
+    np.testing.assert_array_equal(out["n_count"], df["n_count"])
+
+
+def test_image_root_follows_the_reader_checkout(tmp_path):
+    root = os.path.join(os.path.dirname(os.path.dirname(_RL_ROOT)), "Data-Pipeline")
+    df   = _make_profile(5, root=root)
+    path = str(tmp_path / "profile.arrow")
+    write_profile(df, path, image_root=root)
+
+    stored = open_profile(path).schema.metadata[b"image_root"].decode()
+    assert not os.path.isabs(stored)
+    assert list(read_profile(path)["path"].astype(str)) == list(df["path"])
+    moved = read_profile(path, image_root="/elsewhere/Data-Pipeline")["path"].astype(str)
+    assert moved[0] == "/elsewhere/Data-Pipeline/data/processed/images/train/000000.jpg"
+
+
+def test_column_projection_and_arrays(tmp_path):
+    path = str(tmp_path / "profile.arrow")
+    write_profile(_make_profile(), path)
+
+    out = read_profile(path, columns=["n_conf", "l_time"])
+    assert list(out.columns) == ["n_conf", "l_time"]
+
+    arrays = read_profile_arrays(path, METRIC_COLUMNS)
+    assert set(arrays) == set(METRIC_COLUMNS)
+    assert arrays["n_conf"].dtype == np.float32
+    assert arrays["n_count"].dtype == np.int16
+
+
+def test_legacy_csv_profile(tmp_path):
+    df   = _make_profile(10)
+    path = str(tmp_path / "profile.csv")
+    df.to_csv(path, index=False)
+
+    out = read_profile(path, columns=["path", "n_conf"])
+    assert list(out["path"].astype(str)) == list(df["path"])
+    assert out["n_conf"].dtype == np.float32
@@ -0,0 +1,102 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+import torch
+
+from serving.profiling import ProfileSession
+
+
+def _busy_loop(seconds):
+    end = time.monotonic() + seconds
+    x = 0
+    while time.monotonic() < end:
+        x += 1
+    return x
+
+
+def _archive(session):
+    return zipfile.ZipFile(io.BytesIO(session.archive()))
+
+
+def test_sampling_profile_sees_worker_threads():
+    session = ProfileSession(mode="sampling", interval_s=0.002, thread_prefix="worker")
+    session.start()
+    t = threading.Thread(target=_busy_loop, args=(0.3,), name="worker-0")
+    t.start()
+    t.join()
+    session.stop()
+
+    zf = _archive(session)
+    lines = zf.read("stacks.collapsed").decode().splitlines()
+    assert lines and all(line.startswith("worker-0;") for line in lines)
+    assert any("_busy_loop" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_cprofile_merges_calls_from_several_threads():
+    session = ProfileSession(mode="cprofile")
+    session.start()
+    threads = [threading.Thread(target=session.cprofile.run, args=(_busy_loop, 0.05))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    session.stop()
+
+    stats = session.cprofile.stats()
+    calls = [v[1] for k, v in stats.stats.items() if k[2] == "_busy_loop"]
+    assert calls == [3]
+    assert "profile.pstats" in _archive(session).namelist()
+
+
+def test_torch_ops_table_and_traces():
+    session = ProfileSession(mode="sampling", torch_ops=True)
+    model = torch.nn.Linear(16, 4)
+    x = torch.randn(2, 16)
+    session.start()
+    for _ in range(7):
+        session.torch_ops.profile_call("yolo_Nano", lambda: model(x))
+    session.stop()
+
+    zf = _archive(session)
+    assert "yolo_Nano" in zf.read("torch_ops.txt").decode()
+    traces = [n for n in zf.namelist() if n.startswith("torch_trace_")]
+    assert len(traces) == session.torch_ops.max_traces
+
+
+def test_torch_ops_from_several_threads():
+    session = ProfileSession(mode="sampling", torch_ops=True)
+    model = torch.nn.Linear(16, 4)
+    x = torch.randn(2, 16)
+
+    def worker(name):
+        for _ in range(10):
+            session.torch_ops.profile_call(name, lambda: model(x))
+
+    session.start()
+    threads = [threading.Thread(target=worker, args=(f"yolo_{i}",)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    session.stop()
+
+    assert session.torch_ops.calls == 20
+    table = _archive(session).read("torch_ops.txt").decode()
+    assert "yolo_0" in table and "yolo_1" in table
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        ProfileSession(mode="perf")
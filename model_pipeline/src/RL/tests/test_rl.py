@@ -14,8 +14,8 @@ def evaluate_agent(model_path=None, steps=500):
     if model_path is None:
         model_path = os.path.join(_RL_ROOT, "models", "rl_bandit_v1.pth")
 
-    csv_path = os.path.join(_RL_ROOT, "model_performance_profile.csv")
-    env = AdaptiveInferenceEnv(csv_path=csv_path)
+    profile_path = os.path.join(_RL_ROOT, "model_performance_profile.arrow")
+    env = AdaptiveInferenceEnv(profile_path=profile_path)
 
     state_dim = env.observation_space.shape[0]
     agent = NeuralBanditAgent(input_dim=state_dim, epsilon=0.0)
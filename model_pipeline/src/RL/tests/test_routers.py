@@ -0,0 +1,44 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pytest
+import torch
+from core.routers import ROUTER_KINDS, build_router, load_router, save_router
+
+
+def _obs(n=64, seed=0):
+    return np.random.default_rng(seed).random((n, 1028), dtype=np.float32)
+
+
+@pytest.mark.parametrize("kind", sorted(ROUTER_KINDS))
+def test_round_trip_is_drop_in(kind, tmp_path):
+    model = build_router(kind)
+    if kind == "pca":
+        model.fit_pca(_obs(200, seed=1)[:, :1024])
+    path   = save_router(model, str(tmp_path / f"{kind}.pt"), kind)
+    policy = load_router(path)
+
+    obs = _obs()
+    with torch.no_grad():
+        expected = model(torch.from_numpy(obs)).argmax(dim=1).numpy()
+    actions, state = policy.predict(obs, deterministic=True)
+    assert state is None
+    np.testing.assert_array_equal(actions, expected)
+
+    action, _ = policy.predict(obs[0], deterministic=True)
+    assert int(action) == expected[0]
+
+
+@pytest.mark.parametrize("kind", ["pooled", "pca"])
+def test_numpy_forward_matches_torch(kind):
+    model = build_router(kind)
+    if kind == "pca":
+        model.fit_pca(_obs(200, seed=1)[:, :1024])
+    obs = _obs()
+    with torch.no_grad():
+        expected = model(torch.from_numpy(obs)).numpy()
+    np.testing.assert_allclose(model.numpy_forward()(obs), expected, rtol=1e-4, atol=1e-5)
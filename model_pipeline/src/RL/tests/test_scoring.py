@@ -0,0 +1,72 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pandas as pd
+from core.scoring import score_profile, stack_metrics
+
+W_Q, W_E = 0.84, 0.16
+
+
+# ── Reference per-row implementations (the original env / BC logic) ─────────
+
+def _row_scores(row):
+    confs  = [row['n_conf'],  row['s_conf'],  row['l_conf']]
+    lats   = [row['n_time'],  row['s_time'],  row['l_time']]
+    counts = [row['n_count'], row['s_count'], row['l_count']]
+    quality    = [confs[a] * np.sqrt(counts[a] + 1) for a in range(3)]
+    efficiency = [quality[a] / (lats[a] + 1e-8)     for a in range(3)]
+    q_max   = max(quality)    + 1e-8
+    eff_max = max(efficiency) + 1e-8
+    return [W_Q * (quality[a] / q_max) + W_E * (efficiency[a] / eff_max) for a in range(3)]
+
+
+def reference_optimal_action(row):
+    return int(np.argmax(_row_scores(row)))
+
+
+def reference_reward(row, action):
+    scores = _row_scores(row)
+    s_min, s_max = min(scores), max(scores)
+    spread = s_max - s_min
+    return (scores[action] - s_min) / spread if spread > 0.01 else 0.5
+
+
+def _random_profile(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame()
+    for k, base_lat in zip(["n", "s", "l"], [0.004, 0.008, 0.025]):
+        df[f"{k}_conf"]  = rng.random(n)
+        df[f"{k}_time"]  = base_lat * (0.5 + rng.random(n))
+        df[f"{k}_count"] = rng.integers(0, 25, n)
+    # Degenerate rows: empty scenes and identical models
+    df.loc[:9, ["n_conf", "s_conf", "l_conf", "n_count", "s_count", "l_count"]] = 0
+    for m in ["conf", "time", "count"]:
+        for k in ["s", "l"]:
+            df.loc[10:19, f"{k}_{m}"] = df.loc[10:19, f"n_{m}"]
+    return df
+
+
+def test_labels_match_per_row_logic():
+    df  = _random_profile()
+    out = score_profile(*stack_metrics(df), W_Q, W_E)
+    expected = np.array([reference_optimal_action(r) for _, r in df.iterrows()])
+    np.testing.assert_array_equal(out.labels, expected)
+
+
+def test_rewards_match_per_row_logic():
+    df  = _random_profile()
+    out = score_profile(*stack_metrics(df), W_Q, W_E)
+    expected = np.array([[reference_reward(r, a) for a in range(3)] for _, r in df.iterrows()])
+    np.testing.assert_allclose(out.rewards, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_shapes_and_ranges():
+    out = score_profile(*stack_metrics(_random_profile(100)), W_Q, W_E)
+    assert out.scores.shape == out.rewards.shape == (100, 3)
+    assert out.labels.shape == (100,)
+    assert out.rewards.min() >= 0.0 and out.rewards.max() <= 1.0
+    assert np.all(out.rewards[10:20] == 0.5)
@@ -0,0 +1,55 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pytest
+
+from serving.session_stats import DDSketch, RunningStats
+
+
+def test_running_stats_match_numpy():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=3.0, sigma=0.6, size=20000)
+    stats = RunningStats(relative_accuracy=0.01)
+    for v in values:
+        stats.add(v)
+
+    s = stats.summary()
+    assert stats.count == len(values)
+    assert s["mean"] == pytest.approx(values.mean())
+    assert s["std"] == pytest.approx(values.std(), rel=1e-6)
+    assert s["min"] == values.min() and s["max"] == values.max()
+    for key, q in (("p50", 50), ("p95", 95), ("p99", 99)):
+        assert s[key] == pytest.approx(np.percentile(values, q), rel=0.02)
+
+
+def test_sketch_memory_is_constant_and_merge_matches_single_sketch():
+    rng = np.random.default_rng(1)
+    a, b = rng.uniform(0, 1, 5000), rng.uniform(0, 1, 7000)
+    a[:100] = 0.0   # zero confidences are counted separately
+
+    left, right, whole = DDSketch(), DDSketch(), DDSketch()
+    nbytes = left.bins.nbytes
+    for v in a:
+        left.add(v)
+        whole.add(v)
+    for v in b:
+        right.add(v)
+        whole.add(v)
+    left.merge(right)
+
+    assert left.bins.nbytes == nbytes
+    assert left.count == whole.count == 12000
+    for q in (0.0, 0.5, 0.95, 0.99):
+        assert left.quantile(q) == whole.quantile(q)
+
+    with pytest.raises(ValueError):
+        left.merge(DDSketch(relative_accuracy=0.05))
+
+
+def test_empty_stats():
+    assert RunningStats().summary() == {}
+    assert DDSketch().quantile(0.5) is None
@@ -0,0 +1,42 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import pytest
+from serving.switch_cost import SwitchCostTracker
+from training.calibrate_switch_penalty import switch_penalty, write_penalty
+
+
+def _tracker():
+    t = SwitchCostTracker(["Nano", "Small", "Large"])
+    for _ in range(40):
+        t.observe("Nano", 10.0, switched=False)
+        t.observe("Nano", 15.0, switched=True)
+        t.observe("Large", 40.0, switched=False)
+    return t
+
+
+def test_summary_separates_phases():
+    s = _tracker().summary()
+    assert s["Nano"]["steady_mean_ms"] == 10.0 and s["Nano"]["switch_mean_ms"] == 15.0
+    assert s["Nano"]["switch_cost_ms"] == 5.0
+    assert s["Large"]["switch_cost_ms"] is None            # never switched to
+    assert s["Small"]["steady_n"] == 0
+
+
+def test_penalty_mapping_and_write(tmp_path):
+    penalty, relative, used = switch_penalty(_tracker().summary(), w_efficiency=0.16, min_samples=30)
+    assert used == ["Nano"]
+    assert relative == pytest.approx(0.5)
+    assert penalty == pytest.approx(0.08)
+
+    params = tmp_path / "params.yaml"
+    params.write_text("reward:\n  switching_penalty: 0.02    # comment kept\n")
+    write_penalty(penalty, str(params))
+    assert params.read_text() == "reward:\n  switching_penalty: 0.08    # comment kept\n"
+
+
+def test_penalty_needs_samples():
+    assert switch_penalty(_tracker().summary(), 0.16, min_samples=100)[0] is None
@@ -0,0 +1,62 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import json
+
+from serving.tracing import NULL_TRACE, OtlpExporter, Tracer
+
+
+def test_unsampled_frames_get_null_trace():
+    observed = []
+    tracer = Tracer(sample_rate=0.0, observe=lambda *a: observed.append(a))
+    trace = tracer.start_trace()
+    assert trace is NULL_TRACE
+    with trace.span("decode"):
+        pass
+    tracer.finish(trace)
+    assert observed == []
+
+
+def test_sampled_spans_are_observed_with_model_labels():
+    observed = []
+    tracer = Tracer(sample_rate=1.0, observe=lambda *a: observed.append(a))
+    trace = tracer.start_trace()
+    with trace.span("decode"):
+        pass
+    trace.attrs["model"] = "Nano"
+    with trace.span("predict", model="Nano"):
+        pass
+    with trace.span("baseline_predict", model="Small"):
+        pass
+    tracer.finish(trace)
+
+    assert [(stage, model) for stage, model, _ in observed] == [
+        ("decode", "Nano"), ("predict", "Nano"), ("baseline_predict", "Small")]
+    assert all(seconds >= 0.0 for _, _, seconds in observed)
+
+
+def test_exporter_writes_otlp_json(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = OtlpExporter(path=path, batch_size=2, flush_interval_s=60.0)
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+    exporter.start()
+    for _ in range(3):
+        trace = tracer.start_trace(routing_mode="frame")
+        with trace.span("send"):
+            pass
+        tracer.finish(trace)
+    exporter.stop()
+
+    with open(path) as f:
+        batches = [json.loads(line) for line in f]
+    spans = [s for b in batches for s in b["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+    assert exporter.exported == 3 and len(spans) == 6
+    roots = {s["spanId"]: s for s in spans if s["name"] == "frame"}
+    for child in (s for s in spans if s["name"] == "send"):
+        root = roots[child["parentSpanId"]]
+        assert child["traceId"] == root["traceId"]
+        assert int(root["startTimeUnixNano"]) <= int(child["startTimeUnixNano"])
+        assert int(child["endTimeUnixNano"]) <= int(root["endTimeUnixNano"])
@@ -0,0 +1,52 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pandas as pd
+from core.buffer_manager import COUNT_DELTA_SCALE, WindowBufferManager
+from core.environment import WindowedInferenceEnv
+from core.profile_store import write_profile
+
+
+def _profile(tmp_path, n=200):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"path": [f"/missing/{i}.jpg" for i in range(n)]})   # images absent → zero features
+    for k in ["n", "s", "l"]:
+        df[f"{k}_conf"]  = rng.random(n)
+        df[f"{k}_time"]  = rng.random(n) * 0.05
+        df[f"{k}_count"] = rng.integers(0, 30, n)
+    path = str(tmp_path / "profile.arrow")
+    write_profile(df, path)
+    return path
+
+
+def test_build_observation_layout():
+    buf = WindowBufferManager(window_size=3)
+    for i, count in enumerate([2, 5, 9]):
+        buf.add_frame_data(np.full(1024, i, dtype=np.float32), 0.1 * i, 0.2 * i, count)
+    obs = buf.build_observation(prev_action=2)
+    assert obs.shape == (1028,) and obs.dtype == np.float32
+    np.testing.assert_allclose(obs[:1024], 1.0)
+    np.testing.assert_allclose(obs[1024:], [1.0, 1.0, 0.2, 7 / COUNT_DELTA_SCALE], rtol=1e-6)
+
+
+def test_windowed_step_reward_and_episode(tmp_path):
+    env = WindowedInferenceEnv(_profile(tmp_path), window_size=5)
+    env.episode_length = 50
+    obs, _ = env.reset(seed=0)
+    assert obs.shape == (1028,)
+
+    start = env.current_step
+    _, reward, done, _, _ = env.step(2)
+    expected = env.rewards[start:start + 5, 2].mean() - env.switching_penalty
+    assert np.isclose(reward, expected)
+    assert env.current_step == start + 5 and not done
+
+    steps = 1
+    while not done:
+        _, _, done, _, _ = env.step(2)
+        steps += 1
+    assert steps == 10                        # 50 frames / 5 per window
@@ -0,0 +1,127 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import threading
+
+import numpy as np
+import pytest
+
+from serving.worker_pools import PoolConfig, PoolFull, TierPool, TierPools, parse_pool_configs
+
+
+def _pools(*configs):
+    return TierPools([TierPool(name, [f"{name}-{i}" for i in range(cfg.workers)], cfg)
+                      for name, cfg in zip(("Nano", "Small", "Large"), configs)])
+
+
+def test_parse_pool_configs():
+    cfgs = parse_pool_configs("Nano=2", "Large=8", "Nano=2,Large=6")
+    assert cfgs == [PoolConfig(2, 0, 2), PoolConfig(1, 0, 0), PoolConfig(1, 8, 6)]
+    with pytest.raises(ValueError):
+        PoolConfig(workers=0)
+
+
+def test_tiers_do_not_block_each_other():
+    pools = _pools(PoolConfig(), PoolConfig(), PoolConfig())
+    release = threading.Event()
+    try:
+        large = pools[2].submit(lambda model: release.wait(5.0) and model)
+        assert pools.run(0, lambda model: model)[0] == "Nano-0"
+        assert pools.run(1, lambda model: model)[0] == "Small-0"
+        assert not large.done() and pools[2].depth() == 1
+        release.set()
+        assert large.result(timeout=5.0)[0] == "Large-0"
+    finally:
+        release.set()
+        pools.shutdown()
+
+
+def test_concurrency_and_queue_limits():
+    pool = TierPool("Nano", ["a", "b"], PoolConfig(workers=2, max_queue=1))
+    release, running = threading.Event(), threading.Barrier(3)
+
+    def hold(model):
+        running.wait(5.0)
+        release.wait(5.0)
+        return model
+
+    try:
+        busy = [pool.submit(hold), pool.submit(hold)]
+        running.wait(5.0)                                   # both workers run at once
+        queued = pool.submit(lambda model: model)
+        assert pool.waiting() == 1 and not pool.has_room()
+        with pytest.raises(PoolFull):
+            pool.submit(lambda model: model)
+        release.set()
+        assert {f.result(timeout=5.0)[0] for f in busy} == {"a", "b"}
+        assert queued.result(timeout=5.0)[2] > 0            # it waited for a worker
+        stats = pool.stats()
+        assert (stats["completed"], stats["rejected"], stats["depth"]) == (3, 1, 0)
+        assert stats["wait_ms_p95"] >= stats["wait_ms_p50"]
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_expected_wait_spreads_backlog_over_workers():
+    pool = TierPool("Large", ["a", "b"], PoolConfig(workers=2))
+    pool.warm(lambda model: threading.Event().wait(0.02))
+    assert pool.estimate_ms() > 0
+    release = threading.Event()
+    try:
+        for _ in range(3):
+            pool.submit(lambda model: release.wait(5.0))
+        assert pool.expected_wait_ms() == pytest.approx(2 * pool.estimate_ms() / 2)
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_engine_pools_per_tier(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ultralytics import YOLO
+    from core.routers import build_router, save_router
+    from serving.backends import OrtRuntime
+    from serving.engine import AdaptiveInferenceSystem
+
+    monkeypatch.chdir(tmp_path)     # the export lands next to the (missing) yolov8n.pt
+    YOLO("yolov8n.yaml").export(format="onnx", imgsz=320, opset=12)
+    router = save_router(build_router("pooled", hidden=8), str(tmp_path / "router.pt"), "pooled", hidden=8)
+    weights = str(tmp_path / "yolov8n.pt")
+    engine = AdaptiveInferenceSystem(
+        router, weights, weights, weights, device="cpu", tier_devices=["cpu:0", "cpu:1", "cpu:1"],
+        pool_configs=[PoolConfig(workers=2, threads=2), PoolConfig(), PoolConfig(max_queue=1)],
+        max_queue_wait_ms=1.0, ort_runtime=OrtRuntime(thread_budget=8),
+    )
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    release = threading.Event()
+    try:
+        nano = engine.pools[0]
+        assert nano.replicas[1].session is nano.replicas[0].session
+        assert nano.replicas[1].letterbox is not nano.replicas[0].letterbox
+        assert engine.backends[0].intra_op_threads == 2 and nano.config.threads == 2
+        assert all(engine.pools[t].estimate_ms() > 0 for t in range(3))       # seeded by warm-up
+
+        # Two frames at once on Nano's two workers
+        out = [None, None]
+        threads = [threading.Thread(target=lambda i=i: out.__setitem__(i, engine._run_yolo(0, frame)))
+                   for i in range(2)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        assert all(r is not None for r in out) and nano.completed == 2
+
+        for _ in range(2):                                  # one running, one waiting: Large is full
+            engine.pools[2].submit(lambda model: release.wait(5.0))
+        assert engine._run_yolo(0, frame).latency_ms > 0   # Nano does not wait for it
+        assert engine._route_by_queue(2) != 2
+        assert engine.queue_spills["Large"] == 1
+        with pytest.raises(PoolFull):
+            engine._run_yolo(2, frame)
+        assert engine.pool_stats()["pools"]["Large"]["rejected"] == 1
+    finally:
+        release.set()
+        engine.close()
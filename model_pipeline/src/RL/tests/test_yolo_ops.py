@@ -0,0 +1,144 @@
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import numpy as np
+import pytest
+import torch
+
+from serving.yolo_ops import CV2_NMS_MAX, Letterbox, nms, postprocess
+
+
+def _ultralytics_nms():
+    try:
+        from ultralytics.utils.nms import non_max_suppression
+    except ImportError:     # Ultralytics < 8.3
+        from ultralytics.utils.ops import non_max_suppression
+    return non_max_suppression
+
+
+def _random_boxes(rng, n, classes=80):
+    xy = rng.random((n, 2), dtype=np.float32) * 600
+    wh = rng.random((n, 2), dtype=np.float32) * 200 + 5
+    boxes = np.concatenate([xy, xy + wh], 1)
+    return boxes, rng.random(n, dtype=np.float32), rng.integers(0, classes, n)
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (640, 480), (375, 500), (640, 640), (101, 333)])
+def test_letterbox_matches_ultralytics(shape):
+    from ultralytics.data.augment import LetterBox
+
+    frame = np.random.default_rng(0).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    ref = LetterBox((640, 640), auto=False)(image=frame)
+    ref = ref[..., ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+
+    lb = Letterbox((640, 640))
+    out = lb(frame)
+    assert out is lb.buffer and out.shape == (1, 3, 640, 640)
+    np.testing.assert_allclose(out, ref, atol=1e-6)
+
+
+def test_letterbox_reuses_buffers_across_shapes():
+    lb = Letterbox((320, 320))
+    rng = np.random.default_rng(1)
+    wide = rng.integers(0, 256, (160, 320, 3), dtype=np.uint8)
+    tall = rng.integers(0, 256, (320, 160, 3), dtype=np.uint8)
+
+    first = lb(wide).copy()
+    assert lb.pad == (0, 80) and lb.ratio == 1.0
+    lb(tall)
+    assert lb.pad == (80, 0)
+    # Padding from the previous geometry must not leak into the next frame
+    np.testing.assert_array_equal(lb(wide), first)
+
+
+@pytest.mark.parametrize("n", [0, 1, 40, CV2_NMS_MAX + 500])
+def test_nms_matches_torchvision(n):
+    torchvision = pytest.importorskip("torchvision")
+    boxes, scores, _ = _random_boxes(np.random.default_rng(n), n)
+    ref = torchvision.ops.nms(torch.from_numpy(boxes), torch.from_numpy(scores), 0.5)
+    np.testing.assert_array_equal(nms(boxes, scores, 0.5), ref.numpy())
+    np.testing.assert_array_equal(nms(boxes, scores, 0.5, max_keep=10), ref[:10].numpy())
+
+
+@pytest.mark.parametrize("shape,auto", [((480, 640), False), ((375, 500), True), ((720, 1280), True)])
+def test_postprocess_matches_ultralytics(shape, auto):
+    from ultralytics.utils.ops import scale_boxes
+
+    rng = np.random.default_rng(0)
+    lb = Letterbox((640, 640), auto=auto)
+    blob = lb(rng.integers(0, 256, (*shape, 3), dtype=np.uint8))
+    anchors = (blob.shape[2] // 8) * (blob.shape[3] // 8)
+    # Head output: xywh in letterboxed pixels, then 80 class scores mostly below threshold
+    raw = np.empty((1, 84, anchors), dtype=np.float32)
+    raw[0, :2] = rng.random((2, anchors)) * np.array([[blob.shape[3]], [blob.shape[2]]])
+    raw[0, 2:4] = rng.random((2, anchors)) * 120 + 4
+    raw[0, 4:] = rng.random((80, anchors)) ** 8
+
+    ref = _ultralytics_nms()(torch.from_numpy(raw), 0.25, 0.7, max_det=300)[0]
+    ref[:, :4] = scale_boxes(blob.shape[2:], ref[:, :4], shape)
+    xyxy, conf, cls = postprocess(raw, lb, shape, 0.25, 0.7, 300)
+    assert len(conf) == len(ref) > 0
+    np.testing.assert_allclose(xyxy, ref[:, :4].numpy(), atol=1e-4)
+    np.testing.assert_array_equal(conf, ref[:, 4].numpy())
+    np.testing.assert_array_equal(cls, ref[:, 5].numpy().astype(np.int64))
+
+
+@pytest.mark.parametrize("dynamic", [True, False])
+def test_ort_yolo_matches_ultralytics_onnx_predict(tmp_path, monkeypatch, dynamic):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ultralytics import YOLO
+    from serving.backends import BackendConfig, OrtYOLO
+
+    monkeypatch.chdir(tmp_path)
+    torch.manual_seed(0)
+    yolo = YOLO("yolov8n.yaml")
+    # Untrained class logits start near -10; lift them so frames produce detections
+    for branch in yolo.model.model[-1].cv3:
+        branch[-1].bias.data += 9 + torch.randn(branch[-1].bias.shape)
+    onnx_path = yolo.export(format="onnx", imgsz=320, dynamic=dynamic, opset=12)
+
+    ours = OrtYOLO(onnx_path, BackendConfig("onnxruntime"))
+    ref_model = YOLO(onnx_path, task="detect")
+    rng = np.random.default_rng(0)
+    for shape in [(240, 320), (187, 250), (360, 640)]:
+        frame = rng.integers(0, 256, (*shape, 3), dtype=np.uint8)
+        det = ours(frame)[0]
+        ref = ref_model(frame, imgsz=320, verbose=False)[0].boxes
+        assert len(det) == len(ref) > 0
+        np.testing.assert_allclose(det.xyxy, ref.xyxy.numpy(), atol=1e-3)
+        np.testing.assert_allclose(det.conf, ref.conf.numpy(), atol=1e-5)
+        np.testing.assert_array_equal(det.cls, ref.cls.numpy().astype(np.int64))
+
+
+def test_ort_yolo_runs_dynamic_export_at_other_sizes(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    from ultralytics import YOLO
+    from serving.backends import BackendConfig, OrtYOLO
+
+    monkeypatch.chdir(tmp_path)
+    torch.manual_seed(0)
+    yolo = YOLO("yolov8n.yaml")
+    for branch in yolo.model.model[-1].cv3:
+        branch[-1].bias.data += 9 + torch.randn(branch[-1].bias.shape)
+    onnx_path = yolo.export(format="onnx", imgsz=320, dynamic=True, opset=12)
+
+    ours = OrtYOLO(onnx_path, BackendConfig("onnxruntime"))
+    ref_model = YOLO(onnx_path, task="detect")
+    frame = np.random.default_rng(0).integers(0, 256, (360, 640, 3), dtype=np.uint8)
+    for imgsz in (192, 320, 192):
+        det = ours(frame, imgsz=imgsz)[0]
+        ref = ref_model(frame, imgsz=imgsz, verbose=False)[0].boxes
+        assert len(det) == len(ref) > 0
+        np.testing.assert_allclose(det.xyxy, ref.xyxy.numpy(), atol=1e-3)
+    # One letterbox and binding per size, reused when the size comes back
+    assert set(ours._letterboxes) == {(320, 320), (192, 192)}
+    assert ours._infer(ours._preprocess(frame, 192), 192) is ours._bindings[(192, 192)][2]
+
+    static = OrtYOLO(yolo.export(format="onnx", imgsz=320, opset=12), BackendConfig("onnxruntime"))
+    with pytest.raises(ValueError, match="static"):
+        static(frame, imgsz=192)
@@ -0,0 +1,267 @@
+"""
+benchmark_backends.py — per-tier backend matrix for the serving engine.
+
+Times every YOLO tier (Nano / Small / Large) on every available backend
+configuration (serving/backends.py) at batch 1, the way the engine calls it:
+
+    torch          eager, for each backends.torch_threads setting
+    torch_compile  predict(compile=True), same thread settings (skipped if the
+                   installed Ultralytics has no `compile` predict argument)
+    onnxruntime    every provider this build offers (OpenVINO, CPU) ×
+                   graph_optimization × execution mode × intra-op threads,
+                   and × inter-op threads in parallel mode (inter-op threads
+                   are unused by the sequential executor)
+
+All configurations run on the same frames, decoded into memory once, with
+backends.warmup_runs untimed calls first.  The full latency/throughput matrix
+is written to paths.backend_matrix, and the fastest configuration per tier (by
+backends.select_by) to paths.backend_config, which serving/app.py passes to the
+engine (BACKEND_CONFIG_PATH).  Missing .onnx exports are created next to the
+.pt weights first, with the same settings as export_onnx.py.
+
+Latency is host-specific: run this on the node type that serves traffic.
+
+Usage:
+    python training/benchmark_backends.py                          # full sweep, writes both files
+    python training/benchmark_backends.py --tiers Nano --frames 16 --no-write
+    python training/benchmark_backends.py --synthetic              # random frames, no dataset needed
+"""
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import time
+
+import cv2
+import numpy as np
+import torch
+import yaml
+
+from serving.backends import (BackendConfig, available_backends, find_onnx, load_backend,
+                              ort_providers, predict_kwargs, write_backend_config)
+
+_original_torch_load = torch.load
+
+def _patched_load(*args, **kwargs):
+    kwargs["weights_only"] = False
+    return _original_torch_load(*args, **kwargs)
+
+torch.load = _patched_load
+
+# ─── Load params.yaml ─────────────────────────────────────────────────────────
+with open(os.path.join(_RL_ROOT, "params.yaml")) as _f:
+    _P = yaml.safe_load(_f)
+
+_B = _P["backends"]
+MATRIX_PATH = os.path.join(_RL_ROOT, _P["paths"]["backend_matrix"])
+CONFIG_PATH = os.path.join(_RL_ROOT, _P["paths"]["backend_config"])
+# ──────────────────────────────────────────────────────────────────────────────
+
+TIERS = {"Nano": "yolov8n.pt", "Small": "yolov8s.pt", "Large": "yolov8l.pt"}
+SELECT_KEYS = ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+
+
+def load_frames(n, synthetic=False, seed=42):
+    """n BGR frames decoded into memory — a seeded sample of the COCO training split."""
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(n)]
+
+    from training.profile_models import get_project_paths, load_split
+
+    _, data_dir, split_file = get_project_paths()
+    paths = load_split(split_file)
+    random.Random(seed).shuffle(paths)
+    frames = []
+    for rel in paths:
+        frame = cv2.imread(os.path.join(data_dir, rel))
+        if frame is not None:
+            frames.append(frame)
+        if len(frames) == n:
+            break
+    if not frames:
+        raise RuntimeError(f"No readable images listed in {split_file}")
+    return frames
+
+
+def backend_grid(b, backends=None):
+    """Every configuration to time, in a stable order."""
+    backends = backends or available_backends()
+    grid = []
+    for name in ("torch", "torch_compile"):
+        if name in backends:
+            grid += [BackendConfig(name, intra_op_threads=t) for t in b["torch_threads"]]
+    if "onnxruntime" in backends:
+        for provider, level, mode, intra in itertools.product(
+                ort_providers(), b["graph_optimization"], b["execution_modes"], b["intra_op_threads"]):
+            inters = b["inter_op_threads"] if mode == "parallel" else [0]
+            grid += [BackendConfig("onnxruntime", provider=provider, graph_optimization=level,
+                                   execution_mode=mode, intra_op_threads=intra, inter_op_threads=inter)
+                     for inter in inters]
+    return grid
+
+
+def ensure_onnx(weights_path):
+    """Path of the tier's .onnx, exporting it first if missing; None if export fails."""
+    onnx_path = find_onnx(weights_path)
+    if onnx_path is not None or not _B["export_missing_onnx"]:
+        return onnx_path
+    try:
+        from ultralytics import YOLO
+        print(f"[Backends] Exporting {weights_path} → .onnx …")
+        YOLO(weights_path).export(format="onnx", dynamic=True, simplify=False, opset=12)
+    except Exception as exc:
+        print(f"[Backends] ONNX export failed for {weights_path} — skipping onnxruntime: {exc}")
+        return None
+    return find_onnx(weights_path)
+
+
+def latency_summary(samples_ms, wall_s):
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "mean_ms":        float(arr.mean()),
+        "std_ms":         float(arr.std()),
+        "p50_ms":         float(p50),
+        "p95_ms":         float(p95),
+        "p99_ms":         float(p99),
+        "throughput_fps": len(arr) / wall_s,
+        "samples":        len(arr),
+    }
+
+
+def time_config(model, kwargs, frames, warmup_runs, timed_runs):
+    for i in range(warmup_runs):
+        model(frames[i % len(frames)], **kwargs)
+    samples = []
+    t_start = time.perf_counter()
+    for _ in range(timed_runs):
+        for frame in frames:
+            t0 = time.perf_counter()
+            model(frame, **kwargs)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+    return latency_summary(samples, time.perf_counter() - t_start)
+
+
+def benchmark_tier(tier, weights_path, grid, frames, device):
+    """One matrix row per configuration; failures are recorded, not raised."""
+    default_threads = torch.get_num_threads()
+    torch_model = None
+    has_onnx = any(c.backend == "onnxruntime" for c in grid) and ensure_onnx(weights_path) is not None
+    rows = []
+    for cfg in grid:
+        row = {"tier": tier, "label": cfg.label, "config": cfg.to_dict()}
+        if cfg.backend == "onnxruntime" and not has_onnx:
+            continue
+        try:
+            if cfg.backend == "onnxruntime":
+                model = load_backend(weights_path, cfg, device)
+            else:
+                torch.set_num_threads(cfg.intra_op_threads or default_threads)
+                if torch_model is None:
+                    torch_model = load_backend(weights_path, BackendConfig("torch"), device)
+                model = torch_model
+            row.update(time_config(model, predict_kwargs(cfg, device), frames,
+                                   _B["warmup_runs"], _B["timed_runs"]))
+            print(f"[Backends] {tier:<5} {cfg.label:<58} p50 {row['p50_ms']:8.2f} ms  "
+                  f"p95 {row['p95_ms']:8.2f} ms  {row['throughput_fps']:6.1f} fps")
+        except Exception as exc:
+            row["error"] = f"{type(exc).__name__}: {exc}"
+            print(f"[Backends] {tier:<5} {cfg.label:<58} failed — {row['error']}")
+        finally:
+            torch.set_num_threads(default_threads)
+        rows.append(row)
+    return rows
+
+
+def select_best(rows, select_by):
+    """Tier → (BackendConfig, row) with the lowest select_by among successful rows."""
+    best = {}
+    for row in rows:
+        if "error" in row:
+            continue
+        current = best.get(row["tier"])
+        if current is None or row[select_by] < current[1][select_by]:
+            best[row["tier"]] = (BackendConfig.from_dict(row["config"]), row)
+    return best
+
+
+def host_info():
+    try:
+        import onnxruntime
+        ort_version = onnxruntime.__version__
+    except ImportError:
+        ort_version = None
+    return {
+        "hostname":      platform.node(),
+        "machine":       platform.machine(),
+        "processor":     platform.processor(),
+        "cpu_count":     os.cpu_count(),
+        "torch":         torch.__version__,
+        "onnxruntime":   ort_version,
+        "ort_providers": ort_providers(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=list(TIERS))
+    parser.add_argument("--weights-dir", default=_RL_ROOT, help="directory holding yolov8{n,s,l}.pt")
+    parser.add_argument("--frames", type=int, default=_B["frames"])
+    parser.add_argument("--synthetic", action="store_true", help="random frames instead of the COCO split")
+    parser.add_argument("--backends", nargs="+", choices=["torch", "torch_compile", "onnxruntime"],
+                        help="restrict to these backends (default: all available)")
+    parser.add_argument("--select-by", choices=SELECT_KEYS, default=_B["select_by"])
+    parser.add_argument("--device", default=_B["device"])
+    parser.add_argument("--matrix", default=MATRIX_PATH)
+    parser.add_argument("--output", default=CONFIG_PATH, help="backend config the engine loads")
+    parser.add_argument("--no-write", action="store_true", help="print the matrix, write nothing")
+    args = parser.parse_args()
+
+    available = available_backends()
+    backends = [b for b in (args.backends or available) if b in available]
+    grid = backend_grid(_B, backends)
+    frames = load_frames(args.frames, synthetic=args.synthetic)
+    print(f"[Backends] {len(grid)} configurations × {len(args.tiers)} tiers on {len(frames)} frames "
+          f"(available: {', '.join(available)})")
+
+    rows = []
+    for tier in args.tiers:
+        rows += benchmark_tier(tier, os.path.join(args.weights_dir, TIERS[tier]), grid, frames, args.device)
+
+    best = select_best(rows, args.select_by)
+    print(f"\n[Backends] Best per tier by {args.select_by}:")
+    for tier in args.tiers:
+        if tier in best:
+            cfg, row = best[tier]
+            print(f"  {tier:<5} {cfg.label:<58} {row[args.select_by]:8.2f} ms  {row['throughput_fps']:6.1f} fps")
+        else:
+            print(f"  {tier:<5} no configuration succeeded")
+
+    if args.no_write:
+        return
+    meta = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "select_by":    args.select_by,
+        "frames":       len(frames),
+        "host":         host_info(),
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.matrix)), exist_ok=True)
+    with open(args.matrix, "w") as f:
+        json.dump({**meta, "rows": rows}, f, indent=2)
+    print(f"[Backends] Matrix → {args.matrix}")
+    if best:
+        write_backend_config(args.output, {t: cfg for t, (cfg, _) in best.items()},
+                             {**meta, "selected": {t: row for t, (_, row) in best.items()}})
+        print(f"[Backends] Backend config → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Maps the switch cost measured in serving onto reward.switching_penalty.
+
+The serving engine records adaptive-path latency for the first frame after a
+model switch separately from steady-state frames (GET /switch_costs).  The
+training reward expresses latency through its efficiency term, so the
+measured overhead is converted on the same scale:
+
+    relative_overhead  = mean extra latency of a switch frame / mean steady latency
+    switching_penalty  = reward.w_efficiency × relative_overhead
+
+weighted by how often each variant was switched to, and clipped to
+[0, --max-penalty].  Variants with fewer than --min-samples frames in either
+phase are ignored.
+
+Usage:
+    python training/calibrate_switch_penalty.py --url http://localhost:8000/switch_costs
+    python training/calibrate_switch_penalty.py --file switch_costs.json --write
+"""
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import argparse
+import json
+import re
+import urllib.request
+
+import yaml
+
+PARAMS_PATH = os.path.join(_RL_ROOT, "params.yaml")
+
+
+def load_costs(url=None, path=None):
+    if path:
+        with open(path) as f:
+            data = json.load(f)
+    else:
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            data = json.load(resp)
+    return data.get("models", data)
+
+
+def switch_penalty(costs, w_efficiency, min_samples=30, max_penalty=0.5):
+    """Returns (penalty, relative_overhead, variants used) — penalty is None without data."""
+    used, sw_weight, overhead, steady_weight, steady = [], 0, 0.0, 0, 0.0
+    for name, row in costs.items():
+        if row.get("switch_n", 0) < min_samples or row.get("steady_n", 0) < min_samples:
+            continue
+        used.append(name)
+        sw_weight     += row["switch_n"]
+        overhead      += row["switch_n"] * row["switch_cost_ms"]
+        steady_weight += row["steady_n"]
+        steady        += row["steady_n"] * row["steady_mean_ms"]
+    if not used or steady <= 0:
+        return None, None, used
+
+    relative = max(overhead / sw_weight, 0.0) / (steady / steady_weight)
+    penalty  = min(w_efficiency * relative, max_penalty)
+    return round(penalty, 4), relative, used
+
+
+def write_penalty(value, params_path=PARAMS_PATH):
+    """Rewrites reward.switching_penalty in place, keeping the file's comments."""
+    with open(params_path) as f:
+        text = f.read()
+    new_text, n = re.subn(r"^(\s*switching_penalty:\s*)[0-9.eE+-]+", rf"\g<1>{value}", text,
+                          count=1, flags=re.M)
+    if n != 1:
+        raise ValueError(f"reward.switching_penalty not found in {params_path}")
+    with open(params_path, "w") as f:
+        f.write(new_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--url", default="http://localhost:8000/switch_costs")
+    src.add_argument("--file", help="saved /switch_costs JSON instead of a live server")
+    parser.add_argument("--min-samples", type=int, default=30)
+    parser.add_argument("--max-penalty", type=float, default=0.5)
+    parser.add_argument("--write", action="store_true", help="update params.yaml")
+    args = parser.parse_args()
+
+    with open(PARAMS_PATH) as f:
+        reward = yaml.safe_load(f)["reward"]
+
+    costs = load_costs(url=None if args.file else args.url, path=args.file)
+    for name, row in costs.items():
+        print(f"  {name:<6} switch {row.get('switch_mean_ms')} ms (n={row.get('switch_n')})  "
+              f"steady {row.get('steady_mean_ms')} ms (n={row.get('steady_n')})  "
+              f"cost {row.get('switch_cost_ms')} ms")
+
+    penalty, relative, used = switch_penalty(costs, reward["w_efficiency"],
+                                             args.min_samples, args.max_penalty)
+    if penalty is None:
+        print(f"Not enough samples (need ≥{args.min_samples} per phase) — penalty unchanged.")
+        sys.exit(1)
+
+    print(f"\nRelative switch overhead: {relative * 100:.1f}% of a steady frame "
+          f"(variants: {', '.join(used)})")
+    print(f"switching_penalty: {reward['switching_penalty']} → {penalty}")
+    if args.write:
+        write_penalty(penalty)
+        print(f"Written → {PARAMS_PATH}  (run `dvc repro` to retrain with it)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Distils the BC/PPO routing policy into compact student routers.
+
+Students (core/routers.py) are trained on the BC dataset store
+(paths.bc_data_dir) against a blend of the profile's optimal-action labels
+(core/scoring.py) and the teacher policy's action probabilities:
+
+    loss = (1 − α) · CE(student, profile label) + α · KL(teacher ‖ student)
+
+For every student the stage reports, on the held-out split:
+    agreement        — share of decisions identical to the teacher's
+    accuracy         — share matching the profile's optimal action
+    reward_loss      — teacher avg reward − student avg reward
+    us_per_decision  — single-observation predict() latency on CPU
+
+Each student is saved to paths.router_dir/<kind>.pt and can be served in
+place of the PPO .zip (RL_MODEL_PATH=models/routers/<kind>.pt).
+
+Usage:
+    python training/distill_router.py
+"""
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import json
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+import yaml
+from stable_baselines3 import PPO
+from core.actions import DEFAULT_IMGSZ, action_grid, metric_columns
+from core.profile_store import read_profile_arrays
+from core.routers import build_router, load_router, save_router
+from core.scoring import stack_metrics, score_profile
+from training.feature_store import MemmapBatchDataset, load_store, make_loader, split_indices
+
+# ─── Load params.yaml ─────────────────────────────────────────────────────────
+with open(os.path.join(_RL_ROOT, "params.yaml")) as _f:
+    _P = yaml.safe_load(_f)
+
+STUDENTS       = _P["distill"]["students"]
+EPOCHS         = _P["distill"]["epochs"]
+LR             = _P["distill"]["lr"]
+BATCH          = _P["distill"]["batch_size"]
+ALPHA          = _P["distill"]["alpha"]
+PATIENCE       = _P["distill"]["patience"]
+PCA_FIT_ROWS   = _P["distill"]["pca_fit_rows"]
+TIMING_CALLS   = _P["distill"]["timing_calls"]
+VAL_FRACTION   = _P["bc"]["val_fraction"]
+LOADER_WORKERS = _P["bc"]["loader_workers"]
+W_QUALITY      = _P["reward"]["w_quality"]
+W_EFFICIENCY   = _P["reward"]["w_efficiency"]
+PROFILE_PATH   = os.path.join(_RL_ROOT, _P["paths"]["profile"])
+TEACHER_PATH   = os.path.join(_RL_ROOT, _P["paths"]["final_model"])
+BC_DATA_DIR    = os.path.join(_RL_ROOT, _P["paths"]["bc_data_dir"])
+ROUTER_DIR     = os.path.join(_RL_ROOT, _P["paths"]["router_dir"])
+REPORT_PATH    = os.path.join(_RL_ROOT, _P["paths"]["distill_report"])
+ACTION_KEYS    = [a.key for a in action_grid(_P["profile"].get("resolutions", [DEFAULT_IMGSZ]))]
+# ──────────────────────────────────────────────────────────────────────────────
+
+
+def teacher_probs(teacher, xb):
+    """Teacher action probabilities for a batch of observations."""
+    with torch.no_grad():
+        return teacher.policy.get_distribution(xb).distribution.probs
+
+
+def predict_split(predict_fn, obs, idx, batch=4096):
+    """Deterministic actions for obs[idx], read from the memmap in chunks."""
+    out = np.empty(len(idx), dtype=np.int64)
+    for s in range(0, len(idx), batch):
+        chunk = idx[s:s + batch]
+        out[s:s + len(chunk)] = predict_fn(np.ascontiguousarray(obs[chunk]))
+    return out
+
+
+def time_decisions(policy, obs, n_calls=TIMING_CALLS):
+    """Mean latency of single-observation predict() in microseconds (after warm-up)."""
+    for _ in range(min(100, n_calls)):
+        policy.predict(obs, deterministic=True)
+    t0 = time.perf_counter()
+    for _ in range(n_calls):
+        policy.predict(obs, deterministic=True)
+    return (time.perf_counter() - t0) / n_calls * 1e6
+
+
+def n_params(module):
+    return int(sum(p.numel() for p in module.parameters()))
+
+
+def student_config(kind):
+    """Constructor kwargs for a student, sized to the profiled action grid."""
+    return {**(STUDENTS[kind] or {}), "n_actions": len(ACTION_KEYS)}
+
+
+def train_student(kind, teacher, dataset, obs, train_idx, val_idx):
+    """Trains one student with early stopping on validation loss; returns the best model."""
+    model = build_router(kind, **student_config(kind))
+    if kind == "pca":
+        fit_idx = train_idx[:PCA_FIT_ROWS]
+        model.fit_pca(obs[fit_idx, :1024])
+
+    opt          = torch.optim.Adam(model.parameters(), lr=LR)
+    train_loader = make_loader(dataset, train_idx, BATCH, shuffle=True,  workers=LOADER_WORKERS)
+    val_loader   = make_loader(dataset, val_idx,   BATCH, shuffle=False, workers=LOADER_WORKERS)
+
+    def batch_loss(xb, yb):
+        logits = model(xb)
+        hard   = F.cross_entropy(logits, yb)
+        soft   = F.kl_div(F.log_softmax(logits, dim=1), teacher_probs(teacher, xb),
+                          reduction="batchmean")
+        return (1 - ALPHA) * hard + ALPHA * soft
+
+    best_loss, best_state, stale = float("inf"), None, 0
+    for epoch in range(EPOCHS):
+        model.train()
+        for xb, yb in train_loader:
+            loss = batch_loss(xb, yb)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+
+        model.eval()
+        total, seen = 0.0, 0
+        with torch.no_grad():
+            for xb, yb in val_loader:
+                total += batch_loss(xb, yb).item() * len(yb)
+                seen  += len(yb)
+        val_loss = total / max(seen, 1)
+        print(f"  [{kind}] epoch {epoch+1:3d}/{EPOCHS}  val_loss={val_loss:.4f}")
+
+        if val_loss < best_loss:
+            best_loss, stale = val_loss, 0
+            best_state = {k: v.clone() for k, v in model.state_dict().items()}
+        else:
+            stale += 1
+            if stale >= PATIENCE:
+                break
+
+    model.load_state_dict(best_state)
+    return model.eval()
+
+
+def main():
+    os.makedirs(ROUTER_DIR, exist_ok=True)
+
+    obs, labels, rows = load_store(BC_DATA_DIR)
+    metrics = read_profile_arrays(PROFILE_PATH, metric_columns(ACTION_KEYS))
+    rewards = score_profile(*stack_metrics(metrics, ACTION_KEYS), W_QUALITY, W_EFFICIENCY).rewards[rows]
+    dataset = MemmapBatchDataset(BC_DATA_DIR)
+    train_idx, val_idx = split_indices(len(labels), VAL_FRACTION)
+    if len(val_idx) == 0:
+        val_idx = train_idx
+    print(f"Distilling on {len(train_idx)} train / {len(val_idx)} val samples "
+          f"(α={ALPHA}, students: {', '.join(STUDENTS)})")
+
+    print(f"Loading teacher: {TEACHER_PATH}")
+    teacher = PPO.load(TEACHER_PATH, device="cpu")
+    teacher.policy.set_training_mode(False)
+
+    def evaluate(actions):
+        return {
+            "accuracy":   round(float(np.mean(actions == labels[val_idx])) * 100, 2),
+            "avg_reward": round(float(rewards[val_idx, actions].mean()), 4),
+        }
+
+    teacher_actions = predict_split(lambda x: teacher.predict(x, deterministic=True)[0], obs, val_idx)
+    sample_obs      = np.ascontiguousarray(obs[val_idx[0]])
+    report = {"teacher": {
+        **evaluate(teacher_actions),
+        "us_per_decision": round(time_decisions(teacher, sample_obs), 1),
+        "params":          n_params(teacher.policy),
+    }, "students": {}}
+    t_reward = report["teacher"]["avg_reward"]
+
+    for kind in STUDENTS:
+        print(f"\nTraining student '{kind}' …")
+        model = train_student(kind, teacher, dataset, obs, train_idx, val_idx)
+        path  = save_router(model, os.path.join(ROUTER_DIR, f"{kind}.pt"), kind,
+                            **student_config(kind))
+        policy  = load_router(path)
+        actions = predict_split(lambda x: policy.predict(x)[0], obs, val_idx)
+        stats   = evaluate(actions)
+        report["students"][kind] = {
+            **stats,
+            "agreement":       round(float(np.mean(actions == teacher_actions)) * 100, 2),
+            "reward_loss":     round(t_reward - stats["avg_reward"], 4),
+            "us_per_decision": round(time_decisions(policy, sample_obs), 1),
+            "params":          n_params(model),
+            "path":            os.path.relpath(path, _RL_ROOT),
+        }
+
+    t = report["teacher"]
+    print(f"\n=== DISTILLATION REPORT (val, {len(val_idx)} samples) ===")
+    print(f"  {'router':<8} {'params':>8} {'µs/dec':>8} {'agree%':>7} {'acc%':>6} {'reward':>7} {'loss':>7}")
+    print(f"  {'teacher':<8} {t['params']:>8} {t['us_per_decision']:>8.1f} {'—':>7} "
+          f"{t['accuracy']:>6.1f} {t['avg_reward']:>7.4f} {'—':>7}")
+    for kind, s in report["students"].items():
+        print(f"  {kind:<8} {s['params']:>8} {s['us_per_decision']:>8.1f} {s['agreement']:>7.1f} "
+              f"{s['accuracy']:>6.1f} {s['avg_reward']:>7.4f} {s['reward_loss']:>7.4f}")
+
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written → {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
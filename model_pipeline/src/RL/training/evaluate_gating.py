@@ -0,0 +1,197 @@
+"""
+evaluate_gating.py — fits the early-exit confidence gate and compares it
+offline with the routing policy.
+
+The gate (core/gating.py) runs Nano on every frame and re-runs the frame on
+Small or Large only when Nano's own output looks unsure.  This stage
+
+  1. fits the gate's thresholds on profile rows outside the evaluation split
+     and writes them to paths.gate (served with ROUTING_STRATEGY=gate);
+  2. replays, on the held-out rows of the BC store (paths.bc_data_dir, the
+     same split distill_router.py reports on), every strategy against the
+     profile:
+        nano / small / large   one fixed tier
+        oracle                 the profile's optimal action per frame
+        policy                 the trained PPO .zip or distilled router .pt
+        gate                   Nano, escalated per the fitted thresholds
+     and reports expected latency (an escalated frame pays Nano's latency
+     plus its final model's), confidence, detections, quality
+     (conf × √(count + 1), also as % of fixed Large), tier shares and
+     average reward.  The fixed tiers and the gate's outcomes are scored
+     together per frame, so their rewards are comparable.
+
+Without a BC store the evaluation rows are a random held-out split of the
+profile and the policy row is skipped (it needs the stored observations).
+
+Usage:
+    python training/evaluate_gating.py
+    python training/evaluate_gating.py --policy models/routers/pooled.pt
+"""
+import sys
+import os
+_RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RL_ROOT not in sys.path:
+    sys.path.insert(0, _RL_ROOT)
+
+import argparse
+import json
+import numpy as np
+import yaml
+from core.actions import DEFAULT_IMGSZ, MODEL_KEYS, TIER_NAMES, action_grid, metric_columns
+from core.gating import fit_gate, gate_outcomes, save_gate
+from core.profile_store import read_profile_arrays
+from core.scoring import score_profile, stack_metrics
+from training.feature_store import load_store, split_indices
+
+# ─── Load params.yaml ─────────────────────────────────────────────────────────
+with open(os.path.join(_RL_ROOT, "params.yaml")) as _f:
+    _P = yaml.safe_load(_f)
+
+G = _P["gate"]
+VAL_FRACTION = _P["bc"]["val_fraction"]
+W_QUALITY    = _P["reward"]["w_quality"]
+W_EFFICIENCY = _P["reward"]["w_efficiency"]
+ACTIONS      = action_grid(_P["profile"].get("resolutions", [DEFAULT_IMGSZ]))
+PROFILE_PATH = os.path.join(_RL_ROOT, _P["paths"]["profile"])
+BC_DATA_DIR  = os.path.join(_RL_ROOT, _P["paths"]["bc_data_dir"])
+POLICY_PATH  = os.path.join(_RL_ROOT, _P["paths"]["final_model"])
+GATE_PATH    = os.path.join(_RL_ROOT, _P["paths"]["gate"])
+REPORT_PATH  = os.path.join(_RL_ROOT, _P["paths"]["gate_report"])
+# ──────────────────────────────────────────────────────────────────────────────
+
+
+def strategy_metrics(conf, lat, count, choice, tiers, rewards=None):
+    """
+    Expected cost and quality of picking column choice[i] of the (N, A)
+    conf / latency / count matrices on row i.  tiers[a] is the YOLO variant
+    of column a, for the tier shares.
+    """
+    rows = np.arange(len(choice))
+    c, t, k = conf[rows, choice], lat[rows, choice] * 1000.0, count[rows, choice]
+    quality = c * np.sqrt(k + 1)
+    shares = np.bincount(choice, minlength=conf.shape[1]) / max(len(choice), 1) * 100.0
+    out = {
+        "latency_ms_mean": round(float(t.mean()), 3),
+        "latency_ms_p95":  round(float(np.percentile(t, 95)), 3),
+        "mean_conf":       round(float(c.mean()), 4),
+        "mean_count":      round(float(k.mean()), 3),
+        "quality":         round(float(quality.mean()), 4),
+        "tier_pct":        {TIER_NAMES[m]: round(float(shares[[a for a, tm in enumerate(tiers) if tm == m]].sum()), 1)
+                            for m in MODEL_KEYS},
+    }
+    if rewards is not None:
+        out["avg_reward"] = round(float(rewards[rows, choice].mean()), 4)
+    return out
+
+
+def tier_and_gate_rewards(conf, lat, count, w_quality, w_efficiency):
+    """
+    Rank-normalised rewards (core/scoring.py) of the (N, 3) stand-alone tiers
+    and of the gate's three outcomes, scored as one (N, 6) matrix so that an
+    escalated frame ranks below the same model run alone.
+    """
+    g_conf, g_lat, g_count = gate_outcomes(conf, lat, count)
+    rewards = score_profile(np.hstack([conf, g_conf]), np.hstack([lat, g_lat]), np.hstack([count, g_count]),
+                            w_quality, w_efficiency).rewards
+    return rewards[:, :conf.shape[1]], rewards[:, conf.shape[1]:]
+
+
+def evaluation_rows(n_rows):
+    """(eval rows, stored observations for them or None) — the BC store's held-out split when present."""
+    if os.path.exists(os.path.join(BC_DATA_DIR, "rows.npy")):
+        obs, _, rows = load_store(BC_DATA_DIR)
+        _, val_idx = split_indices(len(rows), VAL_FRACTION)
+        if len(val_idx):
+            return rows[val_idx], (obs, val_idx)
+    _, val_rows = split_indices(n_rows, VAL_FRACTION)
+    return val_rows, None
+
+
+def load_policy(path):
+    if path.endswith(".pt"):
+        from core.routers import load_router
+        return load_router(path)
+    from stable_baselines3 import PPO
+    return PPO.load(path, device="cpu")
+
+
+def policy_actions(policy, obs, idx, batch=4096):
+    out = np.empty(len(idx), dtype=np.int64)
+    for s in range(0, len(idx), batch):
+        chunk = idx[s:s + batch]
+        out[s:s + len(chunk)] = policy.predict(np.ascontiguousarray(obs[chunk]), deterministic=True)[0]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", default=POLICY_PATH, help="PPO .zip or distilled router .pt")
+    parser.add_argument("--output", default=GATE_PATH)
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args()
+
+    keys = [a.key for a in ACTIONS]
+    columns = sorted(set(metric_columns(MODEL_KEYS) + metric_columns(keys)))
+    data = read_profile_arrays(PROFILE_PATH, columns + ["width", "height"])
+    tier_conf, tier_lat, tier_count = stack_metrics(data, MODEL_KEYS)
+    megapixels = data["width"].astype(np.float64) * data["height"].astype(np.float64) / 1e6
+    n_rows = len(megapixels)
+
+    eval_rows, stored = evaluation_rows(n_rows)
+    fit_mask = np.ones(n_rows, dtype=bool)
+    fit_mask[eval_rows] = False
+    print(f"Fitting gate on {int(fit_mask.sum())} profile rows, evaluating on {len(eval_rows)} held-out rows …")
+    gate, fit_score = fit_gate(tier_conf[fit_mask], tier_lat[fit_mask], tier_count[fit_mask], megapixels[fit_mask],
+                               W_QUALITY, W_EFFICIENCY, n_quantiles=G["conf_quantiles"],
+                               density_quantiles=G["density_quantiles"])
+    print(f"  {gate}  (train score {fit_score:.4f})")
+
+    conf, lat, count = (m[eval_rows] for m in (tier_conf, tier_lat, tier_count))
+    tier_rewards, gate_rewards = tier_and_gate_rewards(conf, lat, count, W_QUALITY, W_EFFICIENCY)
+    tiers = list(MODEL_KEYS)
+    report = {"gate": gate.to_dict(), "eval_rows": int(len(eval_rows)), "strategies": {}}
+    strategies = report["strategies"]
+    for t, key in enumerate(MODEL_KEYS):
+        strategies[TIER_NAMES[key].lower()] = strategy_metrics(
+            conf, lat, count, np.full(len(eval_rows), t), tiers, tier_rewards)
+
+    grid_conf, grid_lat, grid_count = (m[eval_rows] for m in stack_metrics(data, keys))
+    grid = score_profile(grid_conf, grid_lat, grid_count, W_QUALITY, W_EFFICIENCY)
+    grid_tiers = [a.model for a in ACTIONS]
+    strategies["oracle"] = strategy_metrics(grid_conf, grid_lat, grid_count, grid.labels, grid_tiers, grid.rewards)
+
+    if stored is not None and os.path.exists(args.policy):
+        print(f"Replaying policy {args.policy} on the stored observations …")
+        obs, val_idx = stored
+        actions = policy_actions(load_policy(args.policy), obs, val_idx)
+        strategies["policy"] = strategy_metrics(grid_conf, grid_lat, grid_count, actions, grid_tiers, grid.rewards)
+    else:
+        print("No BC store or policy found — skipping the policy replay")
+
+    choice = gate.decide(conf[:, 0], count[:, 0], megapixels[eval_rows])
+    strategies["gate"] = strategy_metrics(*gate_outcomes(conf, lat, count), choice, tiers, gate_rewards)
+    strategies["gate"]["escalated_pct"] = round(float((choice > 0).mean()) * 100.0, 1)
+
+    large_q = strategies["large"]["quality"]
+    for s in strategies.values():
+        s["quality_vs_large_pct"] = round(s["quality"] / large_q * 100.0, 1) if large_q else None
+
+    print(f"\n=== GATING vs ROUTING ({len(eval_rows)} held-out rows) ===")
+    print(f"  {'strategy':<8} {'mean ms':>8} {'p95 ms':>8} {'conf':>6} {'count':>6} {'quality':>8} "
+          f"{'%Large':>7} {'reward':>7}   Nano/Small/Large %")
+    for name, s in strategies.items():
+        pct = s["tier_pct"]
+        print(f"  {name:<8} {s['latency_ms_mean']:>8.2f} {s['latency_ms_p95']:>8.2f} {s['mean_conf']:>6.3f} "
+              f"{s['mean_count']:>6.2f} {s['quality']:>8.4f} {s['quality_vs_large_pct']:>7.1f} "
+              f"{s.get('avg_reward', float('nan')):>7.4f}   "
+              f"{pct['Nano']:.0f}/{pct['Small']:.0f}/{pct['Large']:.0f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    save_gate(gate, args.output, {"train_score": round(fit_score, 4), "fit_rows": int(fit_mask.sum())})
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nGate → {args.output}\nReport → {args.report}")
+
+
+if __name__ == "__main__":
+    main()
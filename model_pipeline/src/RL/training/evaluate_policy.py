@@ -3,7 +3,8 @@ evaluate_policy.py — standalone policy evaluation for the DVC pipeline.
 
 Runs a 1000-step deterministic rollout on the trained PPO_v6 model,
 writes results to metrics.json, and exits non-zero if routing is unbalanced
-(any model used < 20% of the time).
+(any model used < 20% of the time).  With several profile.resolutions the
+shares are per YOLO variant, summed over its resolutions.
 
 Usage:
     python training/evaluate_policy.py
@@ -18,19 +19,20 @@ import json
 import yaml
 import numpy as np
 from stable_baselines3 import PPO
+from core.actions import MODEL_KEYS
 from core.environment import AdaptiveInferenceEnv
 
 with open(os.path.join(_RL_ROOT, "params.yaml")) as f:
     P = yaml.safe_load(f)
 
-CSV_PATH     = os.path.join(_RL_ROOT, P["paths"]["profile_csv"])
+PROFILE_PATH = os.path.join(_RL_ROOT, P["paths"]["profile"])
 MODEL_PATH   = os.path.join(_RL_ROOT, P["paths"]["final_model"])
 METRICS_PATH = os.path.join(_RL_ROOT, P["paths"]["metrics"])
 
 def main():
     print(f"Loading model: {MODEL_PATH}")
     model = PPO.load(MODEL_PATH, device="cpu")
-    env   = AdaptiveInferenceEnv(csv_path=CSV_PATH)
+    env   = AdaptiveInferenceEnv(profile_path=PROFILE_PATH)
 
     obs, _ = env.reset()
     acts, rewards = [], []
@@ -44,16 +46,22 @@ def main():
         if done:
             obs, _ = env.reset()
 
-    counts   = np.bincount(acts, minlength=3)
+    counts   = np.bincount(acts, minlength=env.n_actions)
+    tiers    = {k: 0 for k in MODEL_KEYS}
+    for action, n in zip(env.actions, counts):
+        tiers[action.model] += int(n)
     avg_rew  = float(np.mean(rewards))
-    pct_nano  = round(counts[0] / 10, 1)
-    pct_small = round(counts[1] / 10, 1)
-    pct_large = round(counts[2] / 10, 1)
+    pct_nano  = round(tiers["n"] / 10, 1)
+    pct_small = round(tiers["s"] / 10, 1)
+    pct_large = round(tiers["l"] / 10, 1)
 
     print(f"\n--- EVALUATION RESULTS ---")
-    print(f"Nano:  {counts[0]:4d}  ({pct_nano:.1f}%)")
-    print(f"Small: {counts[1]:4d}  ({pct_small:.1f}%)")
-    print(f"Large: {counts[2]:4d}  ({pct_large:.1f}%)")
+    if env.n_actions > len(MODEL_KEYS):
+        for action, n in zip(env.actions, counts):
+            print(f"{action.name + ':':<11} {n:4d}  ({n / 10:.1f}%)")
+    print(f"Nano:  {tiers['n']:4d}  ({pct_nano:.1f}%)")
+    print(f"Small: {tiers['s']:4d}  ({pct_small:.1f}%)")
+    print(f"Large: {tiers['l']:4d}  ({pct_large:.1f}%)")
     print(f"Avg Reward: {avg_rew:.4f}")
 
     metrics = {
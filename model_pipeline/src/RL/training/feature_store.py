@@ -0,0 +1,208 @@
+"""
+feature_store.py — parallel, cached observation extraction for BC training.
+
+Per-image features (1024 visual + 1 edge density) depend only on the image,
+so they are cached on disk under paths.feature_cache, keyed by image path and
+decode reduction.  build_observations() fills a preallocated (N, 1028) array:
+cache hits are copied in, misses are decoded on a thread pool (OpenCV releases
+the GIL while decoding/resizing) and appended to the cache for the next run.
+
+The BC dataset itself lives in a memory-mapped store (paths.bc_data_dir):
+    obs.npy      (N, 1028) float32 observations
+    actions.npy  (N,)      int64 optimal-action labels
+    rows.npy     (N,)      int64 row index of each sample in the profile
+MemmapBatchDataset serves whole mini-batches from it, so training memory does
+not grow with the number of samples.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from torch.utils.data import BatchSampler, DataLoader, Dataset, SubsetRandomSampler
+
+from core.features import FeatureExtractor
+
+IMAGE_FEATURE_DIM = 1025          # 1024 visual + 1 raw edge density
+OBS_DIM           = 1028
+NEUTRAL_METADATA  = np.array([0.0, 0.5, 0.0], dtype=np.float32)   # prev_action, prev_conf, pad
+_COPY_CHUNK       = 8192
+
+
+class FeatureCache:
+    """On-disk cache of per-image features: features.npy + paths.txt (same row order)."""
+
+    def __init__(self, cache_dir, reduction=1):
+        self.dir        = os.path.join(cache_dir, f"r{reduction}")
+        self.feat_path  = os.path.join(self.dir, "features.npy")
+        self.paths_path = os.path.join(self.dir, "paths.txt")
+        self._index     = None
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.paths_path) and os.path.exists(self.feat_path):
+                with open(self.paths_path) as f:
+                    self._index = {p.rstrip("\n"): i for i, p in enumerate(f)}
+        return self._index
+
+    def lookup(self, paths):
+        """Row in the cache for every path, or -1 if not cached."""
+        index = self._load_index()
+        return np.array([index.get(p, -1) for p in paths], dtype=np.int64)
+
+    def features(self):
+        return np.load(self.feat_path, mmap_mode="r")
+
+    def extend(self, paths, src, rows):
+        """
+        Append src[rows, :1025] for paths not yet cached. Copies in chunks
+        through memory maps so the cache can grow past available RAM.
+        """
+        if len(paths) == 0:
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        index = self._load_index()
+        old   = np.load(self.feat_path, mmap_mode="r") if index else None
+        n_old = 0 if old is None else len(old)
+
+        tmp = self.feat_path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32,
+                                        shape=(n_old + len(rows), IMAGE_FEATURE_DIM))
+        for s in range(0, n_old, _COPY_CHUNK):
+            e = min(s + _COPY_CHUNK, n_old)
+            out[s:e] = old[s:e]
+        for s in range(0, len(rows), _COPY_CHUNK):
+            chunk = rows[s:s + _COPY_CHUNK]
+            out[n_old + s:n_old + s + len(chunk)] = src[chunk, :IMAGE_FEATURE_DIM]
+        out.flush()
+        del out, old
+        os.replace(tmp, self.feat_path)
+
+        with open(self.paths_path, "a") as f:
+            f.writelines(p + "\n" for p in paths)
+        index.update({p: n_old + i for i, p in enumerate(paths)})
+
+
+def build_observations(paths, cache_dir, reduction=1, workers=8, out=None):
+    """
+    Returns (obs (N, 1028) float32, n_missing) for the given image paths.
+
+    The observation layout matches AdaptiveInferenceEnv._get_obs with a
+    neutral metadata prior. `out` may be a preallocated (e.g. memory-mapped)
+    array to write into.
+    """
+    n   = len(paths)
+    obs = out if out is not None else np.empty((n, OBS_DIM), dtype=np.float32)
+    obs[:, IMAGE_FEATURE_DIM:] = NEUTRAL_METADATA
+
+    cache = FeatureCache(cache_dir, reduction)
+    rows  = cache.lookup(paths)
+    hit   = np.flatnonzero(rows >= 0)
+    if len(hit):
+        order = np.argsort(rows[hit])                   # sequential reads from the memmap
+        obs[hit[order], :IMAGE_FEATURE_DIM] = cache.features()[rows[hit[order]]]
+    miss = np.flatnonzero(rows < 0)
+    print(f"Feature cache: {len(hit)} hits, {len(miss)} to extract "
+          f"({workers} workers, decode 1/{reduction}) …")
+
+    extractor = FeatureExtractor()
+    new_rows, missing = [], 0
+    t0 = time.perf_counter()
+    step = max(1, len(miss) // 10)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda p: extractor.extract_from_file(p, reduction),
+                           [paths[i] for i in miss])
+        for k, (i, res) in enumerate(zip(miss, results)):
+            if res is None:
+                obs[i, :IMAGE_FEATURE_DIM] = 0.0
+                missing += 1
+            else:
+                vis, edge = res
+                obs[i, :1024] = vis
+                obs[i, 1024]  = edge
+                new_rows.append(i)
+            if (k + 1) % step == 0:
+                print(f"  {k+1}/{len(miss)}  ({time.perf_counter() - t0:.1f}s)")
+
+    if new_rows:
+        cache.extend([paths[i] for i in new_rows], obs, np.asarray(new_rows))
+
+    # Edge density is stored raw; the observation uses it ×10 (see environment.py)
+    obs[:, 1024] *= 10.0
+    return obs, missing
+
+
+# ── Memory-mapped BC dataset store ───────────────────────────────────────────
+
+def create_store(store_dir, n):
+    """Preallocates obs.npy on disk and returns it as a writable memmap."""
+    os.makedirs(store_dir, exist_ok=True)
+    return np.lib.format.open_memmap(os.path.join(store_dir, "obs.npy"), mode="w+",
+                                     dtype=np.float32, shape=(n, OBS_DIM))
+
+
+def save_store_labels(store_dir, actions, rows):
+    np.save(os.path.join(store_dir, "actions.npy"), np.asarray(actions, dtype=np.int64))
+    np.save(os.path.join(store_dir, "rows.npy"),    np.asarray(rows,    dtype=np.int64))
+
+
+def load_store(store_dir):
+    """Returns (obs memmap (read-only), actions, rows)."""
+    obs = np.load(os.path.join(store_dir, "obs.npy"), mmap_mode="r")
+    return (obs,
+            np.load(os.path.join(store_dir, "actions.npy")),
+            np.load(os.path.join(store_dir, "rows.npy")))
+
+
+def split_indices(n, val_fraction, seed=42):
+    """Shuffled (train, val) row indices into the store, each sorted for sequential reads."""
+    perm  = np.random.default_rng(seed).permutation(n)
+    n_val = int(round(n * val_fraction)) if n > 1 else 0
+    return np.sort(perm[n_val:]), np.sort(perm[:n_val])
+
+
+class MemmapBatchDataset(Dataset):
+    """
+    Serves whole mini-batches from the store: __getitem__ takes a list of row
+    indices (from a BatchSampler) and does one sorted fancy-index read.
+
+    The memmap is opened lazily in each loader worker and never pickled.
+    """
+
+    def __init__(self, store_dir):
+        self.obs_path = os.path.join(store_dir, "obs.npy")
+        self.actions  = np.load(os.path.join(store_dir, "actions.npy"))
+        self._obs     = None
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_obs"] = None
+        return state
+
+    def __getitem__(self, idx):
+        if self._obs is None:
+            self._obs = np.load(self.obs_path, mmap_mode="r")
+        idx = np.sort(np.asarray(idx))
+        return (torch.from_numpy(np.ascontiguousarray(self._obs[idx])),
+                torch.from_numpy(self.actions[idx]))
+
+
+def make_loader(dataset, indices, batch_size, shuffle, workers=0, pin_memory=False):
+    """DataLoader over a subset of the store with prefetching worker processes."""
+    base    = SubsetRandomSampler(indices) if shuffle else list(indices)
+    sampler = BatchSampler(base, batch_size=batch_size, drop_last=False)
+    return DataLoader(
+        dataset,
+        sampler=sampler,
+        batch_size=None,                       # batches come from the sampler
+        num_workers=workers,
+        pin_memory=pin_memory,
+        prefetch_factor=4 if workers > 0 else None,
+        persistent_workers=workers > 0,
+    )
@@ -1,9 +1,11 @@
 """
 Behavioral Cloning pre-trainer for the adaptive inference policy.
 
-Generates (observation, optimal_action) pairs from the CSV dataset,
-trains a supervised MLP classifier, and saves weights in a format
-that can be loaded into a Stable Baselines3 PPO policy for fine-tuning.
+Generates (observation, optimal_action) pairs from the profile dataset into
+a memory-mapped store (paths.bc_data_dir), trains a supervised MLP classifier
+by streaming mini-batches from it with early stopping on a held-out split,
+and saves weights in a format that can be loaded into a Stable Baselines3
+PPO policy for fine-tuning.
 
 Usage:
     python training/pretrain_bc.py
@@ -14,18 +16,23 @@ _RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if _RL_ROOT not in sys.path:
     sys.path.insert(0, _RL_ROOT)
 
+import json
+import time
 import numpy as np
-import pandas as pd
-import cv2
 import torch
 import torch.nn as nn
 import yaml
-from torch.utils.data import DataLoader, TensorDataset
 from stable_baselines3 import PPO
 from stable_baselines3.common.vec_env import DummyVecEnv
 from stable_baselines3.common.monitor import Monitor
+from core.actions import DEFAULT_IMGSZ, MODEL_KEYS, TIER_NAMES, action_grid
 from core.environment import AdaptiveInferenceEnv
-from core.features import FeatureExtractor
+from core.profile_store import read_profile
+from core.scoring import stack_metrics, score_profile
+from training.feature_store import (
+    MemmapBatchDataset, build_observations, create_store, make_loader, save_store_labels,
+    split_indices,
+)
 
 # ─── Load params.yaml ─────────────────────────────────────────────────────────
 _params_path = os.path.join(_RL_ROOT, "params.yaml")
@@ -37,64 +44,71 @@ BC_EPOCHS         = _P["bc"]["epochs"]
 BC_LR             = _P["bc"]["lr"]
 BC_BATCH          = _P["bc"]["batch_size"]
 HIDDEN_DIM        = _P["bc"]["hidden_dim"]
+BC_WORKERS        = _P["bc"]["num_workers"]
+DECODE_REDUCTION  = _P["bc"]["decode_reduction"]
+VAL_FRACTION      = _P["bc"]["val_fraction"]
+PATIENCE          = _P["bc"]["patience"]
+LOADER_WORKERS    = _P["bc"]["loader_workers"]
+BC_DEVICE         = _P["bc"]["device"]
 RL_FINETUNE_STEPS = _P["ppo"]["finetune_steps"]
-CSV_PATH          = os.path.join(_RL_ROOT, _P["paths"]["profile_csv"])
+PROFILE_PATH      = os.path.join(_RL_ROOT, _P["paths"]["profile"])
 MODELS_DIR        = os.path.join(_RL_ROOT, _P["paths"]["model_dir"])
 LOG_DIR           = os.path.join(_RL_ROOT, _P["paths"]["log_dir"])
+FEATURE_CACHE     = os.path.join(_RL_ROOT, _P["paths"]["feature_cache"])
+BC_DATA_DIR       = os.path.join(_RL_ROOT, _P["paths"]["bc_data_dir"])
 W_QUALITY         = _P["reward"]["w_quality"]
 W_EFFICIENCY      = _P["reward"]["w_efficiency"]
 METRICS_PATH      = os.path.join(_RL_ROOT, _P["paths"]["metrics"])
+ACTIONS           = action_grid(_P["profile"].get("resolutions", [DEFAULT_IMGSZ]))
+N_ACTIONS         = len(ACTIONS)
 # ──────────────────────────────────────────────────────────────────────────────
 
 
-def get_optimal_action(row):
-    confs  = [row['n_conf'],  row['s_conf'],  row['l_conf']]
-    lats   = [row['n_time'],  row['s_time'],  row['l_time']]
-    counts = [row['n_count'], row['s_count'], row['l_count']]
-    quality    = [confs[a] * np.sqrt(counts[a] + 1) for a in range(3)]
-    efficiency = [quality[a] / (lats[a] + 1e-8)     for a in range(3)]
-    q_max   = max(quality)    + 1e-8
-    eff_max = max(efficiency) + 1e-8
-    scores  = [W_QUALITY * (quality[a] / q_max) + W_EFFICIENCY * (efficiency[a] / eff_max) for a in range(3)]
-    return int(np.argmax(scores))
-
-
-def build_dataset(df, n_samples=SAMPLE_ROWS):
-    extractor = FeatureExtractor()
-    sampled   = df.sample(min(n_samples, len(df)), random_state=42).reset_index(drop=True)
-
-    obs_list    = []
-    action_list = []
-    missing     = 0
+def build_dataset(df, n_samples=SAMPLE_ROWS, store_dir=BC_DATA_DIR):
+    """
+    Writes observations straight into <store_dir>/obs.npy (memory-mapped) and
+    saves labels + profile row indices next to it. Returns the action labels.
+    """
+    sampled = df.sample(min(n_samples, len(df)), random_state=42)
+    rows    = sampled.index.to_numpy()
+    paths   = list(sampled["path"].astype(str))
 
     print(f"Extracting observations from {len(sampled)} images …")
-    for i, row in sampled.iterrows():
-        if i % 2000 == 0:
-            print(f"  {i}/{len(sampled)}")
-
-        if os.path.exists(row['path']):
-            frame    = cv2.imread(row['path'])
-            vis_feats = extractor.get_visual_features(frame).flatten()   # 1024
-            edge_val  = float(np.atleast_1d(extractor.get_edge_density(frame))[0])
-        else:
-            vis_feats = np.zeros(1024, dtype=np.float32)
-            edge_val  = 0.0
-            missing += 1
-
-        scaled_edge = np.array([edge_val * 10.0], dtype=np.float32)
-        metadata    = np.array([0.0, 0.5, 0.0], dtype=np.float32)   # neutral prior
-        obs = np.concatenate([vis_feats, scaled_edge, metadata]).astype(np.float32)
-
-        obs_list.append(obs)
-        action_list.append(get_optimal_action(row))
-
-    print(f"Done. Missing images: {missing}/{len(sampled)}")
-    return np.stack(obs_list), np.array(action_list, dtype=np.int64)
+    t0  = time.perf_counter()
+    obs = create_store(store_dir, len(sampled))
+    _, missing = build_observations(paths, FEATURE_CACHE, reduction=DECODE_REDUCTION,
+                                    workers=BC_WORKERS, out=obs)
+    obs.flush()
+    del obs
+    keys    = [a.key for a in ACTIONS]
+    actions = score_profile(*stack_metrics(sampled, keys), W_QUALITY, W_EFFICIENCY).labels
+    save_store_labels(store_dir, actions, rows)
+
+    print(f"Done in {time.perf_counter() - t0:.1f}s. Missing images: {missing}/{len(sampled)}")
+    return actions
+
+
+def print_distribution(counts, total):
+    """Share of each action, then per tier when the grid has several resolutions."""
+    total = max(int(total), 1)
+    for action, n in zip(ACTIONS, counts):
+        print(f"  {action.name + ':':<11} {n} ({n/total*100:.1f}%)")
+    if N_ACTIONS > len(MODEL_KEYS):
+        for key, n in tier_counts(counts).items():
+            print(f"  {TIER_NAMES[key] + ' (all):':<11} {n} ({n/total*100:.1f}%)")
+
+
+def tier_counts(counts):
+    """Action histogram summed per YOLO variant over resolutions."""
+    out = {k: 0 for k in MODEL_KEYS}
+    for action, n in zip(ACTIONS, counts):
+        out[action.model] += int(n)
+    return out
 
 
 class BCPolicy(nn.Module):
     """Mirrors the MlpPolicy architecture SB3 uses by default."""
-    def __init__(self, obs_dim=1028, n_actions=3, hidden=HIDDEN_DIM):
+    def __init__(self, obs_dim=1028, n_actions=N_ACTIONS, hidden=HIDDEN_DIM):
         super().__init__()
         self.net = nn.Sequential(
             nn.Linear(obs_dim, hidden), nn.Tanh(),
@@ -106,47 +120,88 @@ class BCPolicy(nn.Module):
         return self.net(x)
 
 
-def train_bc(obs, actions):
-    X = torch.FloatTensor(obs)
-    y = torch.LongTensor(actions)
+def run_epoch(model, loader, crit, device, opt=None):
+    """
+    One pass over `loader`; trains when `opt` is given, evaluates otherwise.
+    Returns (mean loss, accuracy %, predicted-action histogram).
+    """
+    model.train(opt is not None)
+    total_loss, correct, seen = 0.0, 0, 0
+    hist = np.zeros(N_ACTIONS, dtype=np.int64)
+    with torch.set_grad_enabled(opt is not None):
+        for xb, yb in loader:
+            xb = xb.to(device, non_blocking=True)
+            yb = yb.to(device, non_blocking=True)
+            logits = model(xb)
+            loss   = crit(logits, yb)
+            if opt is not None:
+                opt.zero_grad()
+                loss.backward()
+                opt.step()
+            preds       = logits.argmax(dim=1)
+            total_loss += loss.item() * len(yb)
+            correct    += (preds == yb).sum().item()
+            seen       += len(yb)
+            hist       += np.bincount(preds.cpu().numpy(), minlength=N_ACTIONS)
+    if seen == 0:
+        return float("nan"), 0.0, hist
+    return total_loss / seen, correct / seen * 100, hist
+
 
-    dataset    = TensorDataset(X, y)
-    dataloader = DataLoader(dataset, batch_size=BC_BATCH, shuffle=True)
+def train_bc(store_dir=BC_DATA_DIR):
+    """
+    Streams mini-batches from the memory-mapped store, validates every epoch,
+    stops after PATIENCE epochs without val-loss improvement and restores the
+    best weights (also saved to models_dir/bc_best.pt).
 
-    model   = BCPolicy()
+    Returns (model, best val accuracy %).
+    """
+    device  = torch.device(BC_DEVICE if BC_DEVICE != "cuda" or torch.cuda.is_available() else "cpu")
+    pin     = device.type == "cuda"
+    dataset = MemmapBatchDataset(store_dir)
+    train_idx, val_idx = split_indices(len(dataset), VAL_FRACTION)
+    if len(val_idx) == 0:
+        val_idx = train_idx
+    train_loader = make_loader(dataset, train_idx, BC_BATCH, shuffle=True,
+                               workers=LOADER_WORKERS, pin_memory=pin)
+    val_loader   = make_loader(dataset, val_idx, BC_BATCH, shuffle=False,
+                               workers=LOADER_WORKERS, pin_memory=pin)
+
+    model   = BCPolicy().to(device)
     opt     = torch.optim.Adam(model.parameters(), lr=BC_LR)
     crit    = nn.CrossEntropyLoss()
     sched   = torch.optim.lr_scheduler.CosineAnnealingLR(opt, T_max=BC_EPOCHS)
+    ckpt    = os.path.join(MODELS_DIR, "bc_best.pt")
 
-    print(f"\nTraining BC classifier for {BC_EPOCHS} epochs …")
+    best_loss, best_acc, best_epoch, stale = float("inf"), 0.0, 0, 0
+    best_hist = np.zeros(N_ACTIONS, dtype=np.int64)
+    print(f"\nTraining BC classifier (≤{BC_EPOCHS} epochs, patience {PATIENCE}) on "
+          f"{len(train_idx)} train / {len(val_idx)} val samples, {device} …")
     for epoch in range(BC_EPOCHS):
-        model.train()
-        total_loss = 0
-        correct    = 0
-        for xb, yb in dataloader:
-            logits = model(xb)
-            loss   = crit(logits, yb)
-            opt.zero_grad()
-            loss.backward()
-            opt.step()
-            total_loss += loss.item() * len(yb)
-            correct    += (logits.argmax(dim=1) == yb).sum().item()
-
+        tr_loss, tr_acc, _        = run_epoch(model, train_loader, crit, device, opt)
+        val_loss, val_acc, v_hist = run_epoch(model, val_loader,   crit, device)
         sched.step()
-        if epoch % 5 == 0 or epoch == BC_EPOCHS - 1:
-            acc = correct / len(dataset) * 100
-            print(f"  Epoch {epoch+1:3d}/{BC_EPOCHS}  loss={total_loss/len(dataset):.4f}  acc={acc:.1f}%")
+        print(f"  Epoch {epoch+1:3d}/{BC_EPOCHS}  loss={tr_loss:.4f}  acc={tr_acc:.1f}%  "
+              f"val_loss={val_loss:.4f}  val_acc={val_acc:.1f}%")
 
-    # Action distribution on training set
-    model.eval()
-    with torch.no_grad():
-        preds = model(X).argmax(dim=1).numpy()
-    counts = np.bincount(preds, minlength=3)
-    print(f"\nBC prediction distribution:")
-    print(f"  Nano:  {counts[0]} ({counts[0]/len(preds)*100:.1f}%)")
-    print(f"  Small: {counts[1]} ({counts[1]/len(preds)*100:.1f}%)")
-    print(f"  Large: {counts[2]} ({counts[2]/len(preds)*100:.1f}%)")
-    return model
+        if val_loss < best_loss:
+            best_loss, best_acc, best_epoch, stale = val_loss, val_acc, epoch + 1, 0
+            best_hist = v_hist
+            torch.save(model.state_dict(), ckpt)
+        else:
+            stale += 1
+            if stale >= PATIENCE:
+                print(f"  Early stop: no val-loss improvement for {PATIENCE} epochs")
+                break
+
+    model.load_state_dict(torch.load(ckpt, map_location=device))
+    model.to("cpu").eval()
+    print(f"Best epoch {best_epoch}: val_loss={best_loss:.4f}  val_acc={best_acc:.1f}%  → {ckpt}")
+
+    # Action distribution on the validation split (collected during the best epoch)
+    print(f"\nBC prediction distribution (val):")
+    print_distribution(best_hist, best_hist.sum())
+    return model, best_acc
 
 
 def inject_bc_weights(bc_model: BCPolicy, ppo: PPO):
@@ -184,21 +239,20 @@ def main():
     os.makedirs(LOG_DIR,    exist_ok=True)
 
     # ── Step 1: Build BC dataset ──────────────────────────────────────────────
-    df  = pd.read_csv(CSV_PATH)
-    obs, actions = build_dataset(df)
+    df  = read_profile(PROFILE_PATH)
+    actions = build_dataset(df)
+    del df
 
-    label_counts = np.bincount(actions, minlength=3)
+    label_counts = np.bincount(actions, minlength=N_ACTIONS)
     print(f"\nGround-truth label distribution:")
-    print(f"  Nano:  {label_counts[0]} ({label_counts[0]/len(actions)*100:.1f}%)")
-    print(f"  Small: {label_counts[1]} ({label_counts[1]/len(actions)*100:.1f}%)")
-    print(f"  Large: {label_counts[2]} ({label_counts[2]/len(actions)*100:.1f}%)")
+    print_distribution(label_counts, len(actions))
 
     # ── Step 2: Train BC classifier ───────────────────────────────────────────
-    bc_model = train_bc(obs, actions)
+    bc_model, bc_acc = train_bc()
 
     # ── Step 3: Create PPO and inject weights ─────────────────────────────────
     print("\nBuilding PPO shell …")
-    raw_env = AdaptiveInferenceEnv(csv_path=CSV_PATH)
+    raw_env = AdaptiveInferenceEnv(profile_path=PROFILE_PATH)
     env     = Monitor(raw_env, LOG_DIR)
     env     = DummyVecEnv([lambda: env])
 
@@ -218,7 +272,7 @@ def main():
     inject_bc_weights(bc_model, ppo)
 
     # Quick sanity check: run 500 deterministic steps
-    env2    = AdaptiveInferenceEnv(csv_path=CSV_PATH)
+    env2    = AdaptiveInferenceEnv(profile_path=PROFILE_PATH)
     obs_env, _ = env2.reset()
     acts    = []
     for _ in range(500):
@@ -228,11 +282,9 @@ def main():
         if done:
             obs_env, _ = env2.reset()
 
-    counts = np.bincount(acts, minlength=3)
+    counts = np.bincount(acts, minlength=N_ACTIONS)
     print(f"\nPost-BC-inject policy (500 steps, deterministic):")
-    print(f"  Nano:  {counts[0]} ({counts[0]/5:.1f}%)")
-    print(f"  Small: {counts[1]} ({counts[1]/5:.1f}%)")
-    print(f"  Large: {counts[2]} ({counts[2]/5:.1f}%)")
+    print_distribution(counts, len(acts))
 
     # ── Step 4: Fine-tune with PPO ────────────────────────────────────────────
     print(f"\nFine-tuning with PPO ({RL_FINETUNE_STEPS:,} steps) …")
@@ -244,7 +296,7 @@ def main():
     print(f"\nSaved to {out_path}")
 
     # Final evaluation
-    env3    = AdaptiveInferenceEnv(csv_path=CSV_PATH)
+    env3    = AdaptiveInferenceEnv(profile_path=PROFILE_PATH)
     obs3, _ = env3.reset()
     acts3   = []
     rewards3 = []
@@ -256,23 +308,24 @@ def main():
         if done:
             obs3, _ = env3.reset()
 
-    counts3 = np.bincount(acts3, minlength=3)
+    counts3 = np.bincount(acts3, minlength=N_ACTIONS)
+    tiers3  = tier_counts(counts3)
     avg_rew = float(np.mean(rewards3))
     print(f"\n=== FINAL EVALUATION (1000 steps) ===")
-    print(f"  Nano:  {counts3[0]} ({counts3[0]/10:.1f}%)")
-    print(f"  Small: {counts3[1]} ({counts3[1]/10:.1f}%)")
-    print(f"  Large: {counts3[2]} ({counts3[2]/10:.1f}%)")
+    print_distribution(counts3, len(acts3))
     print(f"  Avg Reward: {avg_rew:.4f}")
 
     # ── Write DVC metrics ─────────────────────────────────────────────────────
-    import json
+    # Tier shares sum over resolutions, so they stay comparable across grids
     metrics = {
         "avg_reward":   round(avg_rew, 4),
-        "pct_nano":     round(counts3[0] / 10, 1),
-        "pct_small":    round(counts3[1] / 10, 1),
-        "pct_large":    round(counts3[2] / 10, 1),
-        "bc_accuracy":  None,   # populated during train_bc if needed
+        "pct_nano":     round(tiers3["n"] / 10, 1),
+        "pct_small":    round(tiers3["s"] / 10, 1),
+        "pct_large":    round(tiers3["l"] / 10, 1),
+        "bc_accuracy":  round(bc_acc, 2),   # best held-out accuracy (%)
     }
+    if N_ACTIONS > len(MODEL_KEYS):
+        metrics["pct_actions"] = {a.name: round(float(n) / 10, 1) for a, n in zip(ACTIONS, counts3)}
     with open(METRICS_PATH, "w") as mf:
         json.dump(metrics, mf, indent=2)
     print(f"Metrics written to {METRICS_PATH}")
@@ -1,15 +1,78 @@
+"""
+profile_models.py — sharded, resumable YOLO profiling for the RL dataset.
+
+Profiling runs in two passes:
+
+  1. Accuracy pass — splits the COCO training list into N contiguous shards
+     and profiles each shard in its own worker process (torch threads + CPU
+     affinity pinned per worker).  Images go through each YOLO variant at
+     each of profile.resolutions (the (model, resolution) action grid of
+     core/actions.py) in batches of profile.batch_size to record confidence
+     and detection count.
+     Every batch is appended to profiles/shard_<i>.csv immediately, and a
+     restarted shard skips the paths it already wrote.
+
+  2. Calibration pass (merge step) — concatenates the shards in split order,
+     measures batch-1 latency on a subsample stratified by image size and
+     object count, fits a per-model linear latency model
+         time ≈ b0 + b1 · megapixels + b2 · count
+     and uses it to fill the *_time columns of model_performance_profile.arrow
+     (typed Arrow IPC, see core/profile_store.py).  Coefficients are written
+     to profiles/latency_model.json, one fit per action.
+
+Columns are n_conf, n_time, … at 640 (the legacy layout) and n320_conf, … for
+other resolutions, so profiling only [640] reproduces the old profile.
+
+Usage:
+    python training/profile_models.py                            # all shards in parallel, then merge
+    python training/profile_models.py --shard 2 --num-shards 4   # a single shard (DVC foreach stage)
+    python training/profile_models.py --merge                    # merge existing shard files only
+"""
 import sys
 import os
 _RL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if _RL_ROOT not in sys.path:
     sys.path.insert(0, _RL_ROOT)
 
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import time
+
 import cv2
 import torch
-import time
-import pandas as pd
 import numpy as np
+import pandas as pd
+import yaml
 from ultralytics import YOLO
+from core.actions import DEFAULT_IMGSZ, MODEL_KEYS, action_grid, metric_columns
+from core.profile_store import write_profile
+
+# ─── Load params.yaml ─────────────────────────────────────────────────────────
+with open(os.path.join(_RL_ROOT, "params.yaml")) as _f:
+    _P = yaml.safe_load(_f)
+
+DEVICE            = _P["profile"]["device"]
+SHARDS            = _P["profile"]["shards"]
+NUM_SHARDS        = len(SHARDS)
+THREADS_PER_SHARD = _P["profile"]["threads_per_shard"]
+SHARD_DIR         = os.path.join(_RL_ROOT, _P["profile"]["shard_dir"])
+BATCH_SIZE        = _P["profile"]["batch_size"]
+CALIB_SAMPLES     = _P["profile"]["calibration_samples"]
+CALIB_REPEATS     = _P["profile"]["calibration_repeats"]
+RESOLUTIONS       = _P["profile"].get("resolutions", [DEFAULT_IMGSZ])
+LATENCY_MODEL     = os.path.join(SHARD_DIR, "latency_model.json")
+OUTPUT_PATH       = os.path.join(_RL_ROOT, _P["paths"]["profile"])
+# ──────────────────────────────────────────────────────────────────────────────
+if SHARDS != list(range(NUM_SHARDS)):
+    raise ValueError(f"profile.shards must be 0 … N-1 in order, got {SHARDS}")
+
+ACTIONS = action_grid(RESOLUTIONS)
+# Shard files hold accuracy-pass results only; *_time is filled at merge time.
+FIELDNAMES = ["path", "width", "height"] + [f"{a.key}_{m}" for a in ACTIONS for m in ("conf", "count")]
+OUTPUT_COLUMNS = ["path", "width", "height"] + metric_columns([a.key for a in ACTIONS])
+
 
 def get_project_paths():
     """
@@ -26,69 +89,267 @@ def get_project_paths():
 
     return project_root, data_dir, split_file
 
-def profile_dataset():
+
+def load_split(split_file):
+    with open(split_file, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def shard_bounds(total, shard, num_shards):
+    """Contiguous [start, stop) slice for one shard, so merged output keeps split order."""
+    base, extra = divmod(total, num_shards)
+    start = shard * base + min(shard, extra)
+    stop  = start + base + (1 if shard < extra else 0)
+    return start, stop
+
+
+def shard_path(shard):
+    return os.path.join(SHARD_DIR, f"shard_{shard}.csv")
+
+
+def _failure_row(img_path):
+    """Marker row for an unreadable image (width = height = 0), so a resumed shard skips it."""
+    row = dict.fromkeys(FIELDNAMES, 0)
+    row["path"] = img_path
+    return row
+
+
+def _load_done_paths(path):
+    """
+    Return the set of image paths already profiled in a shard file,
+    including unreadable images recorded by _failure_row().
+
+    A worker killed mid-write can leave a truncated last line; any malformed
+    rows are dropped and the file is rewritten so appends stay well-formed.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    if not rows or rows[0] != FIELDNAMES:
+        os.remove(path)
+        return set()
+
+    good = [r for r in rows[1:] if len(r) == len(FIELDNAMES) and all(r)]
+    if len(good) != len(rows) - 1:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDNAMES)
+            writer.writerows(good)
+    return {r[0] for r in good}
+
+
+def _pin_threads(shard, threads):
+    """Give each worker a fixed thread count and a disjoint set of cores."""
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    if hasattr(os, "sched_setaffinity"):
+        n_cpus = os.cpu_count() or 1
+        cores  = {(shard * threads + i) % n_cpus for i in range(threads)}
+        os.sched_setaffinity(0, cores)
+
+
+def _summarize(result):
+    boxes = result.boxes
+    if len(boxes) > 0:
+        return float(torch.mean(boxes.conf)), len(boxes)
+    return 0.0, 0
+
+
+def _load_models(device):
+    return {k: YOLO(f"yolov8{k}.pt").to(device) for k in MODEL_KEYS}
+
+
+def profile_shard(shard, num_shards, threads=THREADS_PER_SHARD, device=DEVICE,
+                  batch_size=BATCH_SIZE):
+    """Accuracy pass over one shard: batched conf/count, appended per batch."""
+    _pin_threads(shard, threads)
     root, data_dir, split_file = get_project_paths()
 
-    print(f"Project Root Detected: {root}")
-    print(f"Targeting Split File: {split_file}")
+    lines = load_split(split_file)
+    start, stop = shard_bounds(len(lines), shard, num_shards)
+    lines = lines[start:stop]
 
-    if not os.path.exists(split_file):
-        print(f"ERROR: Could not find {split_file}")
-        print("Please ensure your 'Data-Pipeline' folder is in the project root.")
-        return
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    out_path = shard_path(shard)
+    done     = _load_done_paths(out_path)
+    todo     = [p for p in lines if os.path.join(data_dir, p) not in done]
 
-    # Load Models onto CPU (Safe for RTX 5060 mismatch)
-    print("Loading YOLO models...")
-    models = {
-        'n': YOLO("yolov8n.pt").to('cpu'),
-        's': YOLO("yolov8s.pt").to('cpu'),
-        'l': YOLO("yolov8l.pt").to('cpu')
-    }
+    tag = f"[Shard {shard}/{num_shards}]"
+    print(f"{tag} images {start}–{stop}: {len(done)} already profiled, {len(todo)} remaining")
+    if not todo:
+        return out_path
 
-    with open(split_file, 'r') as f:
-        lines = [line.strip() for line in f.readlines() if line.strip()]
+    models = _load_models(device)
+
+    new_file = not os.path.exists(out_path)
+    with open(out_path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if new_file:
+            writer.writeheader()
+
+        for b in range(0, len(todo), batch_size):
+            rows, frames, failed = [], [], []
+            for relative_path in todo[b:b + batch_size]:
+                img_path = os.path.join(data_dir, relative_path)
+                frame = cv2.imread(img_path)
+                if frame is None:
+                    print(f"{tag} Warning: Could not read image at {img_path}")
+                    failed.append(_failure_row(img_path))
+                    continue
+                rows.append({'path': img_path, 'width': frame.shape[1], 'height': frame.shape[0]})
+                frames.append(frame)
+            if not frames:
+                writer.writerows(failed)
+                f.flush()
+                continue
+
+            for action in ACTIONS:
+                model = models[action.model]
+                for row, res in zip(rows, model(frames, imgsz=action.imgsz, verbose=False)):
+                    row[f'{action.key}_conf'], row[f'{action.key}_count'] = _summarize(res)
+
+            writer.writerows(rows + failed)
+            f.flush()
 
-    results = []
-    total = len(lines)
-    print(f"Profiling {total} images. This measures actual CPU latency on your G14.")
+            n_done = min(b + batch_size, len(todo))
+            if n_done % (batch_size * 10) < batch_size or n_done == len(todo):
+                print(f"{tag} Progress: {n_done}/{len(todo)} profiled...")
 
-    for i, relative_path in enumerate(lines):
-        img_path = os.path.join(data_dir, relative_path)
+    print(f"{tag} done → {out_path}")
+    return out_path
+
+
+def _stratified_sample(df, n_samples, n_bins=4, seed=42):
+    """Equal draws from each (image-size quartile × object-count quartile) cell."""
+    pixels = df["width"] * df["height"]
+    count  = df[[f"{a.key}_count" for a in ACTIONS]].max(axis=1)
+    strata = (pd.qcut(pixels.rank(method="first"), n_bins, labels=False) * n_bins
+              + pd.qcut(count.rank(method="first"), n_bins, labels=False))
+    per_cell = max(1, n_samples // (n_bins * n_bins))
+    return (df.groupby(strata, group_keys=False)
+              .apply(lambda g: g.sample(min(per_cell, len(g)), random_state=seed)))
+
+
+def _design_matrix(megapixels, count):
+    return np.column_stack([np.ones_like(megapixels), megapixels, count])
+
+
+def calibrate_latency(df, n_samples=CALIB_SAMPLES, repeats=CALIB_REPEATS,
+                      threads=THREADS_PER_SHARD, device=DEVICE):
+    """
+    Measure batch-1 latency on a stratified subsample and fit, per action
+    (model at one resolution),
+    time ≈ b0 + b1 · megapixels + b2 · count  by least squares.
+
+    Returns {action_key: {"coef": [b0, b1, b2], "r2": float, "min_time": float}}.
+    """
+    _pin_threads(0, threads)
+    sample = _stratified_sample(df, n_samples)
+    models = _load_models(device)
+    print(f"Calibrating latency on {len(sample)} stratified images × {repeats} repeats …")
 
-        frame = cv2.imread(img_path)
-        if frame is None:
-            print(f"Warning: Could not read image at {img_path}")
-            continue
+    frames = [cv2.imread(p) for p in sample["path"]]
+    keep   = [i for i, fr in enumerate(frames) if fr is not None]
+    frames = [frames[i] for i in keep]
+    sample = sample.iloc[keep]
+    mp_col = (sample["width"] * sample["height"] / 1e6).to_numpy(dtype=np.float64)
 
-        row = {'path': img_path}
+    latency_model = {}
+    for action in ACTIONS:
+        name, model, imgsz = action.key, models[action.model], action.imgsz
+        for _ in range(3):                              # warm-up
+            model(frames[0], imgsz=imgsz, verbose=False)
+        times = []
+        for frame in frames:
+            runs = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                model(frame, imgsz=imgsz, verbose=False)
+                runs.append(time.perf_counter() - t0)
+            times.append(float(np.median(runs)))
+        times = np.asarray(times)
 
-        for name, model in models.items():
-            start = time.perf_counter()
-            res = model(frame, verbose=False)
-            latency = time.perf_counter() - start
+        X = _design_matrix(mp_col, sample[f"{name}_count"].to_numpy(dtype=np.float64))
+        coef, *_ = np.linalg.lstsq(X, times, rcond=None)
+        resid = times - X @ coef
+        r2 = 1.0 - float(resid @ resid) / max(float(((times - times.mean()) ** 2).sum()), 1e-12)
+        latency_model[name] = {"coef": coef.tolist(), "r2": round(r2, 4),
+                               "min_time": float(times.min())}
+        print(f"  {action.name}: time = {coef[0]*1e3:.2f} ms + {coef[1]*1e3:.2f} ms/MP "
+              f"+ {coef[2]*1e3:.3f} ms/object   (R² = {r2:.3f})")
+    return latency_model
+
+
+def apply_latency_model(df, latency_model):
+    """Populate the *_time columns from a fitted latency model."""
+    megapixels = (df["width"] * df["height"] / 1e6).to_numpy(dtype=np.float64)
+    for name, fit in latency_model.items():
+        X = _design_matrix(megapixels, df[f"{name}_count"].to_numpy(dtype=np.float64))
+        # Never predict below the fastest measured call
+        df[f"{name}_time"] = np.maximum(X @ np.asarray(fit["coef"]), fit["min_time"])
+    return df
+
+
+def merge_shards(num_shards=NUM_SHARDS, output_path=OUTPUT_PATH):
+    """Concatenate shard files (in split order), calibrate latency, and write the profile."""
+    frames = []
+    for shard in range(num_shards):
+        path = shard_path(shard)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Missing shard file: {path} — run shard {shard} first")
+        frames.append(pd.read_csv(path))
+
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="path", keep="last")
+    df = df[df["width"] > 0].reset_index(drop=True)      # drop unreadable-image markers
+
+    latency_model = calibrate_latency(df)
+    with open(LATENCY_MODEL, "w") as f:
+        json.dump(latency_model, f, indent=2)
+    df = apply_latency_model(df, latency_model)
+
+    _, data_dir, _ = get_project_paths()
+    write_profile(df[OUTPUT_COLUMNS], output_path, image_root=data_dir)
+    print(f"Merged {num_shards} shards ({len(df)} rows) → {output_path}")
+    return output_path
+
+
+def profile_dataset(num_shards=NUM_SHARDS, threads=THREADS_PER_SHARD, device=DEVICE):
+    root, data_dir, split_file = get_project_paths()
+
+    print(f"Project Root Detected: {root}")
+    print(f"Targeting Split File: {split_file}")
+
+    if not os.path.exists(split_file):
+        print(f"ERROR: Could not find {split_file}")
+        print("Please ensure your 'Data-Pipeline' folder is in the project root.")
+        return
 
-            if len(res[0].boxes) > 0:
-                conf = float(torch.mean(res[0].boxes.conf))
-                count = len(res[0].boxes)
-            else:
-                conf, count = 0.0, 0
+    print(f"Profiling with {num_shards} worker processes × {threads} threads on {device} …")
+    # spawn: each worker gets a fresh torch runtime with its own thread pool
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(processes=num_shards) as pool:
+        pool.starmap(profile_shard, [(s, num_shards, threads, device) for s in range(num_shards)])
 
-            row[f'{name}_conf'] = conf
-            row[f'{name}_time'] = latency
-            row[f'{name}_count'] = count
+    merge_shards(num_shards)
 
-        results.append(row)
 
-        if (i + 1) % 50 == 0:
-            print(f"Progress: {i+1}/{total} profiled...")
+def main():
+    parser = argparse.ArgumentParser(description="Sharded two-pass YOLO n/s/l × resolution profiling")
+    parser.add_argument("--shard", type=int, default=None, help="profile only this shard index")
+    parser.add_argument("--num-shards", type=int, default=NUM_SHARDS)
+    parser.add_argument("--merge", action="store_true",
+                        help="merge existing shard files, calibrate latency, and exit")
+    args = parser.parse_args()
 
-    # Save CSV to RL root so train_rl.py can find it
-    output_path = os.path.join(_RL_ROOT, "model_performance_profile.csv")
-    df = pd.DataFrame(results)
-    df.to_csv(output_path, index=False)
+    if args.merge:
+        merge_shards(args.num_shards)
+    elif args.shard is not None:
+        profile_shard(args.shard, args.num_shards)
+    else:
+        profile_dataset(args.num_shards)
 
-    print(f"\nSUCCESS! Profile saved to: {output_path}")
-    print("You can now use this CSV to train your RL agent 100x faster.")
 
 if __name__ == "__main__":
-    profile_dataset()
+    main()
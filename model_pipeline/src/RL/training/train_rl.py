@@ -10,13 +10,13 @@ from stable_baselines3 import PPO
 from stable_baselines3.common.callbacks import CheckpointCallback
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.vec_env import DummyVecEnv
-from core.environment import AdaptiveInferenceEnv
+from core.environment import AdaptiveInferenceEnv, WindowedInferenceEnv
 
 def train():
     with open(os.path.join(_RL_ROOT, "params.yaml")) as f:
         P = yaml.safe_load(f)
 
-    csv_path   = os.path.join(_RL_ROOT, P["paths"]["profile_csv"])
+    profile    = os.path.join(_RL_ROOT, P["paths"]["profile"])
     models_dir = os.path.join(_RL_ROOT, "models", "PPO_v5")
     log_dir    = os.path.join(_RL_ROOT, P["paths"]["log_dir"])
 
@@ -24,7 +24,11 @@ def train():
     os.makedirs(log_dir, exist_ok=True)
 
     print(f"Initializing Environment (Aggressive 10.0 Alpha / 1031-dim)...")
-    raw_env = AdaptiveInferenceEnv(csv_path=csv_path)
+    if P.get("window", {}).get("obs_mode", "frame") == "window":
+        # Policy for the engine's window mode (serve with ROUTING_MODE=window)
+        raw_env = WindowedInferenceEnv(profile_path=profile, window_size=P["window"]["size"])
+    else:
+        raw_env = AdaptiveInferenceEnv(profile_path=profile)
     env = Monitor(raw_env, log_dir)
     env = DummyVecEnv([lambda: env])
 
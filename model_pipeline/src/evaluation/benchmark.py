@@ -1,12 +1,34 @@
+"""
+Per-model YOLO latency benchmark.
+
+Frames are decoded into memory before timing, so measurements cover
+model.predict() on in-memory arrays only (no disk reads or JPEG decode).
+Every configuration gets warmup runs before its timed runs, and results are
+reported as full distributions: mean ± confidence interval, stddev, p50/p90/p99
+(p50/p99 with bootstrap confidence intervals), plus the preprocess / inference
+/ postprocess split from Ultralytics' per-result `speed` dict.
+
+Two sections per model:
+  summary      batch size 1, every image repeated `repeats_per_image` times,
+               overall and per complexity bucket (simple / moderate / complex)
+  batch_sweep  every (batch size, thread count) in eval_config.yaml, with
+               per-image latency and throughput
+
+Settings: `benchmark` in model_pipeline/configs/eval/eval_config.yaml.
+"""
 from __future__ import annotations
 
 from pathlib import Path
+from statistics import NormalDist
 import json
 import random
 import time
 import yaml
 import mlflow
 
+import cv2
+import numpy as np
+import torch
 from ultralytics import YOLO
 
 
@@ -121,43 +143,180 @@ def load_benchmark_images(
     return selected
 
 
-def summarize_timings(per_image_results: list[dict]) -> dict:
+SPEED_KEYS = ("preprocess", "inference", "postprocess")
+
+
+def preload_frames(benchmark_images: list[dict]) -> list[dict]:
+    """Decodes every benchmark image once; timing never touches the disk."""
+    frames = []
+    for item in benchmark_images:
+        image = cv2.imread(item["image_path"])
+        if image is None:
+            print(f"Skipping unreadable image: {item['image_path']}")
+            continue
+        frames.append({**item, "image": image})
+    if not frames:
+        raise RuntimeError("None of the benchmark images could be decoded.")
+    return frames
+
+
+def latency_stats(
+    samples_ms: list[float],
+    confidence: float = 0.95,
+    bootstrap_resamples: int = 1000,
+    seed: int = 42,
+) -> dict:
+    """
+    Distribution summary of latency samples. The mean's interval uses the
+    normal approximation; p50/p99 intervals come from a percentile bootstrap.
+    """
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    n = len(arr)
+    if n == 0:
+        return {}
+    std = float(arr.std(ddof=1)) if n > 1 else 0.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * std / np.sqrt(n)
+    stats = {
+        "n": n,
+        "mean_ms": float(arr.mean()),
+        "std_ms": std,
+        "min_ms": float(arr.min()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p90_ms": float(np.percentile(arr, 90)),
+        "p99_ms": float(np.percentile(arr, 99)),
+        "max_ms": float(arr.max()),
+        "mean_ci_ms": [float(arr.mean() - half_width), float(arr.mean() + half_width)],
+        "confidence_level": confidence,
+    }
+    if n > 1 and bootstrap_resamples:
+        rng = np.random.default_rng(seed)
+        resampled = arr[rng.integers(0, n, size=(bootstrap_resamples, n))]
+        tail = (1 - confidence) / 2 * 100
+        for q in (50, 99):
+            boot = np.percentile(resampled, q, axis=1)
+            stats[f"p{q}_ci_ms"] = [float(np.percentile(boot, tail)),
+                                    float(np.percentile(boot, 100 - tail))]
+    return stats
+
+
+def timed_predict(model: YOLO, batch: list[np.ndarray], device: str, imgsz: int) -> dict:
+    """One predict call: wall time plus Ultralytics' per-image stage timings."""
+    start = time.perf_counter()
+    results = model.predict(source=batch if len(batch) > 1 else batch[0],
+                            device=device, imgsz=imgsz, verbose=False)
+    elapsed_sec = time.perf_counter() - start
+    speed = results[0].speed
+    return {
+        "elapsed_sec": elapsed_sec,
+        "latency_ms": elapsed_sec * 1000.0,
+        **{f"{key}_ms": float(speed.get(key, 0.0)) for key in SPEED_KEYS},
+    }
+
+
+def set_threads(threads: int | None, default_threads: int) -> None:
+    torch.set_num_threads(threads or default_threads)
+
+
+def stage_means(samples: list[dict]) -> dict:
+    return {f"{key}_ms": float(np.mean([s[f"{key}_ms"] for s in samples])) for key in SPEED_KEYS}
+
+
+def summarize_timings(samples: list[dict], stats_kwargs: dict | None = None) -> dict:
+    """
+    Batch-size-1 samples (one per timed predict call) → overall and per-bucket
+    summaries. avg_latency_ms / throughput_fps / num_images keep the keys read
+    by compare_models.py, generate_slice_comparison.py and the bias report.
+    """
     summary = {
         "overall": {},
         "by_bucket": {},
     }
 
-    if not per_image_results:
+    if not samples:
         return summary
 
-    latencies = [item["latency_ms"] for item in per_image_results]
-    avg_latency = sum(latencies) / len(latencies)
-    total_time_sec = sum(item["elapsed_sec"] for item in per_image_results)
-    throughput_fps = len(per_image_results) / total_time_sec if total_time_sec > 0 else 0.0
-
-    summary["overall"] = {
-        "num_images": len(per_image_results),
-        "avg_latency_ms": avg_latency,
-        "throughput_fps": throughput_fps,
-    }
-
-    bucket_names = sorted(set(item["bucket"] for item in per_image_results))
-    for bucket in bucket_names:
-        bucket_items = [item for item in per_image_results if item["bucket"] == bucket]
-        bucket_latencies = [item["latency_ms"] for item in bucket_items]
-        bucket_avg_latency = sum(bucket_latencies) / len(bucket_latencies)
-        bucket_total_time = sum(item["elapsed_sec"] for item in bucket_items)
-        bucket_throughput = len(bucket_items) / bucket_total_time if bucket_total_time > 0 else 0.0
-
-        summary["by_bucket"][bucket] = {
-            "num_images": len(bucket_items),
-            "avg_latency_ms": bucket_avg_latency,
-            "throughput_fps": bucket_throughput,
+    stats_kwargs = stats_kwargs or {}
+
+    def summarize(group: list[dict]) -> dict:
+        latencies = [s["latency_ms"] for s in group]
+        total_time_sec = sum(s["elapsed_sec"] for s in group)
+        return {
+            "num_images": len({s["image_path"] for s in group}),
+            "num_samples": len(group),
+            "avg_latency_ms": float(np.mean(latencies)),
+            "throughput_fps": len(group) / total_time_sec if total_time_sec > 0 else 0.0,
+            "latency": latency_stats(latencies, **stats_kwargs),
+            "stages": stage_means(group),
         }
 
+    summary["overall"] = summarize(samples)
+    for bucket in sorted(set(s["bucket"] for s in samples)):
+        summary["by_bucket"][bucket] = summarize([s for s in samples if s["bucket"] == bucket])
+
     return summary
 
 
+def run_bucket_benchmark(model, frames, device, bench_cfg) -> tuple[list[dict], list[dict]]:
+    """Batch size 1, each image repeated; returns (samples, per_image_results)."""
+    imgsz = bench_cfg["imgsz"]
+    for i in range(bench_cfg["warmup_runs"]):
+        timed_predict(model, [frames[i % len(frames)]["image"]], device, imgsz)
+
+    samples, per_image_results = [], []
+    for frame in frames:
+        runs = [timed_predict(model, [frame["image"]], device, imgsz)
+                for _ in range(bench_cfg["repeats_per_image"])]
+        meta = {"image_path": frame["image_path"], "object_count": frame["object_count"],
+                "bucket": frame["bucket"]}
+        samples.extend({**meta, **run} for run in runs)
+
+        latencies = [r["latency_ms"] for r in runs]
+        per_image_results.append({
+            **meta,
+            "elapsed_sec": float(np.median([r["elapsed_sec"] for r in runs])),
+            "latency_ms": float(np.median(latencies)),
+            "latencies_ms": latencies,
+            **{f"{key}_ms": float(np.median([r[f"{key}_ms"] for r in runs])) for key in SPEED_KEYS},
+        })
+    return samples, per_image_results
+
+
+def run_batch_sweep(model, frames, device, bench_cfg, stats_kwargs, default_threads) -> list[dict]:
+    imgsz = bench_cfg["imgsz"]
+    images = [f["image"] for f in frames]
+    sweep = []
+    for threads in bench_cfg["thread_counts"]:
+        set_threads(threads, default_threads)
+        for batch_size in bench_cfg["batch_sizes"]:
+            def batch(i: int) -> list[np.ndarray]:
+                return [images[(i * batch_size + j) % len(images)] for j in range(batch_size)]
+
+            for i in range(bench_cfg["warmup_runs"]):
+                timed_predict(model, batch(i), device, imgsz)
+            runs = [timed_predict(model, batch(i), device, imgsz)
+                    for i in range(bench_cfg["timed_runs"])]
+
+            batch_latencies = [r["latency_ms"] for r in runs]
+            total_sec = sum(r["elapsed_sec"] for r in runs)
+            entry = {
+                "batch_size": batch_size,
+                "threads": threads or default_threads,
+                "batch_latency": latency_stats(batch_latencies, **stats_kwargs),
+                "per_image_latency": latency_stats([v / batch_size for v in batch_latencies],
+                                                   **stats_kwargs),
+                "throughput_fps": batch_size * len(runs) / total_sec if total_sec > 0 else 0.0,
+                "stages": stage_means(runs),
+            }
+            sweep.append(entry)
+            print(f"  threads={entry['threads']:<3} batch={batch_size:<3} "
+                  f"p50 {entry['batch_latency']['p50_ms']:8.1f} ms/batch  "
+                  f"p99 {entry['batch_latency']['p99_ms']:8.1f}  "
+                  f"{entry['throughput_fps']:7.1f} img/s")
+    set_threads(None, default_threads)
+    return sweep
+
+
 def main() -> None:
     eval_cfg = load_yaml(REPO_ROOT / "model_pipeline" / "configs" / "eval" / "eval_config.yaml")
     train_cfg = load_yaml(REPO_ROOT / "model_pipeline" / "configs" / "train" / "train_config.yaml")
@@ -168,14 +327,22 @@ def main() -> None:
     mlflow.set_experiment("pretrained_yolo_benchmark")
 
     checkpoints_root = REPO_ROOT / train_cfg["outputs"]["checkpoints_dir"]
-    device = eval_cfg["benchmark"]["device"]
+    bench_cfg = eval_cfg["benchmark"]
+    device = bench_cfg["device"]
+    split_name = bench_cfg["split"]
+    per_bucket = bench_cfg["per_bucket"]
+    stats_kwargs = {
+        "confidence": bench_cfg["confidence_level"],
+        "bootstrap_resamples": bench_cfg["bootstrap_resamples"],
+    }
+    default_threads = torch.get_num_threads()
 
-    # You can tune these later
     benchmark_images = load_benchmark_images(
-        split_name="train",
-        per_bucket=10,
+        split_name=split_name,
+        per_bucket=per_bucket,
         seed=42,
     )
+    frames = preload_frames(benchmark_images)
 
     for model_cfg in train_cfg["models"]:
         model_name = model_cfg["name"]
@@ -186,49 +353,33 @@ def main() -> None:
 
         model = YOLO(str(weights_source))
 
-        # Warm up on first image a few times
-        warmup_image = benchmark_images[0]["image_path"]
-        for _ in range(5):
-            model.predict(source=warmup_image, device=device, verbose=False)
-
-        per_image_results = []
-
-        for item in benchmark_images:
-            image_path = item["image_path"]
-
-            start = time.perf_counter()
-            model.predict(source=image_path, device=device, verbose=False)
-            end = time.perf_counter()
-
-            elapsed_sec = end - start
-            latency_ms = elapsed_sec * 1000.0
-
-            per_image_results.append(
-                {
-                    "image_path": image_path,
-                    "object_count": item["object_count"],
-                    "bucket": item["bucket"],
-                    "elapsed_sec": elapsed_sec,
-                    "latency_ms": latency_ms,
-                }
-            )
-
-        summary = summarize_timings(per_image_results)
+        samples, per_image_results = run_bucket_benchmark(model, frames, device, bench_cfg)
+        summary = summarize_timings(samples, stats_kwargs)
+        batch_sweep = run_batch_sweep(model, frames, device, bench_cfg, stats_kwargs, default_threads)
 
         results = {
             "model_name": model_name,
             "weights_source": str(weights_source),
             "device": device,
             "benchmark_config": {
-                "split_name": "train",
-                "per_bucket": 10,
+                "split_name": split_name,
+                "per_bucket": per_bucket,
                 "bucket_definition": {
                     "simple": "<=2 objects",
                     "moderate": "3-7 objects",
                     "complex": ">=8 objects",
                 },
+                "imgsz": bench_cfg["imgsz"],
+                "warmup_runs": bench_cfg["warmup_runs"],
+                "timed_runs": bench_cfg["timed_runs"],
+                "repeats_per_image": bench_cfg["repeats_per_image"],
+                "batch_sizes": bench_cfg["batch_sizes"],
+                "thread_counts": [t or default_threads for t in bench_cfg["thread_counts"]],
+                "confidence_level": bench_cfg["confidence_level"],
+                "timing": "model.predict() on preloaded in-memory frames",
             },
             "summary": summary,
+            "batch_sweep": batch_sweep,
             "per_image_results": per_image_results,
         }
 
@@ -243,13 +394,19 @@ def main() -> None:
             mlflow.log_param("model_name", model_name)
             mlflow.log_param("weights_source", str(weights_source))
             mlflow.log_param("device", device)
-            mlflow.log_param("split_name", "train")
-            mlflow.log_param("per_bucket", 10)
+            mlflow.log_param("split_name", split_name)
+            mlflow.log_param("per_bucket", per_bucket)
+            mlflow.log_param("repeats_per_image", bench_cfg["repeats_per_image"])
 
             if overall.get("avg_latency_ms") is not None:
                 mlflow.log_metric("overall_avg_latency_ms", overall["avg_latency_ms"])
             if overall.get("throughput_fps") is not None:
                 mlflow.log_metric("overall_throughput_fps", overall["throughput_fps"])
+            for key in ("p50_ms", "p90_ms", "p99_ms", "std_ms"):
+                if key in overall.get("latency", {}):
+                    mlflow.log_metric(f"overall_{key.replace('_ms', '')}_latency_ms", overall["latency"][key])
+            for key, value in overall.get("stages", {}).items():
+                mlflow.log_metric(f"overall_{key}", value)
 
             for bucket in ["simple", "moderate", "complex"]:
                 bucket_stats = by_bucket.get(bucket, {})
@@ -257,6 +414,14 @@ def main() -> None:
                     mlflow.log_metric(f"{bucket}_avg_latency_ms", bucket_stats["avg_latency_ms"])
                 if bucket_stats.get("throughput_fps") is not None:
                     mlflow.log_metric(f"{bucket}_throughput_fps", bucket_stats["throughput_fps"])
+                if "p99_ms" in bucket_stats.get("latency", {}):
+                    mlflow.log_metric(f"{bucket}_p99_latency_ms", bucket_stats["latency"]["p99_ms"])
+
+            for entry in batch_sweep:
+                prefix = f"bs{entry['batch_size']}_t{entry['threads']}"
+                mlflow.log_metric(f"{prefix}_p50_batch_latency_ms", entry["batch_latency"]["p50_ms"])
+                mlflow.log_metric(f"{prefix}_p99_batch_latency_ms", entry["batch_latency"]["p99_ms"])
+                mlflow.log_metric(f"{prefix}_throughput_fps", entry["throughput_fps"])
 
             mlflow.log_artifact(str(out_path), artifact_path="benchmarks")
 
@@ -264,4 +429,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
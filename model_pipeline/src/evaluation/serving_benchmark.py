@@ -0,0 +1,477 @@
+"""
+End-to-end serving benchmark for the adaptive inference API.
+
+Starts the FastAPI app (subprocess or in-process uvicorn) or targets an
+already running server, then drives /ws/stream with N asyncio WebSocket
+clients. Each client replays real frames (COCO split images or a video) at a
+target FPS in open loop: frames are sent on a fixed schedule whether or not
+earlier responses have arrived, and latency is measured from the *scheduled*
+send time, so a slow server shows up as latency instead of silently lowering
+the offered load. A client that already has `max_in_flight` frames
+outstanding skips its next frame and counts it as dropped.
+
+The JSON report (throughput, p50/p95/p99 latency, drops, server CPU/RSS) is
+comparable across commits; with a stored baseline the run fails when a
+metric regresses past the thresholds in eval_config.yaml (serving_benchmark).
+
+Usage:
+    python model_pipeline/src/evaluation/serving_benchmark.py
+    python model_pipeline/src/evaluation/serving_benchmark.py --clients 8 --fps 10 --duration 120
+    python model_pipeline/src/evaluation/serving_benchmark.py --url ws://host:8000/ws/stream
+    python model_pipeline/src/evaluation/serving_benchmark.py --update-baseline
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+
+import cv2
+import numpy as np
+import psutil
+import websockets
+import yaml
+
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+REPORT_SCHEMA = 1
+
+
+def load_yaml(path: Path) -> dict:
+    with path.open("r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def ensure_dir(path: Path) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Frames
+# ──────────────────────────────────────────────────────────────────────────────
+
+def encode_frame(img: np.ndarray, jpeg_quality: int) -> str:
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return base64.b64encode(buf).decode("utf-8")
+
+
+def load_frames(cfg: dict) -> list[str]:
+    """Base64 JPEG payloads, encoded once up front so the clients only send."""
+    source = cfg["frame_source"]
+    max_frames = cfg["max_frames"]
+    images: list[np.ndarray] = []
+
+    if source == "video":
+        cap = cv2.VideoCapture(str(REPO_ROOT / cfg["video_path"]))
+        while len(images) < max_frames:
+            ok, img = cap.read()
+            if not ok:
+                break
+            images.append(img)
+        cap.release()
+    elif source == "coco":
+        from benchmark import load_benchmark_images
+
+        per_bucket = max(1, max_frames // 3)
+        for item in load_benchmark_images(split_name=cfg["split"], per_bucket=per_bucket):
+            img = cv2.imread(item["image_path"])
+            if img is not None:
+                images.append(img)
+    elif source == "random":
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (640, 640, 3), dtype=np.uint8) for _ in range(max_frames)]
+    else:
+        raise ValueError(f"Unknown frame_source: {source}")
+
+    if not images:
+        raise RuntimeError(f"No frames could be loaded from source '{source}'")
+    return [encode_frame(img, cfg["jpeg_quality"]) for img in images]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Server under test
+# ──────────────────────────────────────────────────────────────────────────────
+
+class ServerUnderTest:
+    """Starts (or attaches to) the API and exposes the process to sample."""
+
+    def __init__(self, cfg: dict, url: str | None) -> None:
+        self.cfg = cfg
+        self.launch = "external" if url else cfg["launch"]
+        self.ws_url = url or f"ws://{cfg['host']}:{cfg['port']}/ws/stream"
+        self.http_base = self.ws_url.replace("ws://", "http://").replace("wss://", "https://")
+        self.http_base = self.http_base.rsplit("/ws/", 1)[0]
+        self._proc: subprocess.Popen | None = None
+        self._server = None
+        self._thread: threading.Thread | None = None
+        self.pid: int | None = None
+
+    def start(self) -> None:
+        app_dir = REPO_ROOT / self.cfg["app_dir"]
+        if self.launch == "subprocess":
+            self._proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "serving.app:app",
+                 "--host", self.cfg["host"], "--port", str(self.cfg["port"]), "--log-level", "warning"],
+                cwd=app_dir,
+                env={**os.environ, **{k: str(v) for k, v in (self.cfg.get("server_env") or {}).items()}},
+            )
+            self.pid = self._proc.pid
+        elif self.launch == "inprocess":
+            import uvicorn
+
+            sys.path.insert(0, str(app_dir))
+            os.environ.update({k: str(v) for k, v in (self.cfg.get("server_env") or {}).items()})
+            config = uvicorn.Config("serving.app:app", host=self.cfg["host"],
+                                    port=self.cfg["port"], log_level="warning")
+            self._server = uvicorn.Server(config)
+            self._thread = threading.Thread(target=self._server.run, daemon=True)
+            self._thread.start()
+            # CPU/RSS then include the load generator itself
+            self.pid = os.getpid()
+        self._wait_ready()
+
+    def _wait_ready(self) -> None:
+        deadline = time.monotonic() + self.cfg["startup_timeout_s"]
+        while time.monotonic() < deadline:
+            if self._proc is not None and self._proc.poll() is not None:
+                raise RuntimeError(f"Server exited during startup (code {self._proc.returncode})")
+            try:
+                with urllib.request.urlopen(f"{self.http_base}/health/ready", timeout=2) as resp:
+                    if resp.status == 200:
+                        return
+            except Exception:
+                pass
+            time.sleep(1.0)
+        raise TimeoutError(f"Server not ready after {self.cfg['startup_timeout_s']} s")
+
+    def stop(self) -> None:
+        if self._proc is not None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=30)
+
+
+class ResourceSampler:
+    """Samples CPU% and RSS of a process (and its children) on a thread."""
+
+    def __init__(self, pid: int, interval_s: float = 0.5) -> None:
+        self.proc = psutil.Process(pid)
+        # cpu_percent() is relative to the previous call on the same object
+        self._known: dict[int, psutil.Process] = {pid: self.proc}
+        self.interval_s = interval_s
+        self.cpu: list[float] = []
+        self.rss_mb: list[float] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _procs(self) -> list[psutil.Process]:
+        for child in self.proc.children(recursive=True):
+            self._known.setdefault(child.pid, child)
+        return list(self._known.values())
+
+    def start(self) -> None:
+        for p in self._procs():
+            p.cpu_percent(None)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            cpu, rss = 0.0, 0
+            for p in self._procs():
+                try:
+                    cpu += p.cpu_percent(None)
+                    rss += p.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu.append(cpu)
+            self.rss_mb.append(rss / 2**20)
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        if not self.cpu:
+            return {}
+        return {
+            "cpu_percent_mean": float(np.mean(self.cpu)),
+            "cpu_percent_max": float(np.max(self.cpu)),
+            "rss_mb_mean": float(np.mean(self.rss_mb)),
+            "rss_mb_max": float(np.max(self.rss_mb)),
+            "logical_cpus": psutil.cpu_count(),
+        }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Open-loop WebSocket clients
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def run_client(client_id: int, url: str, frames: list[str], cfg: dict,
+                     start_at: float, measure_from: float) -> dict:
+    """
+    Sends frame k at start_at + k / fps. Responses arrive in order on a
+    connection, so they are matched FIFO against the pending send times.
+    Only frames scheduled after measure_from (end of warmup) are counted.
+    """
+    fps = cfg["fps_per_client"]
+    end_at = start_at + cfg["warmup_s"] + cfg["duration_s"]
+    pending: deque[tuple[float, bool]] = deque()     # (scheduled_time, measured)
+    stats = {"client": client_id, "sent": 0, "received": 0, "dropped": 0, "errors": 0,
+             "latencies_ms": [], "server_latencies_ms": [], "models": {}}
+    payload_cache = [json.dumps({"frame": f, "baseline_model": cfg["baseline_model"]}) for f in frames]
+
+    async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+        async def receiver():
+            while True:
+                try:
+                    msg = await ws.recv()
+                except websockets.ConnectionClosed:
+                    return
+                scheduled, measured = pending.popleft()
+                if not measured:
+                    continue
+                latency_ms = (time.perf_counter() - scheduled) * 1000.0
+                result = json.loads(msg)
+                if "error" in result:
+                    stats["errors"] += 1
+                    continue
+                stats["received"] += 1
+                stats["latencies_ms"].append(latency_ms)
+                adaptive = result["adaptive"]
+                stats["server_latencies_ms"].append(adaptive["latency_ms"])
+                stats["models"][adaptive["model_name"]] = stats["models"].get(adaptive["model_name"], 0) + 1
+
+        recv_task = asyncio.create_task(receiver())
+        k = client_id   # stagger clients across the frame list
+        i = 0
+        while True:
+            scheduled = start_at + i / fps
+            if scheduled >= end_at:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            measured = scheduled >= measure_from
+            if len(pending) >= cfg["max_in_flight"]:
+                if measured:
+                    stats["dropped"] += 1
+            else:
+                pending.append((scheduled, measured))
+                await ws.send(payload_cache[k % len(payload_cache)])
+                if measured:
+                    stats["sent"] += 1
+            k += 1
+            i += 1
+
+        # Drain: whatever is still outstanding after the timeout is dropped
+        try:
+            deadline = time.perf_counter() + cfg["response_timeout_s"]
+            while pending and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+        finally:
+            stats["dropped"] += sum(1 for _, measured in pending if measured)
+            recv_task.cancel()
+    return stats
+
+
+async def run_load(url: str, frames: list[str], cfg: dict) -> tuple[list[dict], float]:
+    start_at = time.perf_counter() + 1.0
+    measure_from = start_at + cfg["warmup_s"]
+    results = await asyncio.gather(*[
+        run_client(c, url, frames, cfg, start_at + c / (cfg["fps_per_client"] * cfg["clients"]),
+                   measure_from)
+        for c in range(cfg["clients"])
+    ])
+    return list(results), cfg["duration_s"]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Report and regression gate
+# ──────────────────────────────────────────────────────────────────────────────
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    arr = np.asarray(values)
+    return {
+        "mean": float(arr.mean()),
+        "p50": float(np.percentile(arr, 50)),
+        "p95": float(np.percentile(arr, 95)),
+        "p99": float(np.percentile(arr, 99)),
+        "max": float(arr.max()),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def build_report(client_stats: list[dict], duration_s: float, resources: dict, cfg: dict) -> dict:
+    latencies = [v for c in client_stats for v in c["latencies_ms"]]
+    server_latencies = [v for c in client_stats for v in c["server_latencies_ms"]]
+    models: dict = {}
+    for c in client_stats:
+        for name, n in c["models"].items():
+            models[name] = models.get(name, 0) + n
+    offered = sum(c["sent"] + c["dropped"] for c in client_stats)
+    received = sum(c["received"] for c in client_stats)
+    dropped = sum(c["dropped"] for c in client_stats)
+
+    return {
+        "schema": REPORT_SCHEMA,
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(),
+                 "logical_cpus": psutil.cpu_count()},
+        "config": {k: cfg[k] for k in ("clients", "fps_per_client", "duration_s", "warmup_s",
+                                       "max_in_flight", "frame_source", "baseline_model")},
+        "results": {
+            "offered_frames": offered,
+            "received_frames": received,
+            "dropped_frames": dropped,
+            "error_frames": sum(c["errors"] for c in client_stats),
+            "drop_rate": dropped / offered if offered else 0.0,
+            "offered_fps": offered / duration_s,
+            "throughput_fps": received / duration_s,
+            "latency_ms": percentiles(latencies),
+            "server_adaptive_latency_ms": percentiles(server_latencies),
+            "model_distribution": models,
+            "server_resources": resources,
+        },
+        "per_client": [{k: v for k, v in c.items() if not k.endswith("latencies_ms")}
+                       for c in client_stats],
+    }
+
+
+def check_regression(report: dict, baseline: dict, thresholds: dict) -> list[str]:
+    """Human-readable list of regressions; empty when the run passes."""
+    if baseline.get("config") != report["config"]:
+        return ["baseline was recorded with a different load config — rerun with --update-baseline"]
+    cur, base = report["results"], baseline["results"]
+    failures = []
+
+    for q in ("p50", "p95", "p99"):
+        limit = thresholds.get(f"{q}_latency_pct")
+        b, c = base["latency_ms"].get(q), cur["latency_ms"].get(q)
+        if limit is not None and b and c is not None and c > b * (1 + limit / 100):
+            failures.append(f"{q} latency {c:.1f} ms > baseline {b:.1f} ms + {limit}%")
+
+    limit = thresholds.get("throughput_pct")
+    b, c = base["throughput_fps"], cur["throughput_fps"]
+    if limit is not None and b and c < b * (1 - limit / 100):
+        failures.append(f"throughput {c:.2f} fps < baseline {b:.2f} fps − {limit}%")
+
+    limit = thresholds.get("drop_rate_abs")
+    if limit is not None and cur["drop_rate"] > base["drop_rate"] + limit:
+        failures.append(f"drop rate {cur['drop_rate']:.3f} > baseline {base['drop_rate']:.3f} + {limit}")
+
+    limit = thresholds.get("rss_mb_pct")
+    b = base.get("server_resources", {}).get("rss_mb_max")
+    c = cur.get("server_resources", {}).get("rss_mb_max")
+    if limit is not None and b and c is not None and c > b * (1 + limit / 100):
+        failures.append(f"peak RSS {c:.0f} MB > baseline {b:.0f} MB + {limit}%")
+    return failures
+
+
+def print_summary(report: dict) -> None:
+    r = report["results"]
+    lat = r["latency_ms"]
+    print(f"\nOffered {r['offered_fps']:.1f} fps → served {r['throughput_fps']:.1f} fps  "
+          f"(dropped {r['dropped_frames']}, errors {r['error_frames']})")
+    if lat:
+        print(f"End-to-end latency  p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  "
+              f"p99 {lat['p99']:.1f}  max {lat['max']:.1f} ms")
+    res = r["server_resources"]
+    if res:
+        print(f"Server CPU {res['cpu_percent_mean']:.0f}% (max {res['cpu_percent_max']:.0f}%)  "
+              f"RSS {res['rss_mb_mean']:.0f} MB (max {res['rss_mb_max']:.0f} MB)")
+    print(f"Model distribution: {r['model_distribution']}")
+
+
+def main() -> None:
+    eval_cfg = load_yaml(REPO_ROOT / "model_pipeline" / "configs" / "eval" / "eval_config.yaml")
+    cfg = dict(eval_cfg["serving_benchmark"])
+
+    parser = argparse.ArgumentParser(description="End-to-end WebSocket serving benchmark")
+    parser.add_argument("--url", help="benchmark a running server instead of launching one")
+    parser.add_argument("--launch", choices=["subprocess", "inprocess"])
+    parser.add_argument("--clients", type=int)
+    parser.add_argument("--fps", type=float, dest="fps_per_client")
+    parser.add_argument("--duration", type=float, dest="duration_s")
+    parser.add_argument("--frame-source", choices=["coco", "video", "random"], dest="frame_source")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the regression baseline")
+    parser.add_argument("--no-gate", action="store_true", help="report only, never fail")
+    args = parser.parse_args()
+    for key in ("launch", "clients", "fps_per_client", "duration_s", "frame_source"):
+        if getattr(args, key) is not None:
+            cfg[key] = getattr(args, key)
+
+    report_path = REPO_ROOT / cfg["report"]
+    baseline_path = REPO_ROOT / cfg["baseline_report"]
+    ensure_dir(report_path.parent)
+
+    frames = load_frames(cfg)
+    print(f"Loaded {len(frames)} frames ({cfg['frame_source']}); "
+          f"{cfg['clients']} clients × {cfg['fps_per_client']} fps for {cfg['duration_s']} s")
+
+    server = ServerUnderTest(cfg, args.url)
+    server.start()
+    sampler = ResourceSampler(server.pid) if server.pid else None
+    try:
+        if sampler:
+            sampler.start()
+        client_stats, duration_s = asyncio.run(run_load(server.ws_url, frames, cfg))
+    finally:
+        resources = sampler.stop() if sampler else {}
+        server.stop()
+
+    report = build_report(client_stats, duration_s, resources, cfg)
+    with report_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"Saved report to {report_path}")
+
+    if args.update_baseline:
+        with baseline_path.open("w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print("No baseline stored — skipping regression gate (run with --update-baseline).")
+        return
+    with baseline_path.open("r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = check_regression(report, baseline, cfg["regression"])
+    if failures:
+        print(f"\nREGRESSION vs baseline {baseline.get('git_commit')}:")
+        for msg in failures:
+            print(f"  - {msg}")
+        if not args.no_gate:
+            sys.exit(1)
+    else:
+        print(f"No regression vs baseline {baseline.get('git_commit')}.")
+
+
+if __name__ == "__main__":
+    main()